@@ -0,0 +1,30 @@
+"""Track last activity on conversations for webchat session continuity"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0013_conversation_last_message_at"
+down_revision = "0012_add_agent_to_conversations"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("conversations", sa.Column("last_message_at", sa.DateTime(), nullable=True))
+
+    op.execute(
+        """
+        UPDATE conversations c
+        SET last_message_at = m.last_message_at
+        FROM (
+            SELECT conversation_id, MAX(created_at) AS last_message_at
+            FROM messages
+            GROUP BY conversation_id
+        ) m
+        WHERE m.conversation_id = c.id
+        """
+    )
+
+
+def downgrade():
+    op.drop_column("conversations", "last_message_at")
@@ -0,0 +1,17 @@
+"""Add per-agent model call settings (request hedging)"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0014_agent_model_settings"
+down_revision = "0013_conversation_last_message_at"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("agents", sa.Column("model_settings", sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("agents", "model_settings")
@@ -0,0 +1,19 @@
+"""Store a rolling summary on conversations"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0015_conversation_summary"
+down_revision = "0014_agent_model_settings"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("conversations", sa.Column("summary", sa.Text(), nullable=True))
+    op.add_column("conversations", sa.Column("summary_through_at", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("conversations", "summary_through_at")
+    op.drop_column("conversations", "summary")
@@ -0,0 +1,110 @@
+"""Deduplicate customers and enforce unique channel identities and customer emails
+
+Concurrent first messages from one widget session could create two customers
+(each with a channel identity for the same session). Duplicates are merged
+into the earliest customer before the unique indexes are created.
+"""
+
+from alembic import op
+from sqlalchemy import text
+
+revision = "0016_customer_identity_uniqueness"
+down_revision = "0015_conversation_summary"
+branch_labels = None
+depends_on = None
+
+
+def _merge_customers(conn, duplicates_sql: str) -> None:
+    """Repoint everything owned by the (duplicate_id, keep_id) pairs to the kept customer."""
+    conn.execute(text("DROP TABLE IF EXISTS customer_merge"))
+    conn.execute(text(f"CREATE TEMP TABLE customer_merge AS {duplicates_sql}"))
+    conn.execute(text("DELETE FROM customer_merge WHERE duplicate_id = keep_id"))
+    for table in ("conversations", "end_user_verifications", "channel_identities"):
+        conn.execute(
+            text(
+                f"""
+                UPDATE {table} t
+                SET customer_id = m.keep_id
+                FROM customer_merge m
+                WHERE t.customer_id = m.duplicate_id
+                """
+            )
+        )
+    conn.execute(
+        text(
+            """
+            DELETE FROM customers c
+            USING customer_merge m
+            WHERE c.id = m.duplicate_id
+              AND NOT EXISTS (SELECT 1 FROM conversations WHERE customer_id = c.id)
+              AND NOT EXISTS (SELECT 1 FROM end_user_verifications WHERE customer_id = c.id)
+              AND NOT EXISTS (SELECT 1 FROM channel_identities WHERE customer_id = c.id)
+            """
+        )
+    )
+    conn.execute(text("DROP TABLE customer_merge"))
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    # 1) Customers that share a channel identity: keep the first identity's customer.
+    _merge_customers(
+        conn,
+        """
+        SELECT DISTINCT customer_id AS duplicate_id, keep_id
+        FROM (
+            SELECT customer_id,
+                   FIRST_VALUE(customer_id) OVER (
+                       PARTITION BY tenant_id, channel, external_id ORDER BY created_at, id
+                   ) AS keep_id
+            FROM channel_identities
+        ) ranked
+        """,
+    )
+    conn.execute(
+        text(
+            """
+            DELETE FROM channel_identities
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY tenant_id, channel, external_id ORDER BY created_at, id
+                    ) AS rn
+                    FROM channel_identities
+                ) ranked
+                WHERE rn > 1
+            )
+            """
+        )
+    )
+
+    # 2) Customers that share an email within a tenant: keep the earliest.
+    _merge_customers(
+        conn,
+        """
+        SELECT id AS duplicate_id,
+               FIRST_VALUE(id) OVER (PARTITION BY tenant_id, email ORDER BY created_at, id) AS keep_id
+        FROM customers
+        WHERE email IS NOT NULL
+        """,
+    )
+
+    op.create_index(
+        "uq_channel_identities_tenant_channel_external",
+        "channel_identities",
+        ["tenant_id", "channel", "external_id"],
+        unique=True,
+    )
+    op.create_index(
+        "uq_customers_tenant_email",
+        "customers",
+        ["tenant_id", "email"],
+        unique=True,
+        postgresql_where=text("email IS NOT NULL"),
+    )
+
+
+def downgrade():
+    op.drop_index("uq_customers_tenant_email", table_name="customers")
+    op.drop_index("uq_channel_identities_tenant_channel_external", table_name="channel_identities")
@@ -0,0 +1,42 @@
+"""Per-tenant monthly usage counters, backfilled from existing conversations and messages"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0017_tenant_usage_counters"
+down_revision = "0016_customer_identity_uniqueness"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "tenant_usage_counters",
+        sa.Column("tenant_id", sa.dialects.postgresql.UUID(as_uuid=True), sa.ForeignKey("tenants.id"), primary_key=True),
+        sa.Column("month", sa.Date(), primary_key=True),
+        sa.Column("metric", sa.String(length=40), primary_key=True),
+        sa.Column("value", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+
+    op.execute(
+        """
+        INSERT INTO tenant_usage_counters (tenant_id, month, metric, value, updated_at)
+        SELECT tenant_id, date_trunc('month', started_at)::date, 'conversations', COUNT(*), now()
+        FROM conversations
+        GROUP BY tenant_id, date_trunc('month', started_at)::date
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO tenant_usage_counters (tenant_id, month, metric, value, updated_at)
+        SELECT c.tenant_id, date_trunc('month', m.created_at)::date, 'messages', COUNT(*), now()
+        FROM messages m
+        JOIN conversations c ON c.id = m.conversation_id
+        GROUP BY c.tenant_id, date_trunc('month', m.created_at)::date
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("tenant_usage_counters")
@@ -0,0 +1,62 @@
+"""Daily per-tenant rollup of conversations, messages and new customers
+
+Backfilled from existing rows here and maintained on write afterwards; any
+range can be recomputed with scripts/backfill_daily_stats.py.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0018_tenant_daily_stats"
+down_revision = "0017_tenant_usage_counters"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "tenant_daily_stats",
+        sa.Column("tenant_id", sa.dialects.postgresql.UUID(as_uuid=True), sa.ForeignKey("tenants.id"), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("channel", sa.String(), primary_key=True),
+        sa.Column("agent_id", sa.dialects.postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("conversations", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("messages", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("new_customers", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        """
+        INSERT INTO tenant_daily_stats (tenant_id, day, channel, agent_id, conversations, messages, new_customers)
+        SELECT tenant_id, day, channel, agent_id, SUM(conversations), SUM(messages), SUM(new_customers)
+        FROM (
+            SELECT tenant_id, started_at::date AS day, COALESCE(channel, 'unknown') AS channel,
+                   COALESCE(agent_id, '00000000-0000-0000-0000-000000000000'::uuid) AS agent_id,
+                   COUNT(*) AS conversations, 0 AS messages, 0 AS new_customers
+            FROM conversations
+            GROUP BY 1, 2, 3, 4
+            UNION ALL
+            SELECT c.tenant_id, m.created_at::date, COALESCE(c.channel, 'unknown'),
+                   COALESCE(c.agent_id, '00000000-0000-0000-0000-000000000000'::uuid),
+                   0, COUNT(*), 0
+            FROM messages m
+            JOIN conversations c ON c.id = m.conversation_id
+            GROUP BY 1, 2, 3, 4
+            UNION ALL
+            SELECT cu.tenant_id, cu.created_at::date,
+                   COALESCE(
+                       (SELECT ci.channel FROM channel_identities ci
+                        WHERE ci.customer_id = cu.id ORDER BY ci.created_at LIMIT 1),
+                       'email'
+                   ),
+                   '00000000-0000-0000-0000-000000000000'::uuid,
+                   0, 0, COUNT(*)
+            FROM customers cu
+            GROUP BY 1, 2, 3, 4
+        ) parts
+        GROUP BY tenant_id, day, channel, agent_id
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("tenant_daily_stats")
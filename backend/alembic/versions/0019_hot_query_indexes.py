@@ -0,0 +1,51 @@
+"""Composite indexes for the hot tenant, conversation, message and agent queries
+
+Built with CREATE INDEX CONCURRENTLY so large tables stay writable while the
+migration runs; each statement therefore runs outside the migration
+transaction. `tests/test_query_plans.py` verifies the planner uses them.
+"""
+
+from alembic import op
+
+revision = "0019_hot_query_indexes"
+down_revision = "0018_tenant_daily_stats"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_conversations_tenant_started_at", "conversations", ["tenant_id", "started_at"]),
+    ("ix_conversations_customer_started_at", "conversations", ["customer_id", "started_at"]),
+    ("ix_conversations_agent_started_at", "conversations", ["agent_id", "started_at"]),
+    ("ix_messages_conversation_created_at", "messages", ["conversation_id", "created_at"]),
+    ("ix_agents_tenant_status_created_at", "agents", ["tenant_id", "status", "created_at"]),
+    ("ix_agent_documents_agent_created_at", "agent_documents", ["agent_id", "created_at"]),
+    ("ix_customers_tenant_created_at", "customers", ["tenant_id", "created_at"]),
+    ("ix_users_tenant_created_at", "users", ["tenant_id", "created_at"]),
+    ("ix_tenants_stripe_customer_id", "tenants", ["stripe_customer_id"]),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            # A concurrent build that failed leaves an INVALID index behind; drop it so a re-run rebuilds it.
+            op.execute(
+                f"""
+                DO $$
+                BEGIN
+                    IF EXISTS (
+                        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                        WHERE c.relname = '{name}' AND NOT i.indisvalid
+                    ) THEN
+                        EXECUTE 'DROP INDEX {name}';
+                    END IF;
+                END $$;
+                """
+            )
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,61 @@
+"""Trigram GIN indexes for tenant, user and chat-user search
+
+Each index covers the lowercased search document built by
+app/services/search_service.py; the expressions must stay identical for the
+planner to use them. Built concurrently, outside the migration transaction.
+"""
+
+from alembic import op
+
+revision = "0020_search_trigram_indexes"
+down_revision = "0019_hot_query_indexes"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    (
+        "ix_tenants_search_trgm",
+        "tenants",
+        "lower(coalesce(name, '') || ' ' || coalesce(slug, ''))",
+    ),
+    (
+        "ix_users_search_trgm",
+        "users",
+        "lower(coalesce(email, '') || ' ' || coalesce(name, ''))",
+    ),
+    (
+        "ix_customers_search_trgm",
+        "customers",
+        "lower(coalesce(email, '') || ' ' || coalesce(first_name, '') || ' ' || coalesce(last_name, '')"
+        " || ' ' || coalesce(primary_phone, ''))",
+    ),
+]
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        for name, table, expression in INDEXES:
+            # A failed concurrent build leaves an INVALID index behind; drop it so a re-run rebuilds it.
+            op.execute(
+                f"""
+                DO $$
+                BEGIN
+                    IF EXISTS (
+                        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                        WHERE c.relname = '{name}' AND NOT i.indisvalid
+                    ) THEN
+                        EXECUTE 'DROP INDEX {name}';
+                    END IF;
+                END $$;
+                """
+            )
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING gin (({expression}) gin_trgm_ops)"
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
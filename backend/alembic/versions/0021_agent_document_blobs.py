@@ -0,0 +1,26 @@
+"""Store agent document bytes in the blob store, keyed by content hash
+
+Adds `content_hash` and makes `data` nullable. Existing rows keep their bytes
+until scripts/migrate_document_blobs.py copies them out and clears `data`.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0021_agent_document_blobs"
+down_revision = "0020_search_trigram_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("agent_documents", sa.Column("content_hash", sa.String(length=64), nullable=True))
+    op.alter_column("agent_documents", "data", existing_type=sa.LargeBinary(), nullable=True)
+    op.create_index("ix_agent_documents_content_hash", "agent_documents", ["content_hash"])
+
+
+def downgrade():
+    # Only valid while every row still has its bytes in `data`.
+    op.drop_index("ix_agent_documents_content_hash", table_name="agent_documents")
+    op.alter_column("agent_documents", "data", existing_type=sa.LargeBinary(), nullable=False)
+    op.drop_column("agent_documents", "content_hash")
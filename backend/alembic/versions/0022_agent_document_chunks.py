@@ -0,0 +1,45 @@
+"""Chunked document text and per-document ingestion status
+
+Existing documents start as `pending` and are ingested when the API next
+starts (documents still awaiting scripts/migrate_document_blobs.py are
+skipped until they have a content hash).
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0022_agent_document_chunks"
+down_revision = "0021_agent_document_blobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "agent_documents",
+        sa.Column("ingestion_status", sa.String(length=20), nullable=False, server_default="pending"),
+    )
+    op.add_column("agent_documents", sa.Column("ingestion_error", sa.Text(), nullable=True))
+    op.add_column("agent_documents", sa.Column("ingestion_updated_at", sa.DateTime(), nullable=True))
+    op.create_index(
+        "ix_agent_documents_ingestion_queue",
+        "agent_documents",
+        ["created_at"],
+        postgresql_where=sa.text("ingestion_status IN ('pending', 'processing')"),
+    )
+
+    op.create_table(
+        "agent_document_chunks",
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+        sa.Column("chunk_index", sa.Integer(), nullable=False),
+        sa.Column("text", sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint("content_hash", "chunk_index"),
+    )
+
+
+def downgrade():
+    op.drop_table("agent_document_chunks")
+    op.drop_index("ix_agent_documents_ingestion_queue", table_name="agent_documents")
+    op.drop_column("agent_documents", "ingestion_updated_at")
+    op.drop_column("agent_documents", "ingestion_error")
+    op.drop_column("agent_documents", "ingestion_status")
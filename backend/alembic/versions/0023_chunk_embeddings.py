@@ -0,0 +1,23 @@
+"""Store a float16 embedding per document chunk for semantic retrieval
+
+Chunks ingested before this revision have no embedding; fill them in with
+scripts/embed_document_chunks.py once an EMBEDDING_BACKEND is configured.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0023_chunk_embeddings"
+down_revision = "0022_agent_document_chunks"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("agent_document_chunks", sa.Column("embedding", sa.LargeBinary(), nullable=True))
+    op.add_column("agent_document_chunks", sa.Column("embedding_model", sa.String(length=200), nullable=True))
+
+
+def downgrade():
+    op.drop_column("agent_document_chunks", "embedding_model")
+    op.drop_column("agent_document_chunks", "embedding")
@@ -0,0 +1,36 @@
+"""All-time per-tenant, per-channel totals next to the daily rollup
+
+Lets the dashboard and list totals read a handful of rows instead of summing
+a tenant's whole daily history. Backfilled from tenant_daily_stats.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0024_tenant_stat_totals"
+down_revision = "0023_chunk_embeddings"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "tenant_stat_totals",
+        sa.Column("tenant_id", sa.dialects.postgresql.UUID(as_uuid=True), sa.ForeignKey("tenants.id"), primary_key=True),
+        sa.Column("channel", sa.String(), primary_key=True),
+        sa.Column("conversations", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("messages", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("new_customers", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        """
+        INSERT INTO tenant_stat_totals (tenant_id, channel, conversations, messages, new_customers)
+        SELECT tenant_id, channel, SUM(conversations), SUM(messages), SUM(new_customers)
+        FROM tenant_daily_stats
+        GROUP BY tenant_id, channel
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("tenant_stat_totals")
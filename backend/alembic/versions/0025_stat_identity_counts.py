@@ -0,0 +1,33 @@
+"""Count channel identities in tenant_stat_totals
+
+Backs the dashboard's connected_channels_count without a COUNT over
+channel_identities. Backfilled here; maintained on insert afterwards.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0025_stat_identity_counts"
+down_revision = "0024_tenant_stat_totals"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "tenant_stat_totals",
+        sa.Column("channel_identities", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        """
+        INSERT INTO tenant_stat_totals (tenant_id, channel, channel_identities)
+        SELECT tenant_id, channel, COUNT(*)
+        FROM channel_identities
+        GROUP BY tenant_id, channel
+        ON CONFLICT (tenant_id, channel) DO UPDATE SET channel_identities = excluded.channel_identities
+        """
+    )
+
+
+def downgrade():
+    op.drop_column("tenant_stat_totals", "channel_identities")
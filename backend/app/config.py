@@ -24,6 +24,97 @@ class Settings(BaseSettings):
         "llama-3.3-70b-versatile",
         env="GROQ_DEFAULT_MODEL",
     )
+    # Optional override for Groq-compatible gateways/proxies; None uses the SDK default.
+    groq_base_url: Optional[str] = Field(None, env="GROQ_BASE_URL")
+    groq_connect_timeout: float = Field(5.0, env="GROQ_CONNECT_TIMEOUT")
+    groq_read_timeout: float = Field(60.0, env="GROQ_READ_TIMEOUT")
+    groq_max_retries: int = Field(2, env="GROQ_MAX_RETRIES")
+    groq_max_connections: int = Field(100, env="GROQ_MAX_CONNECTIONS")
+    groq_max_keepalive_connections: int = Field(20, env="GROQ_MAX_KEEPALIVE_CONNECTIONS")
+    groq_keepalive_expiry: float = Field(30.0, env="GROQ_KEEPALIVE_EXPIRY")
+    # Webchat messages within this idle window continue the same conversation.
+    webchat_session_idle_minutes: int = Field(30, env="WEBCHAT_SESSION_IDLE_MINUTES")
+    # Upper bound on history rows loaded per turn; ai_service trims them to the model's token budget.
+    webchat_history_messages: int = Field(50, env="WEBCHAT_HISTORY_MESSAGES")
+    webchat_session_cache_size: int = Field(10000, env="WEBCHAT_SESSION_CACHE_SIZE")
+    # Public agent/tenant slug lookups; invalidations are broadcast via Postgres NOTIFY.
+    directory_cache_ttl_seconds: int = Field(300, env="DIRECTORY_CACHE_TTL_SECONDS")
+    directory_cache_size: int = Field(5000, env="DIRECTORY_CACHE_SIZE")
+    directory_cache_listen: bool = Field(True, env="DIRECTORY_CACHE_LISTEN")
+    prompt_cache_size: int = Field(2000, env="PROMPT_CACHE_SIZE")
+    # Per-model circuit breakers over a rolling window of Groq calls.
+    model_breaker_window_seconds: float = Field(60.0, env="MODEL_BREAKER_WINDOW_SECONDS")
+    model_breaker_min_requests: int = Field(5, env="MODEL_BREAKER_MIN_REQUESTS")
+    model_breaker_error_rate: float = Field(0.5, env="MODEL_BREAKER_ERROR_RATE")
+    model_breaker_latency_seconds: float = Field(20.0, env="MODEL_BREAKER_LATENCY_SECONDS")
+    model_breaker_cooldown_seconds: float = Field(30.0, env="MODEL_BREAKER_COOLDOWN_SECONDS")
+    model_breaker_permanent_cooldown_seconds: float = Field(3600.0, env="MODEL_BREAKER_PERMANENT_COOLDOWN_SECONDS")
+    # Hedged requests (opt-in per agent): budget is a percentile of recent time-to-first-token.
+    hedge_sample_size: int = Field(200, env="HEDGE_SAMPLE_SIZE")
+    hedge_min_samples: int = Field(20, env="HEDGE_MIN_SAMPLES")
+    hedge_default_budget_seconds: float = Field(2.0, env="HEDGE_DEFAULT_BUDGET_SECONDS")
+    hedge_min_budget_seconds: float = Field(0.25, env="HEDGE_MIN_BUDGET_SECONDS")
+    # tiktoken encoding used for local token counts (regex estimate if tiktoken is not installed).
+    tokenizer_encoding: str = Field("cl100k_base", env="TOKENIZER_ENCODING")
+    message_token_cache_size: int = Field(50000, env="MESSAGE_TOKEN_CACHE_SIZE")
+    # Rolling conversation summaries: refreshed once this many messages are unsummarized,
+    # keeping the newest few verbatim. SUMMARY_MODEL defaults to GROQ_DEFAULT_MODEL.
+    summary_every_messages: int = Field(12, env="SUMMARY_EVERY_MESSAGES")
+    summary_keep_recent_messages: int = Field(4, env="SUMMARY_KEEP_RECENT_MESSAGES")
+    summary_max_tokens: int = Field(400, env="SUMMARY_MAX_TOKENS")
+    summary_model: Optional[str] = Field(None, env="SUMMARY_MODEL")
+    # "write_behind" queues AI replies for batched inserts (flushed on shutdown);
+    # "sync" commits each reply before responding.
+    message_write_mode: str = Field("write_behind", env="MESSAGE_WRITE_MODE")
+    message_write_queue_size: int = Field(10000, env="MESSAGE_WRITE_QUEUE_SIZE")
+    message_write_batch_size: int = Field(500, env="MESSAGE_WRITE_BATCH_SIZE")
+    message_write_shutdown_timeout: float = Field(10.0, env="MESSAGE_WRITE_SHUTDOWN_TIMEOUT")
+    # Customer last_seen_at touches are coalesced to this resolution and flushed in batches.
+    presence_resolution_seconds: float = Field(60.0, env="PRESENCE_RESOLUTION_SECONDS")
+    presence_flush_interval_seconds: float = Field(5.0, env="PRESENCE_FLUSH_INTERVAL_SECONDS")
+    presence_cache_size: int = Field(100000, env="PRESENCE_CACHE_SIZE")
+    # Front cache for tenant usage counters used by plan-limit checks.
+    usage_cache_ttl_seconds: float = Field(30.0, env="USAGE_CACHE_TTL_SECONDS")
+    usage_cache_size: int = Field(10000, env="USAGE_CACHE_SIZE")
+    # Admin search: matches considered per query before ranking, and the shortest term
+    # the trigram indexes can serve (shorter terms return nothing instead of scanning).
+    search_max_candidates: int = Field(1000, env="SEARCH_MAX_CANDIDATES")
+    search_min_term_length: int = Field(3, env="SEARCH_MIN_TERM_LENGTH")
+    # Uploaded document storage: "local" (BLOB_STORE_PATH) or "s3" (any S3-compatible endpoint).
+    blob_store_backend: str = Field("local", env="BLOB_STORE_BACKEND")
+    blob_store_path: str = Field("./data/blobs", env="BLOB_STORE_PATH")
+    blob_store_s3_bucket: Optional[str] = Field(None, env="BLOB_STORE_S3_BUCKET")
+    blob_store_s3_prefix: str = Field("", env="BLOB_STORE_S3_PREFIX")
+    blob_store_s3_endpoint_url: Optional[str] = Field(None, env="BLOB_STORE_S3_ENDPOINT_URL")
+    blob_store_s3_region: Optional[str] = Field(None, env="BLOB_STORE_S3_REGION")
+    # Document ingestion: extraction processes (0 disables the pipeline), passage size and
+    # overlap in characters, and when a document stuck in "processing" is picked up again.
+    ingestion_workers: int = Field(2, env="INGESTION_WORKERS")
+    ingestion_chunk_chars: int = Field(1200, env="INGESTION_CHUNK_CHARS")
+    ingestion_chunk_overlap: int = Field(200, env="INGESTION_CHUNK_OVERLAP")
+    ingestion_stale_seconds: float = Field(900.0, env="INGESTION_STALE_SECONDS")
+    # Knowledge retrieval: passages injected per reply and their token budget, how often a
+    # cached per-agent index rechecks the agent's documents, and the index cache bounds.
+    knowledge_top_k: int = Field(4, env="KNOWLEDGE_TOP_K")
+    knowledge_max_tokens: int = Field(1200, env="KNOWLEDGE_MAX_TOKENS")
+    knowledge_refresh_seconds: float = Field(30.0, env="KNOWLEDGE_REFRESH_SECONDS")
+    knowledge_cache_size: int = Field(500, env="KNOWLEDGE_CACHE_SIZE")
+    knowledge_cache_max_bytes: int = Field(256 * 1024 * 1024, env="KNOWLEDGE_CACHE_MAX_BYTES")
+    # "bm25", "semantic" or "hybrid" (both, reciprocal rank fusion). Semantic modes need an
+    # embedding backend: "none", "hashing" (local stand-in), "local" (sentence-transformers
+    # EMBEDDING_MODEL on CPU) or "http" (OpenAI-compatible EMBEDDING_URL).
+    knowledge_retrieval_mode: str = Field("hybrid", env="KNOWLEDGE_RETRIEVAL_MODE")
+    knowledge_min_similarity: float = Field(0.25, env="KNOWLEDGE_MIN_SIMILARITY")
+    embedding_backend: str = Field("none", env="EMBEDDING_BACKEND")
+    embedding_model: Optional[str] = Field(None, env="EMBEDDING_MODEL")
+    embedding_url: Optional[str] = Field(None, env="EMBEDDING_URL")
+    embedding_api_key: Optional[str] = Field(None, env="EMBEDDING_API_KEY")
+    embedding_dim: int = Field(384, env="EMBEDDING_DIM")
+    embedding_batch_size: int = Field(64, env="EMBEDDING_BATCH_SIZE")
+    # Per-agent memory-mapped vector files; brute force below the threshold, IVF above it.
+    vector_index_path: str = Field("./data/vectors", env="VECTOR_INDEX_PATH")
+    vector_ann_threshold: int = Field(10000, env="VECTOR_ANN_THRESHOLD")
+    vector_ann_probes: int = Field(8, env="VECTOR_ANN_PROBES")
 
     class Config:
         env_file = ".env"
@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from app.config import get_settings
@@ -8,4 +10,28 @@ settings = get_settings()
 engine = create_engine(settings.database_url)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _async_database_url(url: str):
+    """
+    Return the asyncpg flavour of the configured Postgres URL plus connect args.
+
+    asyncpg does not understand libpq's `sslmode` query parameter, so it is
+    moved into the `ssl` connect argument instead.
+    """
+    parsed = make_url(url)
+    query = dict(parsed.query)
+    connect_args = {}
+    sslmode = query.pop("sslmode", None)
+    if sslmode:
+        connect_args["ssl"] = sslmode
+    return parsed.set(drivername="postgresql+asyncpg", query=query), connect_args
+
+
+_async_url, _async_connect_args = _async_database_url(settings.database_url)
+async_engine = create_async_engine(_async_url, connect_args=_async_connect_args)
+# Objects must stay readable after commit without lazy IO outside the event loop.
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
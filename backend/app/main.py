@@ -7,6 +7,7 @@ from alembic.config import Config as AlembicConfig
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.config import get_settings
 from app.routers import (
     agents,
     auth,
@@ -19,8 +20,18 @@ from app.routers import (
     super_admin,
     webchat,
 )
+from app.services import (
+    agent_prompt_service,
+    directory_cache,
+    groq_clients,
+    ingestion_service,
+    message_writer,
+    presence_tracker,
+)
 from app.services.super_admin_seed import ensure_super_admins
 
+settings = get_settings()
+
 app = FastAPI(title="OnDuty API")
 
 origins = [
@@ -37,6 +48,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination metadata of the tenant list endpoints.
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 
@@ -55,6 +68,28 @@ async def startup_event():
     except Exception:
         logging.getLogger(__name__).exception("Failed to seed super admin users")
 
+    if settings.directory_cache_listen:
+        directory_cache.start_listener()
+
+    message_writer.start()
+    presence_tracker.start()
+    ingestion_service.start()
+
+    try:
+        warmed = agent_prompt_service.warm_prompt_cache()
+        logging.getLogger(__name__).info("Pre-rendered system prompts for %s active agents", warmed)
+    except Exception:
+        logging.getLogger(__name__).exception("Failed to pre-warm agent prompt cache")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await message_writer.stop()
+    await presence_tracker.stop()
+    await ingestion_service.stop()
+    directory_cache.stop_listener()
+    await groq_clients.close_clients()
+
 app.include_router(health.router)
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(billing.router, prefix="/api/billing", tags=["billing"])
@@ -8,3 +8,6 @@ from .token import EmailVerificationToken, PasswordResetToken  # noqa: F401
 from .user import User  # noqa: F401
 from .agent import Agent  # noqa: F401
 from .agent_document import AgentDocument  # noqa: F401
+from .usage_counter import TenantUsageCounter  # noqa: F401
+from .daily_stat import TenantDailyStat, TenantStatTotal  # noqa: F401
+from .agent_document_chunk import AgentDocumentChunk  # noqa: F401
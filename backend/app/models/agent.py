@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, String, JSON
+from sqlalchemy import Column, DateTime, ForeignKey, Index, String, JSON
 from sqlalchemy.dialects.postgresql import UUID
 
 from app.db import Base
@@ -9,6 +9,7 @@ from app.db import Base
 
 class Agent(Base):
     __tablename__ = "agents"
+    __table_args__ = (Index("ix_agents_tenant_status_created_at", "tenant_id", "status", "created_at"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), nullable=False)
@@ -28,6 +29,8 @@ class Agent(Base):
     model_provider = Column(String(50), nullable=False, default="groq")
     # Optional per-agent override. If null, we fall back to the configured default model.
     model_name = Column(String(100), nullable=True)
+    # Per-agent LLM call tuning (e.g. request hedging); see schemas.agent.ModelSettings
+    model_settings = Column(JSON, nullable=True)
 
     # How this agent is trained; we start with prompt-only
     training_mode = Column(
@@ -1,15 +1,24 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, LargeBinary, String
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, LargeBinary, String, Text, text
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import backref, deferred, relationship
 
 from app.db import Base
 
 
 class AgentDocument(Base):
     __tablename__ = "agent_documents"
+    __table_args__ = (
+        Index("ix_agent_documents_agent_created_at", "agent_id", "created_at"),
+        Index("ix_agent_documents_content_hash", "content_hash"),
+        Index(
+            "ix_agent_documents_ingestion_queue",
+            "created_at",
+            postgresql_where=text("ingestion_status IN ('pending', 'processing')"),
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     agent_id = Column(
@@ -21,8 +30,18 @@ class AgentDocument(Base):
     filename = Column(String(255), nullable=False)
     content_type = Column(String(100), nullable=False)
     size_bytes = Column(Integer, nullable=False)
-    data = Column(LargeBinary, nullable=False)
+    # SHA-256 of the file; the bytes live in the blob store (app/services/blob_store.py).
+    content_hash = Column(String(64), nullable=True)
+    # Legacy in-database copy, emptied by scripts/migrate_document_blobs.py. Never loaded with the
+    # row: reading it without `undefer(AgentDocument.data)` raises instead of fetching the blob.
+    data = deferred(Column(LargeBinary, nullable=True), raiseload=True)
+
+    # pending | processing | ready | failed (text extraction and chunking, see ingestion_service)
+    ingestion_status = Column(String(20), nullable=False, default="pending", server_default="pending")
+    ingestion_error = Column(Text, nullable=True)
+    ingestion_updated_at = Column(DateTime, nullable=True)
 
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
-    agent = relationship("Agent", backref="documents")
+    # `agent.documents` must be loaded explicitly (the rows are removed by the FK cascade).
+    agent = relationship("Agent", backref=backref("documents", lazy="raise", passive_deletes=True))
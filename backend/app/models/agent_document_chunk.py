@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, LargeBinary, String, Text
+from sqlalchemy.orm import deferred
+
+from app.db import Base
+
+
+class AgentDocumentChunk(Base):
+    """
+    One normalized, overlapping passage of a document's text. Keyed by the
+    content hash rather than the document, so every agent_documents row with
+    the same bytes shares one set of chunks (see ingestion_service).
+    """
+
+    __tablename__ = "agent_document_chunks"
+
+    content_hash = Column(String(64), primary_key=True)
+    chunk_index = Column(Integer, primary_key=True)
+    text = Column(Text, nullable=False)
+    # float16 vector of `text` and the embedder that produced it (embeddings.EmbeddingConfig.name).
+    embedding = deferred(Column(LargeBinary, nullable=True))
+    embedding_model = Column(String(200), nullable=True)
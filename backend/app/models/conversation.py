@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, String
+from sqlalchemy import Column, DateTime, ForeignKey, Index, String, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -10,6 +10,11 @@ from app.db import Base
 
 class Conversation(Base):
     __tablename__ = "conversations"
+    __table_args__ = (
+        Index("ix_conversations_tenant_started_at", "tenant_id", "started_at"),
+        Index("ix_conversations_customer_started_at", "customer_id", "started_at"),
+        Index("ix_conversations_agent_started_at", "agent_id", "started_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), nullable=False)
@@ -20,6 +25,10 @@ class Conversation(Base):
     status = Column(String, default="open", nullable=False)
     started_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     ended_at = Column(DateTime, nullable=True)
+    last_message_at = Column(DateTime, nullable=True)
+    # Rolling summary of every message up to and including summary_through_at
+    summary = Column(Text, nullable=True)
+    summary_through_at = Column(DateTime, nullable=True)
 
     tenant = relationship("Tenant", backref="conversations")
     customer = relationship("Customer", backref="conversations")
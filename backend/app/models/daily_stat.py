@@ -0,0 +1,35 @@
+from sqlalchemy import BigInteger, Column, Date, ForeignKey, String
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db import Base
+
+
+class TenantDailyStat(Base):
+    __tablename__ = "tenant_daily_stats"
+
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC
+    channel = Column(String, primary_key=True)
+    # Conversations without an agent are counted under the nil UUID (see stats_service.NO_AGENT)
+    agent_id = Column(UUID(as_uuid=True), primary_key=True)
+
+    conversations = Column(BigInteger, nullable=False, default=0)
+    messages = Column(BigInteger, nullable=False, default=0)
+    new_customers = Column(BigInteger, nullable=False, default=0)
+
+
+class TenantStatTotal(Base):
+    """
+    All-time sums of `tenant_daily_stats` per (tenant, channel), maintained
+    alongside it, plus the number of channel identities.
+    """
+
+    __tablename__ = "tenant_stat_totals"
+
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), primary_key=True)
+    channel = Column(String, primary_key=True)
+
+    conversations = Column(BigInteger, nullable=False, default=0)
+    messages = Column(BigInteger, nullable=False, default=0)
+    new_customers = Column(BigInteger, nullable=False, default=0)
+    channel_identities = Column(BigInteger, nullable=False, default=0)
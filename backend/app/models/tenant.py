@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String
 from sqlalchemy.dialects.postgresql import UUID
 
 from app.db import Base
@@ -9,6 +9,7 @@ from app.db import Base
 
 class Tenant(Base):
     __tablename__ = "tenants"
+    __table_args__ = (Index("ix_tenants_stripe_customer_id", "stripe_customer_id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, Date, DateTime, ForeignKey, String
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db import Base
+
+
+class TenantUsageCounter(Base):
+    __tablename__ = "tenant_usage_counters"
+
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), primary_key=True)
+    month = Column(Date, primary_key=True)  # first day of the (UTC) month
+    metric = Column(String(40), primary_key=True)  # conversations | messages
+    value = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
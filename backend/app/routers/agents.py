@@ -1,17 +1,27 @@
 import logging
 import re
 import uuid
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from urllib.parse import quote
 from uuid import UUID
 
-from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, UploadFile, status
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Header, HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, func
 
 from app.models.agent import Agent
 from app.models.agent_document import AgentDocument
-from app.schemas.agent import AgentCreate, AgentUpdate, AgentResponse, KnowledgeDocumentMetadata
-from app.services import email_service
+from app.schemas.agent import (
+    AgentCreate,
+    AgentResponse,
+    AgentUpdate,
+    KnowledgeDocumentMetadata,
+    PublicAgentResponse,
+)
+from app.services import directory_cache, document_service, email_service, ingestion_service
+from app.services.blob_store import BlobTooLarge, get_blob_store
 from app.utils.dependencies import get_current_user, get_db
 
 logger = logging.getLogger(__name__)
@@ -83,6 +93,7 @@ def create_agent(
     agent_type = payload.agent_type or "customer_service"
 
     agent = Agent(
+        id=uuid.uuid4(),
         tenant_id=tenant_id,
         name=payload.name,
         slug=slug,
@@ -92,9 +103,12 @@ def create_agent(
         customer_profile=payload.customer_profile.dict(),
         data_profile=payload.data_profile.dict() if payload.data_profile else None,
         allowed_websites=[w.dict() for w in (payload.allowed_websites or [])],
+        model_settings=payload.model_settings.dict() if payload.model_settings else None,
     )
     try:
         db.add(agent)
+        # A new agent may become the tenant's default agent for tenant-slug chats.
+        directory_cache.invalidate_agent(db, agent.id, tenant_id)
         db.commit()
     except Exception as exc:
         db.rollback()
@@ -116,16 +130,13 @@ def create_agent(
     return agent
 
 
-@router.get("/public/{slug}", response_model=AgentResponse)
+@router.get("/public/{slug}", response_model=PublicAgentResponse)
 def get_public_agent(slug: str, db: Session = Depends(get_db)):
     """Public endpoint to fetch an agent by slug without authentication."""
-    agent = (
-        db.query(Agent)
-        .filter(Agent.slug == slug, Agent.status != "disabled")
-        .first()
-    )
-    if not agent:
+    resolved = directory_cache.get_public_agent(db, slug)
+    if not resolved:
         raise HTTPException(status_code=404, detail="Agent not found")
+    agent, _ = resolved
     return agent
 
 
@@ -183,7 +194,10 @@ def update_agent(
         agent.data_profile = payload.data_profile.dict()
     if payload.allowed_websites is not None:
         agent.allowed_websites = [w.dict() for w in payload.allowed_websites]
+    if payload.model_settings is not None:
+        agent.model_settings = payload.model_settings.dict()
 
+    directory_cache.invalidate_agent(db, agent.id, agent.tenant_id)
     db.commit()
     db.refresh(agent)
     return agent
@@ -204,6 +218,7 @@ def disable_agent(
         raise HTTPException(status_code=404, detail="Agent not found")
 
     agent.status = "disabled"
+    directory_cache.invalidate_agent(db, agent.id, agent.tenant_id)
     db.commit()
     db.refresh(agent)
     return agent
@@ -226,7 +241,14 @@ def list_agent_documents(
         raise HTTPException(status_code=404, detail="Agent not found")
 
     docs = (
-        db.query(AgentDocument)
+        db.query(
+            AgentDocument.id,
+            AgentDocument.filename,
+            AgentDocument.content_type,
+            AgentDocument.size_bytes,
+            AgentDocument.ingestion_status,
+            AgentDocument.ingestion_error,
+        )
         .filter(AgentDocument.agent_id == agent_id)
         .order_by(AgentDocument.created_at.desc())
         .all()
@@ -237,14 +259,13 @@ def list_agent_documents(
             filename=doc.filename,
             content_type=doc.content_type,
             size_bytes=doc.size_bytes,
+            ingestion_status=doc.ingestion_status,
+            ingestion_error=doc.ingestion_error,
         )
         for doc in docs
     ]
 
 
-MAX_DOCUMENT_SIZE_BYTES = 10 * 1024 * 1024  # 10 MB
-
-
 @router.post("/{agent_id}/documents", response_model=KnowledgeDocumentMetadata)
 async def upload_agent_document(
     agent_id: UUID,
@@ -260,27 +281,108 @@ async def upload_agent_document(
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
-    data = await file.read()
-    if len(data) > MAX_DOCUMENT_SIZE_BYTES:
+    # Streams the spooled upload into the blob store; the file is never read into memory whole.
+    try:
+        doc = await run_in_threadpool(
+            document_service.store_document, db, agent.id, file.file, file.filename, file.content_type
+        )
+    except BlobTooLarge:
         raise HTTPException(status_code=400, detail="File too large (max 10MB)")
-
-    doc = AgentDocument(
-        agent_id=agent.id,
-        filename=file.filename,
-        content_type=file.content_type or "application/octet-stream",
-        size_bytes=len(data),
-        data=data,
-    )
-    db.add(doc)
-    db.commit()
-    db.refresh(doc)
+    ingestion_service.enqueue(doc.id)
 
     return KnowledgeDocumentMetadata(
         id=doc.id,
         filename=doc.filename,
         content_type=doc.content_type,
         size_bytes=doc.size_bytes,
+        ingestion_status=doc.ingestion_status,
+    )
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) of a single `bytes=` range. None (serve the whole
+    file) for anything else, including multi-range requests; 416 when the
+    range lies past the end of the file.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else max(start, size - 1)
+            if end < start:
+                return None
+        else:
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, min(end, size - 1)
+
+
+@router.get("/{agent_id}/documents/{document_id}/download")
+def download_agent_document(
+    agent_id: UUID,
+    document_id: UUID,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    agent = (
+        db.query(Agent.id)
+        .filter(Agent.id == agent_id, Agent.tenant_id == current_user.tenant.id)
+        .first()
+    )
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+
+    doc = (
+        db.query(
+            AgentDocument.filename,
+            AgentDocument.content_type,
+            AgentDocument.size_bytes,
+            AgentDocument.content_hash,
+        )
+        .filter(AgentDocument.id == document_id, AgentDocument.agent_id == agent_id)
+        .first()
     )
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    byte_range = _parse_range(range_header, doc.size_bytes) if range_header else None
+    start, end = byte_range or (0, doc.size_bytes - 1)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(end - start + 1),
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(doc.filename)}",
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{doc.size_bytes}"
+    status_code = status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK
+
+    if doc.content_hash:
+        store = get_blob_store()
+        if not store.exists(doc.content_hash):
+            raise HTTPException(status_code=404, detail="Document content not found")
+        headers["ETag"] = f'"{doc.content_hash}"'
+        body = store.read_chunks(doc.content_hash, start, end) if doc.size_bytes else iter(())
+    else:
+        # Not yet moved to the blob store: read just the requested slice of the column.
+        body = [
+            db.query(func.substring(AgentDocument.data, start + 1, end - start + 1))
+            .filter(AgentDocument.id == document_id)
+            .scalar()
+            or b""
+        ]
+    return StreamingResponse(body, status_code=status_code, media_type=doc.content_type, headers=headers)
 
 
 @router.delete("/{agent_id}/documents/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -306,6 +408,5 @@ def delete_agent_document(
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    db.delete(doc)
-    db.commit()
+    document_service.delete_document(db, doc)
     return None
@@ -9,7 +9,7 @@ from app.config import get_settings
 from app.models.tenant import Tenant
 from app.models.user import User
 from app.schemas.billing import CheckoutRequest, CheckoutResponse
-from app.services import email_service
+from app.services import directory_cache, email_service
 from app.utils.dependencies import get_current_user, get_db
 
 router = APIRouter()
@@ -165,6 +165,7 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
             tenant.stripe_subscription_id = subscription_id
             tenant.billing_status = "active"
             db.add(tenant)
+            directory_cache.invalidate_tenant(db, tenant.id)
             db.commit()
 
             primary_user = db.query(User).filter(User.tenant_id == tenant.id).order_by(User.id.asc()).first()
@@ -181,6 +182,7 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
             if tenant:
                 tenant.billing_status = "active"
                 db.add(tenant)
+                directory_cache.invalidate_tenant(db, tenant.id)
                 db.commit()
 
                 primary_user = (
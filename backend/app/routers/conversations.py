@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from uuid import UUID
 
 from app.schemas.conversation import ConversationDetail, ConversationOut
-from app.services import conversation_service
+from app.services import conversation_service, stats_service
 from app.utils.dependencies import get_current_user, get_db
 
 router = APIRouter()
@@ -11,14 +13,22 @@ router = APIRouter()
 
 @router.get("", response_model=list[ConversationOut])
 def list_conversations(
+    response: Response,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page; replaces `page`"),
+    include_total: bool = Query(False, description="Send an approximate X-Total-Count"),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
-    conversations = conversation_service.list_conversations(
-        db, tenant_id=current_user.tenant.id, page=page, page_size=page_size
+    conversations, next_cursor = conversation_service.list_conversations(
+        db, tenant_id=current_user.tenant.id, page=page, page_size=page_size, cursor=cursor
     )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if include_total:
+        totals = stats_service.get_totals(db, current_user.tenant.id)
+        response.headers["X-Total-Count"] = str(totals["conversations"])
     return conversations
 
 
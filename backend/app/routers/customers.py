@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from uuid import UUID
 
 from app.schemas.customer import CustomerOut
-from app.services import customer_service
+from app.services import customer_service, stats_service
 from app.utils.dependencies import get_current_user, get_db
 
 router = APIRouter()
@@ -11,12 +13,22 @@ router = APIRouter()
 
 @router.get("", response_model=list[CustomerOut])
 def list_customers(
+    response: Response,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page; replaces `page`"),
+    include_total: bool = Query(False, description="Send an approximate X-Total-Count"),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
-    customers = customer_service.list_customers(db, tenant_id=current_user.tenant.id, page=page, page_size=page_size)
+    customers, next_cursor = customer_service.list_customers(
+        db, tenant_id=current_user.tenant.id, page=page, page_size=page_size, cursor=cursor
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if include_total:
+        totals = stats_service.get_totals(db, current_user.tenant.id)
+        response.headers["X-Total-Count"] = str(totals["new_customers"])
     return customers
 
 
@@ -1,15 +1,11 @@
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import List
 
 from fastapi import APIRouter, Depends
 import logging
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from app.models.channel_identity import ChannelIdentity
-from app.models.conversation import Conversation
-from app.models.customer import Customer
-from app.models.message import Message
 from app.models.user import User
 from app.schemas.dashboard import (
     ChannelBreakdown,
@@ -19,6 +15,7 @@ from app.schemas.dashboard import (
     PlanDetails,
     UsageMetrics,
 )
+from app.services import stats_service, usage_service
 from app.services.plan_limits import get_plan_limits
 from app.utils.dependencies import get_current_user, get_db
 
@@ -49,63 +46,33 @@ def get_dashboard_metrics(
 
     tenant_id = tenant.id
 
-    current_month_conversations = (
-        db.query(func.count(Conversation.id))
-        .filter(
-            Conversation.tenant_id == tenant_id,
-            Conversation.started_at >= start_month,
-        )
-        .scalar()
-        or 0
-    )
-
-    current_month_messages = (
-        db.query(func.count(Message.id))
-        .join(Conversation, Message.conversation_id == Conversation.id)
-        .filter(
-            Conversation.tenant_id == tenant_id,
-            Message.created_at >= start_month,
-        )
-        .scalar()
-        or 0
-    )
-
-    customers_count = (
-        db.query(func.count(Customer.id)).filter(Customer.tenant_id == tenant_id).scalar() or 0
-    )
-
-    connected_channels_count = (
-        db.query(func.count(ChannelIdentity.id))
-        .filter(ChannelIdentity.tenant_id == tenant_id)
-        .scalar()
-        or 0
-    )
+    # Same counters the webchat plan-limit check uses.
+    month_usage = usage_service.get_usage(db, tenant_id, month=start_month.date())
+    current_month_conversations = month_usage[usage_service.METRIC_CONVERSATIONS]
+    current_month_messages = month_usage[usage_service.METRIC_MESSAGES]
 
     seats_used = db.query(func.count(User.id)).filter(User.tenant_id == tenant_id).scalar() or 0
 
-    daily_rows: List[tuple] = (
-        db.query(func.date(Conversation.started_at), func.count(Conversation.id))
-        .filter(
-            Conversation.tenant_id == tenant_id,
-            Conversation.started_at >= start_30_days,
-        )
-        .group_by(func.date(Conversation.started_at))
-        .order_by(func.date(Conversation.started_at))
-        .all()
-    )
+    # Everything else comes from the stats rollups: all-time totals per channel, and the
+    # daily rows of the 30-day window.
+    channel_totals = stats_service.get_channel_totals(db, tenant_id)
+    customers_count = sum(totals["new_customers"] for totals in channel_totals.values())
+    connected_channels_count = sum(totals["channel_identities"] for totals in channel_totals.values())
+    channel_counts = {
+        channel: totals["conversations"] for channel, totals in channel_totals.items() if totals["conversations"]
+    }
+    daily_counts = defaultdict(int)
+    for day, _channel, conversations, _messages, _new_customers in stats_service.get_daily_totals(
+        db, tenant_id, since=start_30_days.date()
+    ):
+        if conversations:
+            daily_counts[day] += conversations
+
     daily_conversations_last_30_days = [
-        {"date": row[0], "count": row[1]} for row in daily_rows
+        {"date": day, "count": count} for day, count in sorted(daily_counts.items())
     ]
-
-    channel_rows: List[tuple] = (
-        db.query(Conversation.channel, func.count(Conversation.id))
-        .filter(Conversation.tenant_id == tenant_id)
-        .group_by(Conversation.channel)
-        .all()
-    )
     conversations_by_channel = [
-        ChannelBreakdown(channel=(row[0] or "unknown"), count=row[1])
-        for row in channel_rows
+        ChannelBreakdown(channel=channel, count=count) for channel, count in channel_counts.items()
     ]
 
     plan = PlanDetails(
@@ -8,11 +8,10 @@ from pydantic import BaseModel, EmailStr
 from sqlalchemy.exc import OperationalError, ProgrammingError
 from sqlalchemy.orm import Session
 
-from app.models.agent import Agent
-from app.models.tenant import Tenant
 from app.schemas.customer import CustomerOut
-from app.services import verification_service
-from app.services.tenant_service import ensure_demo_tenant, get_tenant_by_slug
+from app.services import directory_cache, verification_service
+from app.services.directory_cache import TenantSnapshot
+from app.services.tenant_service import ensure_demo_tenant
 from app.utils.dependencies import get_db
 from app.utils.security import create_access_token, decode_token
 from app.config import get_settings
@@ -47,21 +46,17 @@ class ConfirmVerificationResponse(BaseModel):
     customer: CustomerOut
 
 
-def _resolve_tenant(db: Session, tenant_slug: Optional[str], agent_slug: Optional[str]) -> Tenant:
-    tenant: Optional[Tenant] = None
+def _resolve_tenant(db: Session, tenant_slug: Optional[str], agent_slug: Optional[str]) -> TenantSnapshot:
+    tenant: Optional[TenantSnapshot] = None
     if agent_slug:
-        agent = (
-            db.query(Agent)
-            .filter(Agent.slug == agent_slug, Agent.status != "disabled")
-            .first()
-        )
-        if not agent:
+        resolved = directory_cache.get_public_agent(db, agent_slug)
+        if not resolved:
             raise HTTPException(status_code=404, detail="Agent not found")
-        tenant = db.query(Tenant).filter(Tenant.id == agent.tenant_id).first()
+        _, tenant = resolved
     elif tenant_slug:
-        tenant = get_tenant_by_slug(db, tenant_slug)
+        tenant = directory_cache.get_tenant_by_slug(db, tenant_slug)
         if not tenant and tenant_slug == settings.demo_tenant_slug:
-            tenant = ensure_demo_tenant(db)
+            tenant = directory_cache.remember_tenant(ensure_demo_tenant(db))
     if not tenant:
         raise HTTPException(status_code=404, detail="Tenant not found")
     return tenant
@@ -4,7 +4,7 @@ from typing import Optional
 from uuid import UUID
 
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
-from sqlalchemy import func, or_
+from sqlalchemy import Boolean, DateTime, String, cast, func, literal, null, select, union_all
 from sqlalchemy.orm import Session
 
 from app.config import get_settings
@@ -24,6 +24,10 @@ from app.schemas.super_admin import (
     ChatUserDetail,
     ChatUserListItem,
     ChatUserListResponse,
+    HedgeStatsResponse,
+    LLMClientPoolResponse,
+    ModelHealth,
+    ModelHealthResponse,
     OverviewMetrics,
     TenantDetail,
     TenantListItem,
@@ -35,9 +39,18 @@ from app.schemas.super_admin import (
     UpdateUserRequest,
     UserListItem,
 )
-from app.services import auth_service, email_service
+from app.services import (
+    auth_service,
+    directory_cache,
+    email_service,
+    groq_clients,
+    model_health,
+    presence_tracker,
+    search_service,
+)
 from app.services.tenant_service import create_tenant as create_tenant_service
 from app.utils.dependencies import get_db, require_super_admin
+from app.utils.pagination import estimate_count, paginate
 from app.utils.security import hash_password
 
 router = APIRouter(prefix="", tags=["super-admin"])
@@ -45,10 +58,53 @@ logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
-def _paginate(query, page: int, page_size: int):
-    total = query.count()
-    items = query.offset((page - 1) * page_size).limit(page_size).all()
-    return items, total
+def _paginate(
+    db: Session,
+    query,
+    sort_column,
+    id_column,
+    page: int,
+    page_size: int,
+    cursor: Optional[str],
+    key=None,
+    rank=None,
+):
+    """
+    One newest-first page plus its pagination block. Page mode keeps the exact
+    COUNT; cursor mode reports the planner's estimate instead of counting.
+
+    Search results (`rank` given) come best match first. They are capped at
+    `SEARCH_MAX_CANDIDATES` rows, so they are paged by `page` only.
+    """
+    if rank is not None:
+        total = query.count()
+        items = (
+            query.order_by(rank.desc(), sort_column.desc(), id_column.desc())
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+            .all()
+        )
+        pagination = {
+            "total": total,
+            "total_is_estimate": total >= settings.search_max_candidates,
+            "page": page,
+            "page_size": page_size,
+        }
+        return items, pagination
+
+    if cursor:
+        total, estimated = estimate_count(db, query), True
+    else:
+        total, estimated = query.count(), False
+    items, next_cursor = paginate(query, sort_column, id_column, page_size, page=page, cursor=cursor, key=key)
+    pagination = {
+        "total": total,
+        "total_is_estimate": estimated,
+        "page": page,
+        "page_size": page_size,
+        "next_cursor": next_cursor,
+    }
+    return items, pagination
 
 
 @router.post("/request-password-reset")
@@ -112,6 +168,7 @@ def get_overview(db: Session = Depends(get_db), _: User = Depends(require_super_
 def list_tenants(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces `page`"),
     search: Optional[str] = None,
     status: Optional[str] = Query(None, description="Filter by billing status"),
     plan: Optional[str] = Query(None, description="Filter by plan type"),
@@ -120,18 +177,23 @@ def list_tenants(
     _: User = Depends(require_super_admin),
 ):
     try:
-        query = db.query(Tenant)
-        if search:
-            term = f"%{search.lower()}%"
-            query = query.filter(func.lower(Tenant.name).like(term) | func.lower(Tenant.slug).like(term))
+        criteria = []
         if status:
-            query = query.filter(Tenant.billing_status == status)
+            criteria.append(Tenant.billing_status == status)
         if plan:
-            query = query.filter(Tenant.plan_type == plan)
+            criteria.append(Tenant.plan_type == plan)
         if special is not None:
-            query = query.filter(Tenant.is_special_permissioned == special)
+            criteria.append(Tenant.is_special_permissioned == special)
+
+        rank = None
+        if search:
+            matches = search_service.ranked_matches(Tenant, search, *criteria)
+            query = db.query(Tenant).join(matches, matches.c.id == Tenant.id)
+            rank = matches.c.rank
+        else:
+            query = db.query(Tenant).filter(*criteria)
 
-        items, total = _paginate(query.order_by(Tenant.created_at.desc()), page, page_size)
+        items, pagination = _paginate(db, query, Tenant.created_at, Tenant.id, page, page_size, cursor, rank=rank)
         tenant_ids = [t.id for t in items]
 
         agent_counts = {
@@ -192,9 +254,9 @@ def list_tenants(
             )
             for t in items
         ]
-        return TenantListResponse(
-            items=payload_items, pagination={"total": total, "page": page, "page_size": page_size}
-        )
+        return TenantListResponse(items=payload_items, pagination=pagination)
+    except HTTPException:
+        raise
     except Exception:
         logger.exception("Failed to list tenants")
         raise HTTPException(
@@ -354,15 +416,80 @@ def update_tenant(
         tenant.card_required = payload.card_required
 
     db.add(tenant)
+    directory_cache.invalidate_tenant(db, tenant.id)
     db.commit()
     db.refresh(tenant)
     return tenant_detail(tenant_id, db)
 
 
+def _search_branch(model, columns, criteria, q: Optional[str]):
+    """One UNION branch: filtered by `criteria`, or ranked search matches (with a `rank` column) when `q` is set."""
+    if not q:
+        return select(*columns).where(*criteria)
+    matches = search_service.ranked_matches(model, q, *criteria)
+    return select(*columns, matches.c.rank.label("rank")).join(matches, matches.c.id == model.id)
+
+
+def _unified_users_query(db: Session, tenant_id: Optional[UUID], user_type: Optional[str], q: Optional[str]):
+    """
+    Platform users and chat users projected onto one row shape and combined
+    with UNION ALL, so sorting and paging happen in Postgres. Returns
+    (query, subquery), or None when `user_type` selects neither.
+    """
+    branches = []
+
+    if user_type in (None, "platform"):
+        columns = [
+            User.id.label("id"),
+            literal("platform").label("user_type"),
+            User.tenant_id.label("tenant_id"),
+            User.name.label("full_name"),
+            User.email.label("email"),
+            cast(null(), String).label("phone"),
+            User.role.label("role"),
+            User.is_active.label("is_active"),
+            User.email_verified.label("email_verified"),
+            User.last_login.label("last_login"),
+            cast(null(), String).label("source"),
+            cast(null(), DateTime).label("last_seen_at"),
+            User.created_at.label("created_at"),
+        ]
+        criteria = [User.tenant_id == tenant_id] if tenant_id else []
+        branches.append(_search_branch(User, columns, criteria, q))
+
+    if user_type in (None, "chat"):
+        columns = [
+            Customer.id.label("id"),
+            literal("chat").label("user_type"),
+            Customer.tenant_id.label("tenant_id"),
+            func.coalesce(
+                func.nullif(func.trim(func.concat_ws(" ", Customer.first_name, Customer.last_name)), ""),
+                Customer.full_name,
+            ).label("full_name"),
+            Customer.email.label("email"),
+            Customer.primary_phone.label("phone"),
+            cast(null(), String).label("role"),
+            cast(null(), Boolean).label("is_active"),
+            cast(null(), Boolean).label("email_verified"),
+            cast(null(), DateTime).label("last_login"),
+            Customer.source.label("source"),
+            Customer.last_seen_at.label("last_seen_at"),
+            Customer.created_at.label("created_at"),
+        ]
+        criteria = [Customer.tenant_id == tenant_id] if tenant_id else []
+        branches.append(_search_branch(Customer, columns, criteria, q))
+
+    if not branches:
+        return None
+    unified = (union_all(*branches) if len(branches) > 1 else branches[0]).subquery("unified_users")
+    return db.query(unified), unified
+
+
 @router.get("/users", response_model=UnifiedUserListResponse)
 def list_users(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces `page`"),
     tenant_id: Optional[UUID] = None,
     user_type: Optional[str] = Query(None, description="platform or chat"),
     q: Optional[str] = Query(None, description="Search by email, name, or phone"),
@@ -370,88 +497,52 @@ def list_users(
     _: User = Depends(require_super_admin),
 ):
     try:
-        platform_rows = []
-        chat_rows = []
-
-        if user_type in (None, "platform"):
-            platform_query = db.query(User, Tenant.name.label("tenant_name")).join(
-                Tenant, Tenant.id == User.tenant_id
-            )
-            if tenant_id:
-                platform_query = platform_query.filter(User.tenant_id == tenant_id)
-            if q:
-                term = f"%{q.lower()}%"
-                platform_query = platform_query.filter(
-                    or_(
-                        func.lower(User.email).like(term),
-                        func.lower(func.coalesce(User.name, "")).like(term),
-                    )
-                )
-            platform_rows = platform_query.all()
-
-        if user_type in (None, "chat"):
-            chat_query = db.query(Customer, Tenant.name.label("tenant_name")).join(
-                Tenant, Tenant.id == Customer.tenant_id
+        resolved = _unified_users_query(db, tenant_id, user_type, q)
+        if resolved is None:
+            return UnifiedUserListResponse(
+                items=[], pagination={"total": 0, "page": page, "page_size": page_size}
             )
-            if tenant_id:
-                chat_query = chat_query.filter(Customer.tenant_id == tenant_id)
-            if q:
-                term = f"%{q.lower()}%"
-                chat_query = chat_query.filter(
-                    or_(
-                        func.lower(func.coalesce(Customer.email, "")).like(term),
-                        func.lower(func.coalesce(Customer.first_name, "")).like(term),
-                        func.lower(func.coalesce(Customer.last_name, "")).like(term),
-                        func.lower(func.coalesce(Customer.primary_phone, "")).like(term),
-                    )
-                )
-            chat_rows = chat_query.all()
-
-        items: list[UnifiedUserListItem] = []
-
-        for u, tenant_name in platform_rows:
-            items.append(
-                UnifiedUserListItem(
-                    id=u.id,
-                    user_type="platform",
-                    tenant_id=u.tenant_id,
-                    tenant_name=tenant_name,
-                    full_name=u.name,
-                    email=u.email,
-                    role=u.role,
-                    is_active=u.is_active,
-                    email_verified=u.email_verified,
-                    last_login=u.last_login,
-                    created_at=u.created_at,
-                )
-            )
-
-        for c, tenant_name in chat_rows:
-            full_name = " ".join([c.first_name or "", c.last_name or ""]).strip() or None
-            items.append(
-                UnifiedUserListItem(
-                    id=c.id,
-                    user_type="chat",
-                    tenant_id=c.tenant_id,
-                    tenant_name=tenant_name,
-                    full_name=full_name or c.full_name,
-                    email=c.email,
-                    phone=c.primary_phone,
-                    source=c.source,
-                    last_seen_at=c.last_seen_at,
-                    created_at=c.created_at,
-                )
-            )
-
-        items.sort(key=lambda x: x.created_at, reverse=True)
-        total = len(items)
-        start = (page - 1) * page_size
-        end = start + page_size
-        paged = items[start:end]
+        query, unified = resolved
+        rows, pagination = _paginate(
+            db,
+            query,
+            unified.c.created_at,
+            unified.c.id,
+            page,
+            page_size,
+            cursor,
+            rank=unified.c.rank if q else None,
+        )
 
-        return UnifiedUserListResponse(
-            items=paged, pagination={"total": total, "page": page, "page_size": page_size}
+        tenant_ids = {row.tenant_id for row in rows if row.tenant_id}
+        tenant_names = (
+            dict(db.query(Tenant.id, Tenant.name).filter(Tenant.id.in_(tenant_ids)).all()) if tenant_ids else {}
         )
+
+        items = [
+            UnifiedUserListItem(
+                id=row.id,
+                user_type=row.user_type,
+                tenant_id=row.tenant_id,
+                tenant_name=tenant_names.get(row.tenant_id),
+                full_name=row.full_name,
+                email=row.email,
+                phone=row.phone,
+                role=row.role,
+                is_active=row.is_active,
+                email_verified=row.email_verified,
+                last_login=row.last_login,
+                source=row.source,
+                last_seen_at=(
+                    presence_tracker.last_seen(row.id, row.last_seen_at) if row.user_type == "chat" else None
+                ),
+                created_at=row.created_at,
+            )
+            for row in rows
+        ]
+        return UnifiedUserListResponse(items=items, pagination=pagination)
+    except HTTPException:
+        raise
     except Exception:
         logger.exception("Failed to list unified users")
         raise HTTPException(
@@ -617,7 +708,7 @@ def _load_chat_user_detail(db: Session, chat_user_id: UUID) -> ChatUserDetail:
         phone=row.Customer.primary_phone,
         source=row.Customer.source,
         created_at=row.Customer.created_at,
-        last_seen_at=row.Customer.last_seen_at,
+        last_seen_at=presence_tracker.last_seen(row.Customer.id, row.Customer.last_seen_at),
         total_conversations=len(conversations),
         total_messages=message_total,
         conversations=[
@@ -655,6 +746,7 @@ def get_chat_user_from_users(
 def list_chat_users(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces `page`"),
     tenant_id: Optional[UUID] = None,
     search: Optional[str] = None,
     source: Optional[str] = None,
@@ -662,23 +754,33 @@ def list_chat_users(
     _: User = Depends(require_super_admin),
 ):
     try:
+        criteria = []
+        if tenant_id:
+            criteria.append(Customer.tenant_id == tenant_id)
+        if source:
+            criteria.append(Customer.source == source)
+
         query = db.query(Customer, Tenant.name.label("tenant_name")).join(
             Tenant, Tenant.id == Customer.tenant_id
         )
-        if tenant_id:
-            query = query.filter(Customer.tenant_id == tenant_id)
+        rank = None
         if search:
-            term = f"%{search.lower()}%"
-            query = query.filter(func.lower(Customer.email).like(term))
-        if source:
-            query = query.filter(Customer.source == source)
-
-        total = query.count()
-        rows = (
-            query.order_by(Customer.created_at.desc())
-            .offset((page - 1) * page_size)
-            .limit(page_size)
-            .all()
+            matches = search_service.ranked_matches(Customer, search, *criteria)
+            query = query.join(matches, matches.c.id == Customer.id)
+            rank = matches.c.rank
+        else:
+            query = query.filter(*criteria)
+
+        rows, pagination = _paginate(
+            db,
+            query,
+            Customer.created_at,
+            Customer.id,
+            page,
+            page_size,
+            cursor,
+            key=lambda row: (row.Customer.created_at, row.Customer.id),
+            rank=rank,
         )
 
         customer_ids = [row.Customer.id for row in rows]
@@ -712,15 +814,15 @@ def list_chat_users(
                 phone=row.Customer.primary_phone,
                 source=row.Customer.source,
                 created_at=row.Customer.created_at,
-                last_seen_at=row.Customer.last_seen_at,
+                last_seen_at=presence_tracker.last_seen(row.Customer.id, row.Customer.last_seen_at),
                 total_conversations=conversation_counts.get(row.Customer.id, 0),
                 total_messages=message_counts.get(row.Customer.id, 0),
             )
             for row in rows
         ]
-        return ChatUserListResponse(
-            items=items, pagination={"total": total, "page": page, "page_size": page_size}
-        )
+        return ChatUserListResponse(items=items, pagination=pagination)
+    except HTTPException:
+        raise
     except Exception:
         logger.exception("Failed to list chat users")
         raise HTTPException(
@@ -748,6 +850,7 @@ def get_chat_user(
 def list_agents(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces `page`"),
     tenant_id: Optional[UUID] = None,
     agent_type: Optional[str] = None,
     status: Optional[str] = None,
@@ -762,8 +865,16 @@ def list_agents(
     if status:
         query = query.filter(Agent.status == status)
 
-    total = query.count()
-    rows = query.order_by(Agent.created_at.desc()).offset((page - 1) * page_size).limit(page_size).all()
+    rows, pagination = _paginate(
+        db,
+        query,
+        Agent.created_at,
+        Agent.id,
+        page,
+        page_size,
+        cursor,
+        key=lambda row: (row.Agent.created_at, row.Agent.id),
+    )
     items = [
         AgentListItem(
             id=row.Agent.id,
@@ -777,7 +888,7 @@ def list_agents(
         )
         for row in rows
     ]
-    return AgentListResponse(items=items, pagination={"total": total, "page": page, "page_size": page_size})
+    return AgentListResponse(items=items, pagination=pagination)
 
 
 @router.get("/agents/{agent_id}", response_model=AgentDetail)
@@ -827,7 +938,32 @@ def update_agent(
         agent.status = payload.status
 
     db.add(agent)
+    directory_cache.invalidate_agent(db, agent.id, agent.tenant_id)
     db.commit()
     db.refresh(agent)
 
     return get_agent(agent_id, db)
+
+
+@router.get("/ai/clients", response_model=LLMClientPoolResponse)
+def get_llm_client_pool(_: User = Depends(require_super_admin)):
+    return LLMClientPoolResponse(clients=groq_clients.client_pool_stats())
+
+
+@router.get("/ai/models", response_model=ModelHealthResponse)
+def get_model_health(_: User = Depends(require_super_admin)):
+    """Circuit breaker state per Groq model, as seen by the worker serving this request."""
+    return ModelHealthResponse(models=model_health.breaker_states())
+
+
+@router.post("/ai/models/{model_name:path}/reset", response_model=ModelHealth)
+def reset_model_breaker(model_name: str, _: User = Depends(require_super_admin)):
+    if not model_health.reset_breaker(model_name):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Model not tracked")
+    return model_health.get_breaker(model_name).snapshot()
+
+
+@router.get("/ai/hedging", response_model=HedgeStatsResponse)
+def get_hedge_stats(_: User = Depends(require_super_admin)):
+    """Hedged-request counters per agent (this worker): how often the budget fired and the hedge won."""
+    return HedgeStatsResponse(agents=model_health.hedge_stats())
@@ -1,18 +1,34 @@
-from typing import Optional
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
 from datetime import datetime
 
 from pydantic import BaseModel
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.models.agent import Agent
 from app.models.customer import Customer
-from app.models.tenant import Tenant
+from app.models.message import Message
 from app.config import get_settings
-from app.services import ai_service, conversation_service, customer_service
-from app.services.tenant_service import ensure_demo_tenant, get_tenant_by_slug
+from app.services import (
+    ai_service,
+    conversation_service,
+    customer_service,
+    directory_cache,
+    message_writer,
+    presence_tracker,
+    stats_service,
+    summary_service,
+    usage_service,
+)
+from app.services.directory_cache import AgentSnapshot, TenantSnapshot
+from app.services.tenant_service import ensure_demo_tenant
 from app.utils import security
-from app.utils.dependencies import get_db
+from app.utils.dependencies import get_async_db
 
 router = APIRouter()
 settings = get_settings()
@@ -27,37 +43,35 @@ class WebChatRequest(BaseModel):
     end_user_token: Optional[str] = None
 
 
-@router.post("/send")
-def send_message(payload: WebChatRequest, db: Session = Depends(get_db)):
-    tenant: Optional[Tenant] = None
-    agent: Optional[Agent] = None
+def _resolve_tenant_and_agent(
+    db: Session, payload: WebChatRequest
+) -> Tuple[TenantSnapshot, Optional[AgentSnapshot], str]:
+    tenant: Optional[TenantSnapshot] = None
+    agent: Optional[AgentSnapshot] = None
 
     if payload.agent_slug:
-        agent = (
-            db.query(Agent)
-            .filter(Agent.slug == payload.agent_slug, Agent.status != "disabled")
-            .first()
-        )
-        if not agent:
+        resolved = directory_cache.get_public_agent(db, payload.agent_slug)
+        if not resolved:
             raise HTTPException(status_code=404, detail="Agent not found")
-
-        tenant = db.query(Tenant).filter(Tenant.id == agent.tenant_id).first()
-        if not tenant:
-            raise HTTPException(status_code=404, detail="Tenant not found")
+        agent, tenant = resolved
 
         agent_type = agent.agent_type or "customer_service"
     else:
         if not payload.tenant_slug:
             raise HTTPException(status_code=400, detail="tenant_slug or agent_slug is required")
 
-        tenant = get_tenant_by_slug(db, payload.tenant_slug)
+        tenant = directory_cache.get_tenant_by_slug(db, payload.tenant_slug)
         if not tenant and payload.tenant_slug == settings.demo_tenant_slug:
-            tenant = ensure_demo_tenant(db)
+            tenant = directory_cache.remember_tenant(ensure_demo_tenant(db))
         if not tenant:
             raise HTTPException(status_code=404, detail="Tenant not found")
 
         agent_type = "customer_service"
 
+    return tenant, agent, agent_type
+
+
+def _resolve_customer(db: Session, tenant: TenantSnapshot, payload: WebChatRequest) -> Customer:
     customer = None
     if payload.end_user_token:
         data = security.decode_token(payload.end_user_token)
@@ -69,33 +83,174 @@ def send_message(payload: WebChatRequest, db: Session = Depends(get_db)):
 
     if not customer:
         customer = customer_service.get_or_create_customer(
-            db, tenant_id=tenant.id, channel=payload.channel, external_id=payload.session_id
+            db, tenant_id=tenant.id, channel=payload.channel, external_id=payload.session_id, commit=False
         )
 
-    customer.last_seen_at = datetime.utcnow()
-    db.add(customer)
-    db.commit()
-
-    conversation = conversation_service.create_conversation(
-        db,
-        tenant_id=tenant.id,
-        customer_id=customer.id,
-        channel=payload.channel,
-        agent_type=agent_type,
-        agent_id=agent.id if agent else None,
+    now = datetime.utcnow()
+    # Presence is flushed in batches by the tracker; write it inline only when it is not running.
+    if not presence_tracker.touch(customer.id, now):
+        customer.last_seen_at = now
+        db.add(customer)
+    return customer
+
+
+@dataclass
+class _Turn:
+    tenant: TenantSnapshot
+    agent: Optional[AgentSnapshot]
+    customer: Customer
+    conversation: conversation_service.SessionConversation
+    summary: Optional[str]
+    history: List[Message]
+
+    def needs_summary_refresh(self) -> bool:
+        # Unsummarized messages once this turn's user and AI messages are stored.
+        return summary_service.should_refresh(len(self.history) + 2)
+
+
+def _start_turn(db: Session, payload: WebChatRequest) -> _Turn:
+    """
+    Resolve everything the reply needs and record the user's message.
+
+    The customer touch (or creation), a new conversation, the user message and
+    the usage counter and daily stats increments are written in a single transaction; the AI
+    reply goes through the write-behind `message_writer` and is batched with
+    other replies. Starting a conversation past the plan's monthly limit is
+    refused with 402.
+    """
+    tenant, agent, agent_type = _resolve_tenant_and_agent(db, payload)
+    customer = _resolve_customer(db, tenant, payload)
+
+    agent_id = agent.id if agent else None
+    try:
+        conversation = conversation_service.resolve_session_conversation(
+            db,
+            tenant_id=tenant.id,
+            customer_id=customer.id,
+            channel=payload.channel,
+            session_id=payload.session_id,
+            agent_type=agent_type,
+            agent_id=agent_id,
+            commit=False,
+        )
+        if conversation.created and usage_service.conversation_limit_reached(db, tenant):
+            raise HTTPException(
+                status_code=402,
+                detail="This workspace has reached its monthly conversation limit.",
+            )
+        summary, history = conversation_service.get_conversation_context(
+            db, conversation_id=conversation.id, limit=settings.webchat_history_messages
+        )
+        history = message_writer.merge_pending(conversation.id, history)
+
+        conversation_service.add_message(
+            db, conversation_id=conversation.id, sender="user", text=payload.text, commit=False
+        )
+        usage_service.increment(
+            db,
+            tenant.id,
+            {
+                usage_service.METRIC_CONVERSATIONS: int(conversation.created),
+                usage_service.METRIC_MESSAGES: 1,
+            },
+        )
+        stats_service.record(db, tenant.id, payload.channel, agent_id, messages=1)
+        db.commit()
+    except Exception:
+        db.rollback()
+        usage_service.forget(tenant.id)
+        conversation_service.forget_session_conversation(
+            tenant.id, customer.id, agent_id, payload.channel, payload.session_id
+        )
+        raise
+    return _Turn(
+        tenant=tenant,
+        agent=agent,
+        customer=customer,
+        conversation=conversation,
+        summary=summary,
+        history=history,
     )
 
-    user_message = conversation_service.add_message(db, conversation_id=conversation.id, sender="user", text=payload.text)
-    reply_text = ai_service.generate_reply(
-        tenant,
-        conversation.agent_type,
+
+@router.post("/send")
+async def send_message(
+    payload: WebChatRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+):
+    turn = await db.run_sync(_start_turn, payload)
+
+    reply_text = await ai_service.generate_reply_async(
+        turn.tenant,
+        turn.conversation.agent_type,
         [payload.text],
-        agent=agent,
+        agent=turn.agent,
+        history=turn.history,
+        summary=turn.summary,
     )
-    ai_message = conversation_service.add_message(db, conversation_id=conversation.id, sender="ai", text=reply_text)
+    await message_writer.write_message(turn.conversation.id, sender="ai", text=reply_text)
+    if turn.needs_summary_refresh():
+        background_tasks.add_task(summary_service.refresh_summary, turn.conversation.id)
 
     return {
         "reply": reply_text,
-        "conversation_id": str(conversation.id),
-        "customer_id": str(customer.id),
+        "conversation_id": str(turn.conversation.id),
+        "customer_id": str(turn.customer.id),
     }
+
+
+@router.post("/send/stream")
+async def send_message_stream(payload: WebChatRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Streaming variant of `/send`.
+
+    Responds with newline-delimited JSON events:
+    - {"type": "delta", "text": "..."} for each token chunk.
+    - {"type": "reset"} when the text streamed so far must be discarded
+      (the primary model failed mid-stream and a fallback takes over).
+    - {"type": "done", "reply": "...", "conversation_id": "...", "customer_id": "..."}
+      once the reply is complete and queued for persistence.
+    """
+    turn = await db.run_sync(_start_turn, payload)
+    conversation_id = turn.conversation.id
+    customer_id = turn.customer.id
+
+    async def event_stream():
+        parts: List[str] = []
+        completed = False
+        try:
+            async for event in ai_service.stream_reply(
+                turn.tenant,
+                turn.conversation.agent_type,
+                [payload.text],
+                agent=turn.agent,
+                history=turn.history,
+                summary=turn.summary,
+            ):
+                if event["type"] == "reset":
+                    parts.clear()
+                else:
+                    parts.append(event["text"])
+                yield json.dumps(event) + "\n"
+            completed = True
+        finally:
+            # Persist whatever was generated, even if the client went away mid-stream.
+            reply_text = "".join(parts)
+            if reply_text:
+                await asyncio.shield(message_writer.write_message(conversation_id, sender="ai", text=reply_text))
+
+        if completed:
+            yield json.dumps(
+                {
+                    "type": "done",
+                    "reply": reply_text,
+                    "conversation_id": str(conversation_id),
+                    "customer_id": str(customer_id),
+                }
+            ) + "\n"
+
+    summary_refresh = None
+    if turn.needs_summary_refresh():
+        summary_refresh = BackgroundTask(summary_service.refresh_summary, conversation_id)
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson", background=summary_refresh)
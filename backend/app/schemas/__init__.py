@@ -3,4 +3,4 @@ from .conversation import ConversationOut
 from .customer import CustomerOut
 from .dashboard import DashboardMetricsResponse
 from .tenant import TenantOut
-from .agent import AgentCreate, AgentUpdate, AgentResponse  # noqa: F401
+from .agent import AgentCreate, AgentUpdate, AgentResponse, PublicAgentResponse  # noqa: F401
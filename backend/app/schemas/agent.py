@@ -118,6 +118,9 @@ class KnowledgeDocumentMetadata(BaseModel):
     filename: str
     content_type: str
     size_bytes: int
+    # pending | processing | ready | failed
+    ingestion_status: Optional[str] = None
+    ingestion_error: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -131,6 +134,16 @@ class AllowedWebsite(BaseModel):
     trust_level: Literal["reference_only", "authoritative"] = "reference_only"
 
 
+# ---------- Model call tuning (optional) ----------
+
+class ModelSettings(BaseModel):
+    # Fire a second request when the first token is slower than this percentile
+    # of the model's recent time-to-first-token, and keep whichever answers first.
+    hedge_enabled: bool = False
+    hedge_percentile: float = Field(95.0, ge=50.0, le=99.9)
+    hedge_target: Literal["same", "fallback"] = "fallback"
+
+
 # ---------- Agent base + CRUD ----------
 
 class AgentBase(BaseModel):
@@ -146,7 +159,7 @@ class AgentBase(BaseModel):
 
 
 class AgentCreate(AgentBase):
-    pass
+    model_settings: Optional[ModelSettings] = None
 
 
 class AgentUpdate(BaseModel):
@@ -159,9 +172,12 @@ class AgentUpdate(BaseModel):
     customer_profile: Optional[CustomerProfile] = None
     data_profile: Optional[DataProfile] = None
     allowed_websites: Optional[List[AllowedWebsite]] = None
+    model_settings: Optional[ModelSettings] = None
 
 
-class AgentResponse(AgentBase):
+class PublicAgentResponse(AgentBase):
+    """What the unauthenticated widget endpoint may show: no model tuning."""
+
     id: UUID
     tenant_id: UUID
     model_provider: str
@@ -172,3 +188,7 @@ class AgentResponse(AgentBase):
 
     class Config:
         orm_mode = True
+
+
+class AgentResponse(PublicAgentResponse):
+    model_settings: Optional[ModelSettings] = None
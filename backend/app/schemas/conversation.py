@@ -30,4 +30,5 @@ class ConversationOut(BaseModel):
 
 
 class ConversationDetail(ConversationOut):
+    summary: Optional[str] = None
     messages: List[MessageOut] = []
@@ -7,8 +7,12 @@ from pydantic import BaseModel, EmailStr, Field
 
 class Pagination(BaseModel):
     total: int
+    # True when `total` is the planner's estimate (cursor mode) rather than an exact count.
+    total_is_estimate: bool = False
     page: int
     page_size: int
+    # Pass as `cursor` to fetch the next page; None on the last page.
+    next_cursor: Optional[str] = None
 
 
 class OverviewMetrics(BaseModel):
@@ -198,3 +202,45 @@ class UnifiedUserListItem(BaseModel):
 class UnifiedUserListResponse(BaseModel):
     items: List[UnifiedUserListItem]
     pagination: Pagination
+
+
+class LLMClientStats(BaseModel):
+    key_fingerprint: str
+    base_url: Optional[str] = None
+    requests: int = 0
+    connections_opened: int = 0
+    connections_reused: int = 0
+
+
+class LLMClientPoolResponse(BaseModel):
+    clients: List[LLMClientStats] = Field(default_factory=list)
+
+
+class ModelHealth(BaseModel):
+    model: str
+    state: str
+    reason: Optional[str] = None
+    window_requests: int = 0
+    window_failures: int = 0
+    error_rate: float = 0.0
+    p50_latency_seconds: Optional[float] = None
+    p95_latency_seconds: Optional[float] = None
+    trips: int = 0
+    retry_in_seconds: Optional[float] = None
+
+
+class ModelHealthResponse(BaseModel):
+    models: List[ModelHealth] = Field(default_factory=list)
+
+
+class HedgeStats(BaseModel):
+    agent_id: str
+    requests: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    hedge_rate: float = 0.0
+    win_rate: float = 0.0
+
+
+class HedgeStatsResponse(BaseModel):
+    agents: List[HedgeStats] = Field(default_factory=list)
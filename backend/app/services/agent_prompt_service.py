@@ -1,4 +1,25 @@
+import logging
+from dataclasses import dataclass
+
+from app.config import get_settings
+from app.db import SessionLocal
 from app.models.agent import Agent
+from app.utils.cache import LRUCache
+from app.utils.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    text: str
+    token_count: int
+
+
+# Keyed by (agent id, updated_at): any edit bumps updated_at, so stale entries are never served.
+_prompt_cache: LRUCache[CompiledPrompt] = LRUCache(maxsize=settings.prompt_cache_size)
 
 
 def build_agent_system_prompt(agent: Agent) -> str:
@@ -96,3 +117,38 @@ Always:
 - For longer answers, use bullet points where helpful.
 - Be honest about uncertainty; do NOT hallucinate policies, prices, or guarantees.
 """
+
+
+def get_compiled_prompt(agent: Agent) -> CompiledPrompt:
+    """Return the rendered system prompt for this agent version, rendering it at most once."""
+    key = (str(agent.id), agent.updated_at)
+    compiled = _prompt_cache.get(key)
+    if compiled is None:
+        text = build_agent_system_prompt(agent)
+        compiled = CompiledPrompt(text=text, token_count=count_tokens(text))
+        _prompt_cache.set(key, compiled)
+    return compiled
+
+
+def evict_agent_prompt(agent_id) -> None:
+    """Drop every cached prompt version of an agent (called when it is edited)."""
+    agent_key = str(agent_id)
+    _prompt_cache.pop_where(lambda key, _: key[0] == agent_key)
+
+
+def warm_prompt_cache() -> int:
+    """Pre-render prompts for active agents so the first chat after a deploy skips the work."""
+    db = SessionLocal()
+    try:
+        agents = (
+            db.query(Agent)
+            .filter(Agent.status == "active")
+            .order_by(Agent.updated_at.desc())
+            .limit(settings.prompt_cache_size)
+            .all()
+        )
+        for agent in agents:
+            get_compiled_prompt(agent)
+        return len(agents)
+    finally:
+        db.close()
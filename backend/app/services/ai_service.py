@@ -1,35 +1,38 @@
-from typing import List, Optional
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+import asyncio
 import logging
+import time
 
-from groq import Groq
+from groq import AsyncGroq
 
 from app.config import get_settings
 from app.db import SessionLocal
 from app.models.agent import Agent
-from app.services.agent_prompt_service import build_agent_system_prompt
+from app.models.message import Message
+from app.services import directory_cache, groq_clients, knowledge_service, model_health
+from app.services.agent_prompt_service import get_compiled_prompt
+from app.utils.cache import LRUCache
+from app.utils.tokens import count_tokens
 
 logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
-# Known invalid / deprecated model IDs we never want to call again.
-_BAD_GROQ_MODELS = {
-    "llama-3.1-70b",
-    "llama3-70b-8192",
-}
-
-
 def _resolve_model(agent: Optional[Agent]) -> str:
     """
     Decide which Groq model ID to use.
 
     Priority:
-    1) Per-agent override (if set and not in _BAD_GROQ_MODELS)
+    1) Per-agent override (if set)
     2) GROQ_DEFAULT_MODEL from settings
     3) Final hardcoded safety fallback for local/dev use
+
+    Model health (retired IDs, provider incidents) is handled at call time by
+    the circuit breakers in `model_health`, see `_candidate_models`.
     """
     # 1) Agent override
-    if agent and agent.model_name and agent.model_name not in _BAD_GROQ_MODELS:
+    if agent and agent.model_name:
         return agent.model_name
 
     # 2) Global default from env/config, if set
@@ -40,27 +43,67 @@ def _resolve_model(agent: Optional[Agent]) -> str:
     return "llama-3.3-70b-versatile"
 
 
+@dataclass(frozen=True)
+class ModelBudget:
+    """Token limits for one model. `history_tokens` caps history even when the window is larger."""
+
+    context_window: int
+    max_reply_tokens: int
+    history_tokens: int
+
+
+# Every prompt token adds to time-to-first-token and cost, so history is capped
+# well below the context window. Unknown models use _DEFAULT_MODEL_BUDGET.
+_MODEL_BUDGETS: Dict[str, ModelBudget] = {
+    "llama-3.3-70b-versatile": ModelBudget(context_window=131072, max_reply_tokens=2048, history_tokens=6000),
+    "llama-3.1-8b-instant": ModelBudget(context_window=131072, max_reply_tokens=2048, history_tokens=4000),
+    "openai/gpt-oss-120b": ModelBudget(context_window=131072, max_reply_tokens=4096, history_tokens=6000),
+    "openai/gpt-oss-20b": ModelBudget(context_window=131072, max_reply_tokens=4096, history_tokens=4000),
+    "mixtral-8x7b-32768": ModelBudget(context_window=32768, max_reply_tokens=2048, history_tokens=6000),
+    "gemma2-9b-it": ModelBudget(context_window=8192, max_reply_tokens=1024, history_tokens=3000),
+}
+_DEFAULT_MODEL_BUDGET = ModelBudget(context_window=8192, max_reply_tokens=1024, history_tokens=3000)
+
+# Chat-format overhead (role markers, separators) per message.
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def _model_budget(model_name: str) -> ModelBudget:
+    return _MODEL_BUDGETS.get(model_name, _DEFAULT_MODEL_BUDGET)
+
+
+def _candidate_models(agent: Optional[Agent]) -> List[str]:
+    """Primary model (per-agent or global default) followed by the global default as fallback."""
+    model_name = _resolve_model(agent)
+    fallback_model = _resolve_model(None)
+    return [model_name] if model_name == fallback_model else [model_name, fallback_model]
+
+
+def _admit(model_name: str) -> Optional[model_health.CircuitBreaker]:
+    """Return the model's breaker if it admits a call right now, otherwise None."""
+    breaker = model_health.get_breaker(model_name)
+    if breaker.allow_request():
+        return breaker
+    logger.info("Skipping model %s: circuit breaker is %s", model_name, breaker.state)
+    return None
+
+
+def _record_failure(breaker: model_health.CircuitBreaker, started: float, exc: Exception) -> None:
+    kind = model_health.classify_failure(exc)
+    if kind is None:
+        breaker.release()
+    else:
+        breaker.record_failure(time.monotonic() - started, kind=kind, detail=str(exc))
+
+
 def _get_active_agent_for_tenant(tenant_id) -> Optional[Agent]:
     """
-    Return the most recent active Agent for this tenant.
-    If none is active, return the most recent Agent for the tenant, or None.
+    Return the tenant's default agent (see `directory_cache.get_active_agent`).
+    Served from the directory cache; a connection is only checked out on a miss.
     """
     session = SessionLocal()
     try:
-        query = (
-            session.query(Agent)
-            .filter(Agent.tenant_id == tenant_id, Agent.status == "active")
-            .order_by(Agent.created_at.desc())
-        )
-        agent = query.first()
-        if not agent:
-            agent = (
-                session.query(Agent)
-                .filter(Agent.tenant_id == tenant_id)
-                .order_by(Agent.created_at.desc())
-                .first()
-            )
-        return agent
+        return directory_cache.get_active_agent(session, tenant_id)
     finally:
         session.close()
 
@@ -104,11 +147,140 @@ def _fallback_reply(agent: Optional[Agent], tenant, messages: List[str]) -> str:
     return f"{prompt_closure} How can I help today?"
 
 
-def generate_reply(
+def _history_role(sender: str) -> str:
+    return "user" if sender == "user" else "assistant"
+
+
+# Message text never changes, so token counts are cached by message id.
+_message_tokens: LRUCache[int] = LRUCache(maxsize=settings.message_token_cache_size)
+
+
+def _message_token_count(turn: Message) -> int:
+    key = getattr(turn, "id", None)
+    if key is None:
+        return count_tokens(turn.text) + _MESSAGE_OVERHEAD_TOKENS
+    cached = _message_tokens.get(key)
+    if cached is None:
+        cached = count_tokens(turn.text) + _MESSAGE_OVERHEAD_TOKENS
+        _message_tokens.set(key, cached)
+    return cached
+
+
+def _history_budget(agent: Optional[Agent], used_tokens: int) -> int:
+    """
+    Tokens left for history once `used_tokens` (system prompt + new messages)
+    and the reply are accounted for, for the tightest candidate model.
+    """
+    budgets = [_model_budget(model_name) for model_name in _candidate_models(agent)]
+    return max(
+        min(
+            min(budget.history_tokens, budget.context_window - budget.max_reply_tokens - used_tokens)
+            for budget in budgets
+        ),
+        0,
+    )
+
+
+def _pack_history(history: Sequence[Message], budget: int) -> List[Message]:
+    """
+    Keep the most recent turns (walking newest-first) that fit in `budget`
+    tokens and return them oldest-first. Older turns are dropped.
+    """
+    packed: List[Message] = []
+    used = 0
+    for turn in reversed(history):
+        if not turn.text:
+            continue
+        cost = _message_token_count(turn)
+        if used + cost > budget:
+            break
+        packed.append(turn)
+        used += cost
+    packed.reverse()
+    return packed
+
+
+def _knowledge_message(snippets: Sequence[str]) -> Optional[str]:
+    if not snippets:
+        return None
+    excerpts = "\n\n".join(f"[{index}] {snippet}" for index, snippet in enumerate(snippets, start=1))
+    return (
+        "Excerpts from the business's own documents that may answer the latest message. "
+        "Prefer them over general knowledge; if they do not cover the question, say you are not sure.\n\n"
+        + excerpts
+    )
+
+
+async def _retrieve_knowledge(agent: Optional[Agent], messages: List[str]) -> List[str]:
+    """Snippets from the agent's documents for the new messages; never fails the reply."""
+    query = " ".join(text for text in messages if text)
+    if agent is None or not query.strip():
+        return []
+    try:
+        return await asyncio.to_thread(knowledge_service.retrieve, agent.id, query)
+    except Exception:
+        logger.exception("Knowledge retrieval failed for agent %s", agent.id)
+        return []
+
+
+def _build_groq_messages(
+    tenant,
+    agent: Optional[Agent],
+    messages: List[str],
+    history: Optional[Sequence[Message]] = None,
+    summary: Optional[str] = None,
+    knowledge: Sequence[str] = (),
+) -> List[dict]:
+    """
+    Build the Groq `messages` list: one system message, then prior turns of the
+    conversation with their real roles, then one user message per input string.
+
+    `history` (oldest first) is packed newest-first into the token budget of
+    the candidate models (see `_MODEL_BUDGETS`); turns that do not fit are left out.
+    A rolling `summary` of the turns before `history` goes in a second system
+    message ahead of them, followed by the `knowledge` snippets retrieved from
+    the agent's documents.
+    """
+    if agent:
+        compiled = get_compiled_prompt(agent)
+        system_prompt, system_tokens = compiled.text, compiled.token_count
+    else:
+        company_name = getattr(tenant, "name", "this business")
+        system_prompt = (
+            f"You are OnDuty, an AI assistant for {company_name}. "
+            "Respond helpfully, accurately, and concisely."
+        )
+        system_tokens = count_tokens(system_prompt)
+
+    new_messages = [text for text in messages if text]
+    used_tokens = system_tokens + sum(count_tokens(text) + _MESSAGE_OVERHEAD_TOKENS for text in new_messages)
+    summary_message = f"Summary of the earlier conversation:\n{summary}" if summary else None
+    if summary_message:
+        used_tokens += count_tokens(summary_message) + _MESSAGE_OVERHEAD_TOKENS
+    knowledge_message = _knowledge_message(knowledge)
+    if knowledge_message:
+        used_tokens += count_tokens(knowledge_message) + _MESSAGE_OVERHEAD_TOKENS
+    packed_history = _pack_history(history or [], _history_budget(agent, used_tokens))
+
+    groq_messages = [{"role": "system", "content": system_prompt}]
+    if summary_message:
+        groq_messages.append({"role": "system", "content": summary_message})
+    if knowledge_message:
+        groq_messages.append({"role": "system", "content": knowledge_message})
+    for turn in packed_history:
+        groq_messages.append({"role": _history_role(turn.sender), "content": turn.text})
+    for text in new_messages:
+        groq_messages.append({"role": "user", "content": text})
+    return groq_messages
+
+
+async def generate_reply_async(
     tenant,
     agent_type: str,
     messages: List[str],
     agent: Optional[Agent] = None,
+    history: Optional[Sequence[Message]] = None,
+    summary: Optional[str] = None,
 ) -> str:
     """
     Generate a reply for the given tenant and agent_type using Groq.
@@ -116,7 +288,10 @@ def generate_reply(
     - Uses an explicitly provided Agent when available.
     - Otherwise looks up the most recent active Agent for the tenant.
     - Builds a system prompt from that Agent (if found).
-    - Calls Groq's Chat Completions API with the system prompt + user messages.
+    - Calls Groq's Chat Completions API with the system prompt, the rolling
+      `summary` of older turns, passages of the agent's documents relevant to
+      the new messages (knowledge_service), the prior conversation turns in
+      `history` (oldest first) and the new user messages.
 
     Notes:
     - `agent_type` is kept for future routing (customer_service vs sales), but is
@@ -124,56 +299,379 @@ def generate_reply(
     - If GROQ_API_KEY is not set or the API call fails, we return a safe fallback
       demo message instead of raising.
     """
+    if agent is None:
+        agent = await asyncio.to_thread(_get_active_agent_for_tenant, tenant.id)
+
     if not settings.groq_api_key:
         logger.warning("GROQ_API_KEY is not configured; using local fallback reply.")
-        explicit_or_default_agent = agent or _get_active_agent_for_tenant(tenant.id)
-        return _fallback_reply(explicit_or_default_agent, tenant, messages)
+        return _fallback_reply(agent, tenant, messages)
 
-    client = Groq(api_key=settings.groq_api_key)
+    if _hedge_policy(agent) is not None:
+        # Hedging races first tokens, so hedged agents always go through the
+        # streaming path and the deltas are joined here.
+        parts: List[str] = []
+        async for event in stream_reply(
+            tenant, agent_type, messages, agent=agent, history=history, summary=summary
+        ):
+            if event["type"] == "reset":
+                parts = []
+            else:
+                parts.append(event["text"])
+        return "".join(parts)
+
+    client = groq_clients.get_async_client()
+
+    knowledge = await _retrieve_knowledge(agent, messages)
+    groq_messages = _build_groq_messages(
+        tenant, agent, messages, history=history, summary=summary, knowledge=knowledge
+    )
 
-    if agent is None:
-        agent = _get_active_agent_for_tenant(tenant.id)
-    if agent:
-        system_prompt = build_agent_system_prompt(agent)
-    else:
-        company_name = getattr(tenant, "name", "this business")
-        system_prompt = (
-            f"You are OnDuty, an AI assistant for {company_name}. "
-            "Respond helpfully, accurately, and concisely."
-        )
-    # Primary model: per-agent or global default
-    model_name = _resolve_model(agent)
-    # Fallback model: global default (or safety net) with no per-agent override
-    fallback_model = _resolve_model(None)
+    if all(message["role"] == "system" for message in groq_messages):
+        # No user content; just return a generic message.
+        return "Hi! How can I help you today?"
 
-    # Build Groq messages: one system message + one user message per input string.
-    groq_messages = [{"role": "system", "content": system_prompt}]
-    for text in messages:
-        if not text:
+    # Primary model first, then the global default; models whose circuit
+    # breaker is open are skipped without waiting for them to fail.
+    for candidate in _candidate_models(agent):
+        breaker = _admit(candidate)
+        if breaker is None:
             continue
-        groq_messages.append({"role": "user", "content": text})
+        started = time.monotonic()
+        try:
+            completion = await client.chat.completions.create(
+                model=candidate,
+                messages=groq_messages,
+            )
+        except Exception as exc:
+            logger.exception("Groq chat.completions.create failed for model %s: %s", candidate, exc)
+            _record_failure(breaker, started, exc)
+            continue
+        breaker.record_success(time.monotonic() - started)
+        return completion.choices[0].message.content
 
-    if len(groq_messages) == 1:
-        # No user content; just return a generic message.
-        return "Hi! How can I help you today?"
+    return _fallback_reply(agent, tenant, messages)
 
+
+def generate_reply(
+    tenant,
+    agent_type: str,
+    messages: List[str],
+    agent: Optional[Agent] = None,
+    history: Optional[Sequence[Message]] = None,
+    summary: Optional[str] = None,
+) -> str:
+    """
+    Synchronous wrapper around `generate_reply_async` for scripts and other
+    callers that are not running inside an event loop.
+    """
+
+    async def run() -> str:
+        try:
+            return await generate_reply_async(
+                tenant, agent_type, messages, agent=agent, history=history, summary=summary
+            )
+        finally:
+            # Pooled clients are bound to this call's event loop, which asyncio.run closes.
+            await groq_clients.close_clients()
+
+    return asyncio.run(run())
+
+
+_SUMMARY_PROMPT = (
+    "You maintain a running summary of a customer chat with an AI assistant. "
+    "Merge the new messages into the existing summary. Keep what the assistant will need "
+    "later: who the customer is and any contact details they shared, what they want, what "
+    "was answered, tried or promised, and open questions. Write plain prose in the third "
+    "person, at most {words} words, with no preamble."
+)
+
+
+async def summarize_turns(previous_summary: Optional[str], turns: Sequence[Message]) -> Optional[str]:
+    """
+    Fold `turns` (oldest first) into `previous_summary` with a single, non-hedged
+    completion. Returns None when Groq is not configured or every model failed,
+    in which case the caller keeps the old summary.
+    """
+    if not settings.groq_api_key or not turns:
+        return None
+
+    transcript = "\n".join(
+        f"{'Customer' if turn.sender == 'user' else 'Assistant'}: {turn.text}" for turn in turns if turn.text
+    )
+    groq_messages = [
+        {"role": "system", "content": _SUMMARY_PROMPT.format(words=int(settings.summary_max_tokens * 0.6))},
+        {
+            "role": "user",
+            "content": f"Existing summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}",
+        },
+    ]
+
+    client = groq_clients.get_async_client()
+    candidates = [settings.summary_model] if settings.summary_model else []
+    candidates += [model for model in _candidate_models(None) if model not in candidates]
+    for candidate in candidates:
+        breaker = _admit(candidate)
+        if breaker is None:
+            continue
+        started = time.monotonic()
+        try:
+            completion = await client.chat.completions.create(
+                model=candidate,
+                messages=groq_messages,
+                max_tokens=settings.summary_max_tokens,
+                temperature=0.2,
+            )
+        except Exception as exc:
+            logger.exception("Groq summary completion failed for model %s: %s", candidate, exc)
+            _record_failure(breaker, started, exc)
+            continue
+        breaker.record_success(time.monotonic() - started)
+        content = (completion.choices[0].message.content or "").strip()
+        return content or None
+    return None
+
+
+async def _stream_completion(
+    client: AsyncGroq, model_name: str, groq_messages: List[dict]
+) -> AsyncIterator[str]:
+    """Yield content deltas from a streamed Groq chat completion."""
+    stream = await client.chat.completions.create(
+        model=model_name,
+        messages=groq_messages,
+        stream=True,
+    )
     try:
-        completion = client.chat.completions.create(
-            model=model_name,
-            messages=groq_messages,
-        )
-        return completion.choices[0].message.content
-    except Exception as exc:
-        logger.exception("Groq chat.completions.create failed: %s", exc)
-
-        if model_name != fallback_model:
-            try:
-                completion = client.chat.completions.create(
-                    model=fallback_model,
-                    messages=groq_messages,
-                )
-                return completion.choices[0].message.content
-            except Exception as fallback_exc:
-                logger.exception("Groq fallback model failed: %s", fallback_exc)
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+    finally:
+        # Release the pooled connection even when a hedge loser is cancelled.
+        await stream.close()
 
-        return _fallback_reply(agent, tenant, messages)
+
+@dataclass(frozen=True)
+class _HedgePolicy:
+    percentile: float
+    target: str
+
+
+def _hedge_policy(agent: Optional[Agent]) -> Optional[_HedgePolicy]:
+    model_settings = getattr(agent, "model_settings", None) or {}
+    if not model_settings.get("hedge_enabled"):
+        return None
+    return _HedgePolicy(
+        percentile=float(model_settings.get("hedge_percentile") or 95.0),
+        target=model_settings.get("hedge_target") or "fallback",
+    )
+
+
+def _hedge_budget(breaker: model_health.CircuitBreaker, policy: _HedgePolicy) -> float:
+    budget = breaker.first_token_percentile(policy.percentile)
+    if budget is None:
+        budget = settings.hedge_default_budget_seconds
+    return max(budget, settings.hedge_min_budget_seconds)
+
+
+class _StreamAttempt:
+    """
+    One streamed completion. The first token is awaited in its own task so two
+    attempts can race; the remaining deltas are read from `stream` afterwards.
+    The breaker learns the outcome once, when the stream ends (`succeed`,
+    `fail`) or is abandoned.
+    """
+
+    def __init__(self, client: AsyncGroq, model_name: str, breaker: model_health.CircuitBreaker, groq_messages: List[dict]):
+        self.model_name = model_name
+        self.breaker = breaker
+        self.started = time.monotonic()
+        self.first_token_latency: Optional[float] = None
+        self._settled = False
+        self.stream = _stream_completion(client, model_name, groq_messages)
+        self.first_token: asyncio.Task = asyncio.ensure_future(self._first())
+
+    async def _first(self) -> str:
+        try:
+            delta = await self.stream.__anext__()
+        except StopAsyncIteration:
+            delta = ""
+        except Exception as exc:
+            logger.exception("Groq streaming completion failed for model %s: %s", self.model_name, exc)
+            self.fail(exc)
+            raise
+        self.first_token_latency = time.monotonic() - self.started
+        self.breaker.record_first_token(self.first_token_latency)
+        return delta
+
+    def _settle(self) -> bool:
+        settled, self._settled = self._settled, True
+        return not settled
+
+    def succeed(self) -> None:
+        # Time to first token is the latency tracked for streamed calls.
+        if self._settle():
+            self.breaker.record_success(self.first_token_latency)
+
+    def fail(self, exc: Exception) -> None:
+        if self._settle():
+            _record_failure(self.breaker, self.started, exc)
+
+    def abandon(self) -> None:
+        """Stopped by us (lost a hedge race, client went away): says nothing about the model."""
+        if self._settle():
+            self.breaker.release()
+
+    async def cancel(self) -> None:
+        if not self.first_token.done():
+            self.first_token.cancel()
+        try:
+            await self.first_token
+        except BaseException:
+            pass
+        self.abandon()
+        await self.stream.aclose()
+
+
+async def _start_stream(
+    client: AsyncGroq,
+    model_name: str,
+    breaker: model_health.CircuitBreaker,
+    hedge_model: Optional[str],
+    groq_messages: List[dict],
+    policy: Optional[_HedgePolicy],
+    agent_id,
+    tried: set,
+) -> Tuple[_StreamAttempt, str]:
+    """
+    Start a streamed completion and wait for its first token.
+
+    With a hedge policy, a second request to `hedge_model` is fired if no token
+    arrives within the budget; the first attempt to produce a token wins and
+    the other is cancelled. Raises the last error if every attempt failed.
+    Models whose attempt won or failed are added to `tried`; a hedge cancelled
+    as the loser is not, so it remains available as a later candidate.
+    """
+    tried.add(model_name)
+    primary = _StreamAttempt(client, model_name, breaker, groq_messages)
+    if policy is None or hedge_model is None:
+        return primary, await primary.first_token
+
+    attempts = [primary]
+    try:
+        done, _ = await asyncio.wait({primary.first_token}, timeout=_hedge_budget(breaker, policy))
+        hedge_breaker = None if done else _admit(hedge_model)
+        if hedge_breaker is None:
+            model_health.record_hedge(agent_id, hedged=False, hedge_won=False)
+            return primary, await primary.first_token
+
+        logger.info("Hedging %s with %s after no first token", model_name, hedge_model)
+        hedge = _StreamAttempt(client, hedge_model, hedge_breaker, groq_messages)
+        attempts.append(hedge)
+        pending = {attempt.first_token: attempt for attempt in attempts}
+        error: Optional[BaseException] = None
+        while pending:
+            done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                attempt = pending.pop(task)
+                tried.add(attempt.model_name)
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                for loser in pending.values():
+                    await loser.cancel()
+                model_health.record_hedge(agent_id, hedged=True, hedge_won=attempt is hedge)
+                return attempt, task.result()
+        model_health.record_hedge(agent_id, hedged=True, hedge_won=False)
+        raise error
+    except asyncio.CancelledError:
+        for attempt in attempts:
+            await attempt.cancel()
+        raise
+
+
+async def stream_reply(
+    tenant,
+    agent_type: str,
+    messages: List[str],
+    agent: Optional[Agent] = None,
+    history: Optional[Sequence[Message]] = None,
+    summary: Optional[str] = None,
+) -> AsyncIterator[Dict[str, str]]:
+    """
+    Streaming variant of `generate_reply_async`.
+
+    Yields events as they become available:
+    - {"type": "delta", "text": "..."} for each token chunk from the model.
+    - {"type": "reset"} when a model failed after emitting tokens and the text
+      streamed so far must be discarded before the next attempt.
+
+    The primary model is tried first, then the fallback model, skipping models
+    whose circuit breaker is open. If both fail (before or mid-stream) the
+    `_fallback_reply` text is emitted as a single delta, mirroring
+    `generate_reply_async`. Time to first token is what the breaker tracks as
+    latency for streamed calls.
+
+    Agents with hedging enabled in `model_settings` race a second request (to
+    the same or the fallback model) against the primary when its first token
+    is slower than the configured percentile of recent first-token latency.
+    """
+    if agent is None:
+        agent = await asyncio.to_thread(_get_active_agent_for_tenant, tenant.id)
+
+    if not settings.groq_api_key:
+        logger.warning("GROQ_API_KEY is not configured; using local fallback reply.")
+        yield {"type": "delta", "text": _fallback_reply(agent, tenant, messages)}
+        return
+
+    client = groq_clients.get_async_client()
+
+    knowledge = await _retrieve_knowledge(agent, messages)
+    groq_messages = _build_groq_messages(
+        tenant, agent, messages, history=history, summary=summary, knowledge=knowledge
+    )
+
+    if all(message["role"] == "system" for message in groq_messages):
+        yield {"type": "delta", "text": "Hi! How can I help you today?"}
+        return
+
+    policy = _hedge_policy(agent)
+    candidates = _candidate_models(agent)
+    tried: set = set()
+    for index, candidate in enumerate(candidates):
+        if candidate in tried:
+            continue
+        breaker = _admit(candidate)
+        if breaker is None:
+            continue
+        # Only the first attempt is hedged; later candidates are already the fallback.
+        hedge_model = None
+        if policy is not None and index == 0:
+            hedge_model = candidate if policy.target == "same" else candidates[-1]
+        try:
+            attempt, first = await _start_stream(
+                client, candidate, breaker, hedge_model, groq_messages, policy, getattr(agent, "id", None), tried
+            )
+        except Exception:
+            continue
+
+        emitted = bool(first)
+        try:
+            if first:
+                yield {"type": "delta", "text": first}
+            async for delta in attempt.stream:
+                emitted = True
+                yield {"type": "delta", "text": delta}
+            attempt.succeed()
+            return
+        except Exception as exc:
+            logger.exception("Groq streaming completion failed for model %s: %s", attempt.model_name, exc)
+            attempt.fail(exc)
+            if emitted:
+                yield {"type": "reset"}
+        finally:
+            # No-op once settled; otherwise the consumer stopped reading mid-stream.
+            attempt.abandon()
+
+    yield {"type": "delta", "text": _fallback_reply(agent, tenant, messages)}
@@ -0,0 +1,219 @@
+"""
+Content-addressed storage for uploaded files (agent knowledge documents).
+
+Blobs are keyed by the SHA-256 of their bytes, so identical uploads, across
+agents and tenants, are stored once, and the database keeps only the hash.
+Writes stream the source in chunks while hashing, so a file is never held
+in memory whole.
+
+Backends (`BLOB_STORE_BACKEND`):
+- `local`: files under `BLOB_STORE_PATH`, sharded as `ab/cd/abcd…` so no
+  directory grows unbounded. Writes go to a temp file that is renamed into
+  place, so readers never see a partial blob.
+- `s3`: any S3-compatible service (AWS, MinIO, R2, …) via `boto3`, which is
+  only needed when this backend is selected. `BLOB_STORE_S3_ENDPOINT_URL`
+  points it at a local stand-in such as MinIO.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import BinaryIO, Iterator, Optional
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class BlobTooLarge(Exception):
+    pass
+
+
+class BlobNotFound(Exception):
+    pass
+
+
+@dataclass
+class StoredBlob:
+    sha256: str
+    size: int
+
+
+def _copy_hashing(source: BinaryIO, target: BinaryIO, max_size: Optional[int]) -> StoredBlob:
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            raise BlobTooLarge(f"Blob exceeds {max_size} bytes")
+        digest.update(chunk)
+        target.write(chunk)
+    return StoredBlob(sha256=digest.hexdigest(), size=size)
+
+
+class BlobStore:
+    """Interface shared by the backends. Keys are lowercase hex SHA-256 digests."""
+
+    def put(self, source: BinaryIO, max_size: Optional[int] = None) -> StoredBlob:
+        """Store the rest of `source`; returns its hash and size (an existing copy is reused)."""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def read_chunks(
+        self, key: str, start: int = 0, end: Optional[int] = None, chunk_size: int = CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        """Yield bytes `start`..`end` (inclusive; default: to the end) of a blob in chunks."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self._tmp = os.path.join(self.root, "tmp")
+        os.makedirs(self._tmp, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, source: BinaryIO, max_size: Optional[int] = None) -> StoredBlob:
+        # Same filesystem as the final location, so the rename below is atomic.
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp)
+        try:
+            with os.fdopen(fd, "wb") as target:
+                blob = _copy_hashing(source, target, max_size)
+                target.flush()
+                os.fsync(target.fileno())
+            final_path = self.path(blob.sha256)
+            if os.path.exists(final_path):
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+            return blob
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def read_chunks(
+        self, key: str, start: int = 0, end: Optional[int] = None, chunk_size: int = CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        try:
+            handle = open(self.path(key), "rb")
+        except FileNotFoundError:
+            raise BlobNotFound(key)
+        with handle:
+            handle.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = handle.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3BlobStore(BlobStore):
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        client=None,
+    ):
+        if client is None:
+            try:
+                import boto3
+            except ImportError as exc:
+                raise RuntimeError("BLOB_STORE_BACKEND=s3 requires the boto3 package") from exc
+            client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+
+    def object_key(self, key: str) -> str:
+        sharded = f"{key[:2]}/{key[2:4]}/{key}"
+        return f"{self.prefix}/{sharded}" if self.prefix else sharded
+
+    def put(self, source: BinaryIO, max_size: Optional[int] = None) -> StoredBlob:
+        # The key is only known once the whole stream is hashed, so spool it first.
+        with tempfile.TemporaryFile() as spool:
+            blob = _copy_hashing(source, spool, max_size)
+            if not self.exists(blob.sha256):
+                spool.seek(0)
+                self.client.upload_fileobj(spool, self.bucket, self.object_key(blob.sha256))
+        return blob
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+            return True
+        except Exception as exc:
+            if _s3_not_found(exc):
+                return False
+            raise
+
+    def read_chunks(
+        self, key: str, start: int = 0, end: Optional[int] = None, chunk_size: int = CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.object_key(key), Range=byte_range)
+        except Exception as exc:
+            if _s3_not_found(exc):
+                raise BlobNotFound(key)
+            raise
+        body = response["Body"]
+        try:
+            while True:
+                chunk = body.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+
+def _s3_not_found(exc: Exception) -> bool:
+    code = str(getattr(exc, "response", {}).get("Error", {}).get("Code", ""))
+    return code in ("404", "NoSuchKey", "NotFound")
+
+
+@lru_cache()
+def get_blob_store() -> BlobStore:
+    if settings.blob_store_backend == "s3":
+        return S3BlobStore(
+            bucket=settings.blob_store_s3_bucket,
+            prefix=settings.blob_store_s3_prefix,
+            endpoint_url=settings.blob_store_s3_endpoint_url,
+            region=settings.blob_store_s3_region,
+        )
+    return LocalBlobStore(settings.blob_store_path)
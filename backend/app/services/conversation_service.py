@@ -1,44 +1,164 @@
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 from typing import List, Optional, Tuple
+from sqlalchemy import bindparam, func, insert, or_, update
 from sqlalchemy.orm import Session
 
+from app.config import get_settings
 from app.models.conversation import Conversation
 from app.models.message import Message
+from app.services import stats_service, usage_service
+from app.utils.cache import LRUCache
+from app.utils.pagination import paginate
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class SessionConversation:
+    """What the webchat session resolver needs to know about the open conversation."""
+
+    id: object
+    agent_type: str
+    last_activity_at: datetime
+    # True only on the call that started the conversation (never cached as such).
+    created: bool = False
+
+
+# Resolver results keyed by customer and widget session, so follow-up messages skip the lookup query.
+# Conversations only stop being resumable by going idle (nothing changes their
+# status), which the cached activity timestamp already covers.
+_session_cache: LRUCache[SessionConversation] = LRUCache(maxsize=settings.webchat_session_cache_size)
 
 
 def create_conversation(
-    db: Session, tenant_id, customer_id, channel: str, agent_type: str = "cs", agent_id=None
+    db: Session,
+    tenant_id,
+    customer_id,
+    channel: str,
+    agent_type: str = "cs",
+    agent_id=None,
+    commit: bool = True,
 ) -> Conversation:
+    """
+    Create a conversation. Keys and timestamps are generated client-side, so
+    with `commit=False` the row simply joins the caller's unit of work and is
+    usable without a flush or refresh.
+    """
+    now = datetime.utcnow()
     conversation = Conversation(
+        id=uuid.uuid4(),
         tenant_id=tenant_id,
         customer_id=customer_id,
         agent_id=agent_id,
         channel=channel,
         agent_type=agent_type,
         status="open",
+        started_at=now,
+        last_message_at=now,
     )
     db.add(conversation)
-    db.commit()
-    db.refresh(conversation)
+    stats_service.record(db, tenant_id, channel, agent_id, conversations=1, at=now)
+    if commit:
+        db.commit()
     return conversation
 
 
-def add_message(db: Session, conversation_id, sender: str, text: str, meta: Optional[str] = None) -> Message:
-    message = Message(conversation_id=conversation_id, sender=sender, text=text, meta=meta)
+def _is_pending(db: Session, conversation_id) -> bool:
+    return any(isinstance(obj, Conversation) and obj.id == conversation_id for obj in db.new)
+
+
+def add_message(
+    db: Session,
+    conversation_id,
+    sender: str,
+    text: str,
+    meta: Optional[str] = None,
+    commit: bool = True,
+) -> Message:
+    message = Message(
+        id=uuid.uuid4(),
+        conversation_id=conversation_id,
+        sender=sender,
+        text=text,
+        meta=meta,
+        created_at=datetime.utcnow(),
+    )
     db.add(message)
-    db.commit()
-    db.refresh(message)
+    # A conversation created in this same unit of work already carries its activity timestamp.
+    if not _is_pending(db, conversation_id):
+        db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(last_message_at=message.created_at)
+        )
+    if commit:
+        db.commit()
     return message
 
 
-def list_conversations(db: Session, tenant_id, page: int = 1, page_size: int = 20) -> List[Conversation]:
-    offset = (page - 1) * page_size
-    return (
-        db.query(Conversation)
-        .filter(Conversation.tenant_id == tenant_id)
-        .order_by(Conversation.started_at.desc())
-        .offset(offset)
-        .limit(page_size)
-        .all()
+def insert_messages(db: Session, messages: List[Message]) -> None:
+    """
+    Insert already-built `Message` objects as one multi-row INSERT, advance
+    each conversation's `last_message_at` (never backwards) and count them in
+    the tenants' usage counters and daily stats, in one transaction.
+    """
+    if not messages:
+        return
+    db.execute(
+        insert(Message),
+        [
+            {
+                "id": message.id,
+                "conversation_id": message.conversation_id,
+                "sender": message.sender,
+                "text": message.text,
+                "meta": message.meta,
+                "created_at": message.created_at,
+            }
+            for message in messages
+        ],
+    )
+    latest = {}
+    for message in messages:
+        if message.conversation_id not in latest or message.created_at > latest[message.conversation_id]:
+            latest[message.conversation_id] = message.created_at
+    conversations = Conversation.__table__
+    db.execute(
+        update(conversations)
+        .where(
+            conversations.c.id == bindparam("conversation_id"),
+            or_(
+                conversations.c.last_message_at.is_(None),
+                conversations.c.last_message_at < bindparam("activity_at"),
+            ),
+        )
+        .values(last_message_at=bindparam("activity_at")),
+        [{"conversation_id": key, "activity_at": value} for key, value in latest.items()],
+    )
+    monthly, daily = {}, {}
+    for message in messages:
+        key = (message.conversation_id, usage_service.month_start(message.created_at))
+        monthly[key] = monthly.get(key, 0) + 1
+        key = (message.conversation_id, message.created_at.date())
+        daily[key] = daily.get(key, 0) + 1
+    usage_service.increment_messages_by_conversation(db, monthly)
+    stats_service.record_messages_by_conversation(db, daily)
+    db.commit()
+
+
+def list_conversations(
+    db: Session, tenant_id, page: int = 1, page_size: int = 20, cursor: Optional[str] = None
+) -> Tuple[List[Conversation], Optional[str]]:
+    """Newest conversations first, by `page` or keyset `cursor`; returns (items, next_cursor)."""
+    return paginate(
+        db.query(Conversation).filter(Conversation.tenant_id == tenant_id),
+        Conversation.started_at,
+        Conversation.id,
+        page_size,
+        page=page,
+        cursor=cursor,
     )
 
 
@@ -48,3 +168,147 @@ def get_conversation(db: Session, tenant_id, conversation_id) -> Optional[Conver
         .filter(Conversation.tenant_id == tenant_id, Conversation.id == conversation_id)
         .first()
     )
+
+
+def _session_key(tenant_id, customer_id, agent_id, channel: str, session_id: str) -> tuple:
+    # The session id comes from the client; the customer is what authorizes reuse.
+    return (str(tenant_id), str(customer_id), str(agent_id), channel, session_id)
+
+
+def forget_session_conversation(tenant_id, customer_id, agent_id, channel: str, session_id: str) -> None:
+    """Drop a cached resolution, e.g. when the transaction that created it rolled back."""
+    _session_cache.pop(_session_key(tenant_id, customer_id, agent_id, channel, session_id))
+
+
+def resolve_session_conversation(
+    db: Session,
+    tenant_id,
+    customer_id,
+    channel: str,
+    session_id: str,
+    agent_type: str = "cs",
+    agent_id=None,
+    commit: bool = True,
+) -> SessionConversation:
+    """
+    Return the open conversation for this (tenant, customer, agent, channel)
+    when it has been active within the idle window; otherwise start a new one.
+
+    Resolving a session means a message is about to be added, so the cached
+    entry's activity timestamp is refreshed on every call.
+    """
+    now = datetime.utcnow()
+    cutoff = now - timedelta(minutes=settings.webchat_session_idle_minutes)
+    cache_key = _session_key(tenant_id, customer_id, agent_id, channel, session_id)
+
+    cached = _session_cache.get(cache_key)
+    if cached and cached.last_activity_at >= cutoff:
+        _session_cache.set(
+            cache_key,
+            SessionConversation(id=cached.id, agent_type=cached.agent_type, last_activity_at=now),
+        )
+        return cached
+
+    last_activity = func.coalesce(Conversation.last_message_at, Conversation.started_at)
+    conversation = (
+        db.query(Conversation)
+        .filter(
+            Conversation.tenant_id == tenant_id,
+            Conversation.customer_id == customer_id,
+            Conversation.agent_id == agent_id,
+            Conversation.channel == channel,
+            Conversation.status == "open",
+            last_activity >= cutoff,
+        )
+        .order_by(last_activity.desc())
+        .first()
+    )
+    created = conversation is None
+    if created:
+        conversation = create_conversation(
+            db,
+            tenant_id=tenant_id,
+            customer_id=customer_id,
+            channel=channel,
+            agent_type=agent_type,
+            agent_id=agent_id,
+            commit=commit,
+        )
+
+    resolved = SessionConversation(id=conversation.id, agent_type=conversation.agent_type, last_activity_at=now)
+    _session_cache.set(cache_key, resolved)
+    if created:
+        return SessionConversation(
+            id=resolved.id, agent_type=resolved.agent_type, last_activity_at=now, created=True
+        )
+    return resolved
+
+
+def get_recent_messages(db: Session, conversation_id, limit: int, after: Optional[datetime] = None) -> List[Message]:
+    """Return the last `limit` messages of a conversation (newer than `after`, if given), oldest first."""
+    if limit <= 0:
+        return []
+    query = db.query(Message).filter(Message.conversation_id == conversation_id)
+    if after is not None:
+        query = query.filter(Message.created_at > after)
+    rows = query.order_by(Message.created_at.desc()).limit(limit).all()
+    rows.reverse()
+    return rows
+
+
+def get_conversation_context(db: Session, conversation_id, limit: int) -> Tuple[Optional[str], List[Message]]:
+    """
+    Return the conversation's rolling summary and its most recent messages not
+    covered by that summary (at most `limit`, oldest first).
+    """
+    if _is_pending(db, conversation_id):
+        return None, []
+    row = (
+        db.query(Conversation.summary, Conversation.summary_through_at)
+        .filter(Conversation.id == conversation_id)
+        .first()
+    )
+    summary, through_at = (row.summary, row.summary_through_at) if row else (None, None)
+    return summary, get_recent_messages(db, conversation_id, limit, after=through_at)
+
+
+def get_unsummarized_messages(
+    db: Session, conversation_id, limit: int = 200
+) -> Tuple[Optional[str], Optional[datetime], List[Message]]:
+    """Return (summary, summary_through_at, the oldest `limit` messages after it in order)."""
+    row = (
+        db.query(Conversation.summary, Conversation.summary_through_at)
+        .filter(Conversation.id == conversation_id)
+        .first()
+    )
+    if not row:
+        return None, None, []
+    query = db.query(Message).filter(Message.conversation_id == conversation_id)
+    if row.summary_through_at is not None:
+        query = query.filter(Message.created_at > row.summary_through_at)
+    messages = query.order_by(Message.created_at.asc()).limit(limit).all()
+    return row.summary, row.summary_through_at, messages
+
+
+def store_summary(
+    db: Session,
+    conversation_id,
+    summary: str,
+    through_at: datetime,
+    previous_through_at: Optional[datetime],
+) -> bool:
+    """
+    Save a new rolling summary unless another worker already advanced it since
+    `previous_through_at` was read. Returns whether the summary was stored.
+    """
+    if previous_through_at is None:
+        unchanged = Conversation.summary_through_at.is_(None)
+    else:
+        unchanged = Conversation.summary_through_at == previous_through_at
+    result = db.execute(
+        update(Conversation)
+        .where(Conversation.id == conversation_id, unchanged)
+        .values(summary=summary, summary_through_at=through_at)
+    )
+    db.commit()
+    return result.rowcount == 1
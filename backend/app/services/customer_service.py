@@ -1,12 +1,31 @@
-from typing import Optional
-from sqlalchemy.orm import Session
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import DateTime, case, column, func, literal, or_, select, tuple_, update, values
+from sqlalchemy.dialects.postgresql import UUID, insert as pg_insert
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 from app.models.channel_identity import ChannelIdentity
 from app.models.customer import Customer
+from app.services import stats_service
+from app.utils.pagination import paginate
 
-def get_or_create_customer(db: Session, tenant_id, channel: str, external_id: str) -> Customer:
-    identity = (
-        db.query(ChannelIdentity)
+def get_or_create_customer(
+    db: Session, tenant_id, channel: str, external_id: str, commit: bool = True
+) -> Customer:
+    """
+    Return the customer behind a channel identity, creating both on first contact.
+
+    Returning visitors are a single indexed lookup. New visitors are created
+    with one `INSERT ... ON CONFLICT ... RETURNING` statement that claims the
+    identity and inserts the customer only if this call won the identity, so
+    concurrent first messages from one session resolve to the same customer.
+    A new customer is inserted as seen now (this is its first contact).
+    With `commit=False` the insert stays in the caller's transaction.
+    """
+    customer = (
+        db.query(Customer)
+        .join(ChannelIdentity, ChannelIdentity.customer_id == Customer.id)
         .filter(
             ChannelIdentity.tenant_id == tenant_id,
             ChannelIdentity.channel == channel,
@@ -14,22 +33,75 @@ def get_or_create_customer(db: Session, tenant_id, channel: str, external_id: st
         )
         .first()
     )
-    if identity:
-        customer = identity.customer
-    else:
-        customer = Customer(tenant_id=tenant_id)
-        db.add(customer)
-        db.commit()
-        db.refresh(customer)
-        identity = ChannelIdentity(
+    if customer:
+        return customer
+
+    now = datetime.utcnow()
+    customer_id = uuid.uuid4()
+    # DO UPDATE (rather than DO NOTHING) so a concurrently inserted identity
+    # still returns its customer_id. Foreign keys are checked at the end of the
+    # statement, so the identity may reference the customer inserted after it.
+    identity = (
+        pg_insert(ChannelIdentity)
+        .values(
+            id=uuid.uuid4(),
             tenant_id=tenant_id,
-            customer_id=customer.id,
+            customer_id=customer_id,
             channel=channel,
             external_id=external_id,
+            created_at=now,
+        )
+        .on_conflict_do_update(
+            index_elements=[ChannelIdentity.tenant_id, ChannelIdentity.channel, ChannelIdentity.external_id],
+            set_={"external_id": pg_insert(ChannelIdentity).excluded.external_id},
         )
-        db.add(identity)
+        .returning(ChannelIdentity.customer_id)
+        .cte("identity")
+    )
+    created = (
+        pg_insert(Customer)
+        .from_select(
+            ["id", "tenant_id", "created_at", "updated_at", "last_seen_at"],
+            select(
+                literal(customer_id, UUID(as_uuid=True)),
+                literal(tenant_id, UUID(as_uuid=True)),
+                literal(now, DateTime),
+                literal(now, DateTime),
+                literal(now, DateTime),
+            ).where(identity.c.customer_id == customer_id),
+        )
+        .returning(Customer.id)
+        .cte("created")
+    )
+    resolved_id, inserted = db.execute(
+        select(identity.c.customer_id, select(func.count()).select_from(created).scalar_subquery())
+    ).one()
+    if inserted:
+        # The identity was inserted with the customer.
+        stats_service.record(db, tenant_id, channel, new_customers=1, channel_identities=1, at=now)
+    if commit:
         db.commit()
-        db.refresh(identity)
+
+    if resolved_id != customer_id:
+        # Another request created this visitor first.
+        return db.get(Customer, resolved_id)
+
+    # Every column is known, so the row is attached as persistent without reading it back.
+    customer = Customer(
+        id=customer_id,
+        tenant_id=tenant_id,
+        first_name=None,
+        last_name=None,
+        full_name=None,
+        primary_phone=None,
+        email=None,
+        source=None,
+        created_at=now,
+        updated_at=now,
+        last_seen_at=now,
+    )
+    make_transient_to_detached(customer)
+    db.add(customer)
     return customer
 
 
@@ -42,55 +114,69 @@ def get_or_create_customer_by_email(
     phone: Optional[str] = None,
     source: Optional[str] = None,
 ) -> Customer:
-    customer = (
-        db.query(Customer)
-        .filter(Customer.tenant_id == tenant_id, Customer.email == email)
-        .first()
-    )
-    if customer:
-        updated = False
-        if first_name and customer.first_name != first_name:
-            customer.first_name = first_name
-            updated = True
-        if last_name and customer.last_name != last_name:
-            customer.last_name = last_name
-            updated = True
-        if phone and customer.primary_phone != phone:
-            customer.primary_phone = phone
-            updated = True
-        if source and customer.source != source:
-            customer.source = source
-            updated = True
-        if updated:
-            customer.full_name = f"{customer.first_name or ''} {customer.last_name or ''}".strip() or customer.full_name
-            db.add(customer)
-            db.commit()
-            db.refresh(customer)
-        return customer
-
-    customer = Customer(
+    """
+    Upsert a customer on (tenant_id, email) in one round trip. Provided fields
+    overwrite stored ones; fields passed as None or "" keep their stored values,
+    and `updated_at` only moves when something changed.
+    """
+    now = datetime.utcnow()
+    stmt = pg_insert(Customer).values(
+        id=uuid.uuid4(),
         tenant_id=tenant_id,
         email=email,
         first_name=first_name,
         last_name=last_name,
+        full_name=f"{first_name or ''} {last_name or ''}".strip() or None,
         primary_phone=phone,
         source=source,
+        created_at=now,
+        updated_at=now,
     )
-    customer.full_name = f"{first_name or ''} {last_name or ''}".strip() or None
-    db.add(customer)
+    excluded = stmt.excluded
+
+    def merged(name: str):
+        # Empty values never overwrite stored ones, as with None.
+        return func.coalesce(func.nullif(getattr(excluded, name), ""), getattr(Customer, name))
+
+    fields = ("first_name", "last_name", "primary_phone", "source")
+    changed = tuple_(*(merged(name) for name in fields)).is_distinct_from(
+        tuple_(*(getattr(Customer, name) for name in fields))
+    )
+    full_name = func.coalesce(
+        func.nullif(func.trim(func.concat_ws(" ", merged("first_name"), merged("last_name"))), ""),
+        Customer.full_name,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Customer.tenant_id, Customer.email],
+        index_where=Customer.email.isnot(None),
+        set_={
+            **{name: merged(name) for name in fields},
+            # Only a real change rewrites full_name and bumps updated_at.
+            "full_name": case((changed, full_name), else_=Customer.full_name),
+            "updated_at": case((changed, now), else_=Customer.updated_at),
+        },
+    ).returning(Customer)
+    customer = db.execute(
+        select(Customer).from_statement(stmt).execution_options(populate_existing=True)
+    ).scalar_one()
+    # An existing row keeps its created_at, so only a fresh insert carries ours.
+    if customer.created_at == now:
+        stats_service.record(db, tenant_id, stats_service.EMAIL_CHANNEL, new_customers=1, at=now)
     db.commit()
-    db.refresh(customer)
     return customer
 
-def list_customers(db: Session, tenant_id, page: int = 1, page_size: int = 20):
-    offset = (page - 1) * page_size
-    return (
-        db.query(Customer)
-        .filter(Customer.tenant_id == tenant_id)
-        .order_by(Customer.created_at.desc())
-        .offset(offset)
-        .limit(page_size)
-        .all()
+
+def list_customers(
+    db: Session, tenant_id, page: int = 1, page_size: int = 20, cursor: Optional[str] = None
+) -> Tuple[List[Customer], Optional[str]]:
+    """Newest customers first, by `page` or keyset `cursor`; returns (items, next_cursor)."""
+    return paginate(
+        db.query(Customer).filter(Customer.tenant_id == tenant_id),
+        Customer.created_at,
+        Customer.id,
+        page_size,
+        page=page,
+        cursor=cursor,
     )
 
 def get_customer(db: Session, tenant_id, customer_id) -> Optional[Customer]:
@@ -99,3 +185,26 @@ def get_customer(db: Session, tenant_id, customer_id) -> Optional[Customer]:
         .filter(Customer.tenant_id == tenant_id, Customer.id == customer_id)
         .first()
     )
+
+
+def touch_last_seen(db: Session, seen: Dict[uuid.UUID, datetime]) -> int:
+    """
+    Advance `last_seen_at` for many customers in one
+    `UPDATE customers ... FROM (VALUES ...)`; never moves a timestamp backwards.
+    """
+    if not seen:
+        return 0
+    seen_rows = values(
+        column("id", UUID(as_uuid=True)), column("seen_at", DateTime), name="seen"
+    ).data(list(seen.items()))
+    result = db.execute(
+        update(Customer)
+        .where(
+            Customer.id == seen_rows.c.id,
+            or_(Customer.last_seen_at.is_(None), Customer.last_seen_at < seen_rows.c.seen_at),
+        )
+        .values(last_seen_at=seen_rows.c.seen_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
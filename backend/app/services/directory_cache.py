@@ -0,0 +1,281 @@
+"""
+In-process cache of public agent and tenant lookups.
+
+Every widget page load and chat message resolves an agent slug (and its
+tenant) or a tenant slug. That data almost never changes, so resolved rows are
+kept as immutable snapshots in a TTL + LRU cache per worker, together with
+each tenant's default (most recent active) agent. Writers call
+`invalidate_agent` / `invalidate_tenant`, which evict locally and broadcast the
+invalidation to every other uvicorn worker through Postgres LISTEN/NOTIFY.
+"""
+import json
+import logging
+import select
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+import psycopg2
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models.agent import Agent
+from app.models.tenant import Tenant
+from app.services import agent_prompt_service
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+NOTIFY_CHANNEL = "onduty_cache_invalidation"
+
+
+@dataclass(frozen=True)
+class TenantSnapshot:
+    id: Any
+    name: str
+    slug: str
+    plan_type: str
+    billing_status: str
+    trial_ends_at: Optional[datetime]
+    is_special_permissioned: bool
+
+    @classmethod
+    def from_model(cls, tenant: Tenant) -> "TenantSnapshot":
+        return cls(
+            id=tenant.id,
+            name=tenant.name,
+            slug=tenant.slug,
+            plan_type=tenant.plan_type,
+            billing_status=tenant.billing_status,
+            trial_ends_at=tenant.trial_ends_at,
+            is_special_permissioned=bool(tenant.is_special_permissioned),
+        )
+
+
+@dataclass(frozen=True)
+class AgentSnapshot:
+    """Read-only stand-in for an `Agent` row; exposes the same attribute names."""
+
+    id: Any
+    tenant_id: Any
+    name: str
+    slug: str
+    status: str
+    agent_type: str
+    model_provider: str
+    model_name: Optional[str]
+    training_mode: str
+    job_and_company_profile: dict
+    customer_profile: dict
+    data_profile: Optional[dict]
+    allowed_websites: Optional[list]
+    model_settings: Optional[dict]
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_model(cls, agent: Agent) -> "AgentSnapshot":
+        return cls(
+            id=agent.id,
+            tenant_id=agent.tenant_id,
+            name=agent.name,
+            slug=agent.slug,
+            status=agent.status,
+            agent_type=agent.agent_type,
+            model_provider=agent.model_provider,
+            model_name=agent.model_name,
+            training_mode=agent.training_mode,
+            job_and_company_profile=agent.job_and_company_profile,
+            customer_profile=agent.customer_profile,
+            data_profile=agent.data_profile,
+            allowed_websites=agent.allowed_websites,
+            model_settings=agent.model_settings,
+            created_at=agent.created_at,
+            updated_at=agent.updated_at,
+        )
+
+
+# ("agent", agent_slug) -> (AgentSnapshot, TenantSnapshot); ("tenant", tenant_slug) -> TenantSnapshot;
+# ("active", tenant_id) -> AgentSnapshot or _NO_AGENT
+_NO_AGENT = object()
+_cache: LRUCache = LRUCache(
+    maxsize=settings.directory_cache_size, ttl_seconds=settings.directory_cache_ttl_seconds
+)
+
+
+def get_public_agent(db: Session, agent_slug: str) -> Optional[Tuple[AgentSnapshot, TenantSnapshot]]:
+    """Resolve a non-disabled agent by slug together with its tenant."""
+    key = ("agent", agent_slug)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    row = (
+        db.query(Agent, Tenant)
+        .join(Tenant, Tenant.id == Agent.tenant_id)
+        .filter(Agent.slug == agent_slug, Agent.status != "disabled")
+        .first()
+    )
+    if not row:
+        return None
+
+    resolved = (AgentSnapshot.from_model(row.Agent), TenantSnapshot.from_model(row.Tenant))
+    _cache.set(key, resolved)
+    return resolved
+
+
+def get_tenant_by_slug(db: Session, tenant_slug: str) -> Optional[TenantSnapshot]:
+    key = ("tenant", tenant_slug)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    tenant = db.query(Tenant).filter(Tenant.slug == tenant_slug).first()
+    if not tenant:
+        return None
+    return remember_tenant(tenant)
+
+
+def get_active_agent(db: Session, tenant_id) -> Optional[AgentSnapshot]:
+    """
+    Return the most recent active Agent for this tenant.
+    If none is active, return the most recent Agent for the tenant, or None.
+    """
+    key = ("active", str(tenant_id))
+    cached = _cache.get(key)
+    if cached is not None:
+        return None if cached is _NO_AGENT else cached
+
+    agent = (
+        db.query(Agent)
+        .filter(Agent.tenant_id == tenant_id, Agent.status == "active")
+        .order_by(Agent.created_at.desc())
+        .first()
+    )
+    if not agent:
+        agent = (
+            db.query(Agent)
+            .filter(Agent.tenant_id == tenant_id)
+            .order_by(Agent.created_at.desc())
+            .first()
+        )
+    snapshot = AgentSnapshot.from_model(agent) if agent else None
+    _cache.set(key, snapshot or _NO_AGENT)
+    return snapshot
+
+
+def remember_tenant(tenant: Tenant) -> TenantSnapshot:
+    """Cache a tenant row that was loaded (or created) elsewhere."""
+    snapshot = TenantSnapshot.from_model(tenant)
+    _cache.set(("tenant", tenant.slug), snapshot)
+    return snapshot
+
+
+def _evict_agent(agent_id: str, tenant_id: str) -> None:
+    _cache.pop_where(
+        lambda key, value: (key[0] == "agent" and str(value[0].id) == agent_id)
+        or (key[0] == "active" and key[1] == tenant_id)
+    )
+    agent_prompt_service.evict_agent_prompt(agent_id)
+
+
+def _evict_tenant(tenant_id: str) -> None:
+    _cache.pop_where(
+        lambda key, value: (key[0] == "tenant" and str(value.id) == tenant_id)
+        or (key[0] == "agent" and str(value[1].id) == tenant_id)
+    )
+
+
+def _apply(message: dict) -> None:
+    if message["kind"] == "agent":
+        _evict_agent(message["id"], message["tenant_id"])
+    elif message["kind"] == "tenant":
+        _evict_tenant(message["id"])
+
+
+def _broadcast(db: Session, message: dict) -> None:
+    """Queue a NOTIFY in the caller's transaction; Postgres delivers it on commit."""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": NOTIFY_CHANNEL, "payload": json.dumps(message)},
+    )
+
+
+def invalidate_agent(db: Session, agent_id, tenant_id) -> None:
+    """
+    Evict an agent (its slug entry, compiled prompts and its tenant's active-agent
+    entry) everywhere. Call before committing the change.
+    """
+    message = {"kind": "agent", "id": str(agent_id), "tenant_id": str(tenant_id)}
+    _apply(message)
+    _broadcast(db, message)
+
+
+def invalidate_tenant(db: Session, tenant_id) -> None:
+    """Evict a tenant (and the agents resolved with it) everywhere. Call before committing the change."""
+    message = {"kind": "tenant", "id": str(tenant_id)}
+    _apply(message)
+    _broadcast(db, message)
+
+
+class _InvalidationListener(threading.Thread):
+    """Background thread that applies invalidations broadcast by other workers."""
+
+    def __init__(self) -> None:
+        super().__init__(name="directory-cache-listener", daemon=True)
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        dsn = make_url(settings.database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(dsn)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                # Anything cached before LISTEN may have missed an invalidation.
+                _cache.clear()
+                while not self._stop_event.is_set():
+                    if select.select([conn], [], [], 5.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            _apply(json.loads(notify.payload))
+                        except (ValueError, KeyError):
+                            logger.warning("Ignoring malformed cache invalidation: %s", notify.payload)
+            except Exception:
+                logger.exception("Directory cache listener failed; retrying")
+                self._stop_event.wait(5.0)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+_listener: Optional[_InvalidationListener] = None
+
+
+def start_listener() -> None:
+    global _listener
+    if _listener is None or not _listener.is_alive():
+        _listener = _InvalidationListener()
+        _listener.start()
+
+
+def stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,84 @@
+"""
+Agent knowledge documents: metadata rows in `agent_documents`, bytes in the
+content-addressed blob store.
+
+One blob can back many documents (identical uploads are stored once), so a
+blob, and the text chunks extracted from it, are deleted only when its last
+document goes. Uploads, deletions and ingestion of the same hash serialize on
+a transaction-scoped advisory lock, so a blob is never removed underneath an
+upload that is reusing it.
+"""
+from typing import BinaryIO, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.agent_document import AgentDocument
+from app.models.agent_document_chunk import AgentDocumentChunk
+from app.services import knowledge_service
+from app.services.blob_store import StoredBlob, get_blob_store
+
+MAX_DOCUMENT_SIZE_BYTES = 10 * 1024 * 1024  # 10 MB
+
+
+def lock_blob(db: Session, content_hash: str) -> None:
+    """Serialize work on one blob (and its chunks) until the transaction ends."""
+    db.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"blob:{content_hash}"))))
+
+
+def put_blob(db: Session, source: BinaryIO, max_size: Optional[int] = None) -> StoredBlob:
+    """
+    Store `source` (seekable) and take the blob's lock for the rest of the
+    transaction, which must then commit the row that references it.
+    """
+    store = get_blob_store()
+    while True:
+        blob = store.put(source, max_size=max_size)
+        lock_blob(db, blob.sha256)
+        # The last document using an existing copy may have been deleted (with its blob) meanwhile.
+        if store.exists(blob.sha256):
+            return blob
+        db.rollback()
+        source.seek(0)
+
+
+def store_document(
+    db: Session, agent_id, source: BinaryIO, filename: str, content_type: Optional[str]
+) -> AgentDocument:
+    """
+    Stream `source` (a seekable file object) into the blob store and record the
+    document. Raises `BlobTooLarge` past `MAX_DOCUMENT_SIZE_BYTES`.
+    """
+    blob = put_blob(db, source, max_size=MAX_DOCUMENT_SIZE_BYTES)
+    document = AgentDocument(
+        agent_id=agent_id,
+        filename=filename,
+        content_type=content_type or "application/octet-stream",
+        size_bytes=blob.size,
+        content_hash=blob.sha256,
+    )
+    db.add(document)
+    db.commit()
+    return document
+
+
+def delete_document(db: Session, document: AgentDocument) -> None:
+    """Delete a document, and its blob when no other document shares it."""
+    content_hash = document.content_hash
+    agent_id = document.agent_id
+    db.delete(document)
+    db.commit()
+    knowledge_service.mark_stale(agent_id)
+    if not content_hash:
+        return
+
+    lock_blob(db, content_hash)
+    still_used = (
+        db.query(AgentDocument.id).filter(AgentDocument.content_hash == content_hash).first() is not None
+    )
+    if not still_used:
+        db.query(AgentDocumentChunk).filter(AgentDocumentChunk.content_hash == content_hash).delete(
+            synchronize_session=False
+        )
+        get_blob_store().delete(content_hash)
+    db.commit()
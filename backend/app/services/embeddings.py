@@ -0,0 +1,145 @@
+"""
+Text embedders for semantic knowledge retrieval (`EMBEDDING_BACKEND`):
+
+- `none` (default): semantic retrieval is off, replies use BM25 only.
+- `hashing`: a local stand-in needing no model. Signed feature hashing of
+  accent-folded words and character 3-5-grams into `EMBEDDING_DIM`
+  dimensions. It catches inflections and typos rather than true paraphrases,
+  so it is meant for development and as a fallback.
+- `local`: a sentence-transformers model on CPU (`EMBEDDING_MODEL`, e.g.
+  `paraphrase-multilingual-MiniLM-L12-v2`). The package is only needed when
+  this backend is selected.
+- `http`: any OpenAI-compatible `/embeddings` endpoint at `EMBEDDING_URL`.
+
+Vectors are L2-normalized, so a dot product is the cosine similarity. Chunk
+vectors are computed in batches by the ingestion worker (in its process pool,
+which is why this module takes an explicit `EmbeddingConfig` rather than
+reading settings); only the query is embedded at request time.
+"""
+import json
+import unicodedata
+import urllib.request
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class EmbeddingConfig:
+    backend: str
+    model: Optional[str] = None
+    url: Optional[str] = None
+    api_key: Optional[str] = None
+    dim: int = 384
+    batch_size: int = 64
+
+    @property
+    def name(self) -> str:
+        """Stored next to each vector; vectors of another name are not comparable."""
+        if self.backend == "hashing":
+            return f"hashing:{self.dim}"
+        return f"{self.backend}:{self.model}"
+
+
+def config_from_settings(settings) -> Optional[EmbeddingConfig]:
+    if settings.embedding_backend in ("", "none"):
+        return None
+    return EmbeddingConfig(
+        backend=settings.embedding_backend,
+        model=settings.embedding_model,
+        url=settings.embedding_url,
+        api_key=settings.embedding_api_key,
+        dim=settings.embedding_dim,
+        batch_size=settings.embedding_batch_size,
+    )
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class HashingEmbedder:
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        text = unicodedata.normalize("NFKD", text.lower())
+        words = "".join(ch for ch in text if not unicodedata.combining(ch)).split()
+        features = list(words)
+        for word in words:
+            padded = f"<{word}>"
+            for size in (3, 4, 5):
+                features.extend(padded[i : i + size] for i in range(len(padded) - size + 1))
+        return features
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = zlib.crc32(feature.encode())
+                vectors[row, digest % self.dim] += 1.0 if digest & 0x80000000 else -1.0
+        return _normalize(np.sign(vectors) * np.log1p(np.abs(vectors)))
+
+
+class LocalModelEmbedder:
+    def __init__(self, model: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as exc:
+            raise RuntimeError("EMBEDDING_BACKEND=local requires the sentence-transformers package") from exc
+        self._model = SentenceTransformer(model, device="cpu")
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = self._model.encode(list(texts), convert_to_numpy=True, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class HttpEmbedder:
+    def __init__(self, url: str, model: Optional[str], api_key: Optional[str], timeout: float = 30.0):
+        if not url:
+            raise RuntimeError("EMBEDDING_BACKEND=http requires EMBEDDING_URL")
+        self.url = url
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        body = json.dumps({"model": self.model, "input": list(texts)}).encode()
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        if self.api_key:
+            request.add_header("Authorization", f"Bearer {self.api_key}")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            payload = json.load(response)
+        data = sorted(payload["data"], key=lambda item: item["index"])
+        return _normalize(np.asarray([item["embedding"] for item in data], dtype=np.float32))
+
+
+@lru_cache(maxsize=4)
+def get_embedder(config: EmbeddingConfig):
+    """One embedder per configuration and process (the local model is loaded once)."""
+    if config.backend == "hashing":
+        return HashingEmbedder(config.dim)
+    if config.backend == "local":
+        return LocalModelEmbedder(config.model)
+    if config.backend == "http":
+        return HttpEmbedder(config.url, config.model, config.api_key)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {config.backend}")
+
+
+def embed_texts(config: EmbeddingConfig, texts: Sequence[str]) -> np.ndarray:
+    """Embed `texts` in batches of `config.batch_size`; float16 rows (the stored precision)."""
+    embedder = get_embedder(config)
+    batches = [
+        embedder.embed(texts[start : start + config.batch_size]) for start in range(0, len(texts), config.batch_size)
+    ]
+    if not batches:
+        return np.zeros((0, config.dim), dtype=np.float16)
+    return np.concatenate(batches).astype(np.float16)
+
+
+def embed_query(config: EmbeddingConfig, text: str) -> np.ndarray:
+    return get_embedder(config).embed([text])[0]
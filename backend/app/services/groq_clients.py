@@ -0,0 +1,175 @@
+"""
+Process-wide registry of pooled Groq clients.
+
+Building a new `AsyncGroq` per message throws away the HTTP connection pool,
+so every reply pays a fresh TLS handshake. Instead we keep one long-lived
+client per (API key, base URL) with tuned pool limits and explicit timeouts,
+and count how many requests reused a warm connection versus opened a new one.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from groq import AsyncGroq
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+@dataclass
+class ClientStats:
+    requests: int = 0
+    connections_opened: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_connection_opened(self) -> None:
+        with self._lock:
+            self.connections_opened += 1
+
+    @property
+    def connections_reused(self) -> int:
+        return max(self.requests - self.connections_opened, 0)
+
+
+class _TracingTransport(httpx.AsyncHTTPTransport):
+    """HTTP transport that reports new TCP connections through httpcore's trace hook."""
+
+    def __init__(self, stats: ClientStats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._stats.record_request()
+        request.extensions["trace"] = self._trace
+        return await super().handle_async_request(request)
+
+    async def _trace(self, event_name: str, info: dict) -> None:
+        if event_name == "connection.connect_tcp.started":
+            self._stats.record_connection_opened()
+
+
+@dataclass
+class _ClientEntry:
+    client: AsyncGroq
+    loop: asyncio.AbstractEventLoop
+    base_url: Optional[str]
+    key_fingerprint: str
+    stats: ClientStats
+
+
+_clients: Dict[Tuple[str, Optional[str]], _ClientEntry] = {}
+_registry_lock = threading.Lock()
+
+
+def _fingerprint(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8]
+
+
+def _build_timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        settings.groq_read_timeout,
+        connect=settings.groq_connect_timeout,
+        pool=settings.groq_connect_timeout,
+    )
+
+
+def _build_client(api_key: str, base_url: Optional[str], stats: ClientStats) -> AsyncGroq:
+    limits = httpx.Limits(
+        max_connections=settings.groq_max_connections,
+        max_keepalive_connections=settings.groq_max_keepalive_connections,
+        keepalive_expiry=settings.groq_keepalive_expiry,
+    )
+    timeout = _build_timeout()
+    http_client = httpx.AsyncClient(
+        transport=_TracingTransport(stats, limits=limits),
+        timeout=timeout,
+    )
+    return AsyncGroq(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=timeout,
+        max_retries=settings.groq_max_retries,
+        http_client=http_client,
+    )
+
+
+def _close_elsewhere(entry: _ClientEntry) -> None:
+    """Close a client being replaced; it can only be closed on the loop that owns its pool."""
+    if entry.loop.is_running():
+        asyncio.run_coroutine_threadsafe(entry.client.close(), entry.loop)
+    else:
+        logger.warning(
+            "Dropping Groq client (key %s) whose event loop stopped without close_clients()", entry.key_fingerprint
+        )
+
+def get_async_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> AsyncGroq:
+    """
+    Return the shared `AsyncGroq` client for this API key and base URL.
+
+    httpx connection pools are bound to the event loop that created them, so a
+    client is rebuilt if it is requested from a different loop, and the one it
+    replaces is closed. Code that runs its own short-lived loops (like the sync
+    `generate_reply` wrapper) calls `close_clients` before the loop ends.
+    """
+    api_key = api_key or settings.groq_api_key
+    base_url = base_url or settings.groq_base_url
+    loop = asyncio.get_running_loop()
+    key = (api_key, base_url)
+
+    with _registry_lock:
+        entry = _clients.get(key)
+        if entry is None or entry.loop is not loop or entry.loop.is_closed():
+            if entry is not None:
+                _close_elsewhere(entry)
+            stats = entry.stats if entry else ClientStats()
+            entry = _ClientEntry(
+                client=_build_client(api_key, base_url, stats),
+                loop=loop,
+                base_url=base_url,
+                key_fingerprint=_fingerprint(api_key),
+                stats=stats,
+            )
+            _clients[key] = entry
+            logger.info("Opened pooled Groq client (key %s, base_url %s)", entry.key_fingerprint, base_url)
+        return entry.client
+
+
+def client_pool_stats() -> List[dict]:
+    """Snapshot of per-client connection counters, safe to expose to admins."""
+    with _registry_lock:
+        entries = list(_clients.values())
+    return [
+        {
+            "key_fingerprint": entry.key_fingerprint,
+            "base_url": entry.base_url,
+            "requests": entry.stats.requests,
+            "connections_opened": entry.stats.connections_opened,
+            "connections_reused": entry.stats.connections_reused,
+        }
+        for entry in entries
+    ]
+
+
+async def close_clients() -> None:
+    """Close pooled clients owned by the running event loop (used on shutdown)."""
+    loop = asyncio.get_running_loop()
+    with _registry_lock:
+        owned = [(key, entry) for key, entry in _clients.items() if entry.loop is loop]
+        for key, _ in owned:
+            _clients.pop(key, None)
+    for _, entry in owned:
+        try:
+            await entry.client.close()
+        except Exception:
+            logger.exception("Failed to close pooled Groq client")
@@ -0,0 +1,313 @@
+"""
+Background ingestion of agent knowledge documents: text extraction and chunking.
+
+Uploads are only stored (document_service); this worker turns them into text
+the agent can use. Each document is claimed (`pending` -> `processing`), its
+blob is read from the blob store, and text extraction and chunking run in a
+bounded process pool (`INGESTION_WORKERS`) so large PDFs never block the event
+loop or hold the GIL. The passages are written to `agent_document_chunks` and
+the document is marked `ready` (or `failed`, with the reason).
+
+- Idempotent by content hash: chunks belong to the bytes, not the document, so
+  re-uploading a file (to any agent) is marked `ready` without extracting again.
+- With an embedding backend configured, the chunks are also embedded in
+  batches in the same pool and stored with them for semantic retrieval. If
+  embedding fails the document is still `ready` for keyword retrieval, and
+  scripts/embed_document_chunks.py fills the gap later.
+- Restartable: the database is the queue. On startup every `pending` document
+  is queued, as is any left `processing` longer than `INGESTION_STALE_SECONDS`
+  by a worker that died; claims are conditional updates, so several API
+  workers never ingest the same document at once.
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+
+import numpy as np
+from sqlalchemy import and_, or_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.db import SessionLocal
+from app.models.agent_document import AgentDocument
+from app.models.agent_document_chunk import AgentDocumentChunk
+from app.services import embeddings, knowledge_service, text_extraction
+from app.services.blob_store import get_blob_store
+from app.services.document_service import lock_blob
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+PENDING = "pending"
+PROCESSING = "processing"
+READY = "ready"
+FAILED = "failed"
+
+_INSERT_BATCH_SIZE = 1000
+
+_queue: Optional[asyncio.Queue] = None
+_tasks: List[asyncio.Task] = []
+_pool: Optional[ProcessPoolExecutor] = None
+# Queued or in progress in this worker.
+_queued: Set[object] = set()
+
+
+def running() -> bool:
+    return any(not task.done() for task in _tasks)
+
+
+def _claimable():
+    stale = datetime.utcnow() - timedelta(seconds=settings.ingestion_stale_seconds)
+    return and_(
+        AgentDocument.content_hash.isnot(None),
+        or_(
+            AgentDocument.ingestion_status == PENDING,
+            and_(
+                AgentDocument.ingestion_status == PROCESSING,
+                AgentDocument.ingestion_updated_at < stale,
+            ),
+        ),
+    )
+
+
+def _set_status(db: Session, condition, status: str, error: Optional[str] = None):
+    return db.execute(
+        update(AgentDocument)
+        .where(condition)
+        .values(ingestion_status=status, ingestion_error=error, ingestion_updated_at=datetime.utcnow())
+        .returning(AgentDocument.id, AgentDocument.content_hash, AgentDocument.filename, AgentDocument.content_type)
+        .execution_options(synchronize_session=False)
+    ).first()
+
+
+def _claim(db: Session, document_id):
+    """
+    Mark the document `processing` if it still needs ingesting. Returns its
+    hash, filename and type, and the existing chunk texts when only the
+    embeddings are missing.
+    """
+    claimed = _set_status(db, and_(AgentDocument.id == document_id, _claimable()), PROCESSING)
+    if claimed is None:
+        db.rollback()
+        return None
+    chunks = [
+        row.text
+        for row in db.query(AgentDocumentChunk.text)
+        .filter(AgentDocumentChunk.content_hash == claimed.content_hash)
+        .order_by(AgentDocumentChunk.chunk_index)
+    ]
+    if chunks and not _missing_embeddings(db, claimed.content_hash):
+        agent_ids = _mark_hash_ready(db, claimed.content_hash)
+        db.commit()
+        knowledge_service.mark_stale(*agent_ids)
+        return None
+    db.commit()
+    return claimed, chunks or None
+
+
+def _missing_embeddings(db: Session, content_hash: str) -> bool:
+    config = knowledge_service.embedding_config
+    if config is None:
+        return False
+    return (
+        db.query(AgentDocumentChunk.chunk_index)
+        .filter(
+            AgentDocumentChunk.content_hash == content_hash,
+            or_(AgentDocumentChunk.embedding_model.is_(None), AgentDocumentChunk.embedding_model != config.name),
+        )
+        .first()
+        is not None
+    )
+
+
+def _mark_hash_ready(db: Session, content_hash: str) -> list:
+    """Every document with these bytes, including re-uploads still waiting in the queue; returns their agents."""
+    rows = db.execute(
+        update(AgentDocument)
+        .where(
+            AgentDocument.content_hash == content_hash,
+            AgentDocument.ingestion_status.in_((PENDING, PROCESSING)),
+        )
+        .values(ingestion_status=READY, ingestion_error=None, ingestion_updated_at=datetime.utcnow())
+        .returning(AgentDocument.agent_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    return [row.agent_id for row in rows]
+
+
+def store_chunks(db: Session, content_hash: str, chunks: List[str], vectors: Optional[np.ndarray] = None) -> None:
+    """Write the chunks of a blob (and their embeddings, replacing older ones) and mark its documents ready."""
+    lock_blob(db, content_hash)
+    # The last document with these bytes may have been deleted while they were being extracted.
+    if db.query(AgentDocument.id).filter(AgentDocument.content_hash == content_hash).first() is None:
+        db.rollback()
+        return
+    rows = [{"content_hash": content_hash, "chunk_index": index, "text": chunk} for index, chunk in enumerate(chunks)]
+    if vectors is not None:
+        model = knowledge_service.embedding_config.name
+        for row, vector in zip(rows, vectors):
+            row.update(embedding=vector.tobytes(), embedding_model=model)
+    for start in range(0, len(rows), _INSERT_BATCH_SIZE):
+        statement = pg_insert(AgentDocumentChunk).values(rows[start : start + _INSERT_BATCH_SIZE])
+        if vectors is not None:
+            statement = statement.on_conflict_do_update(
+                index_elements=[AgentDocumentChunk.content_hash, AgentDocumentChunk.chunk_index],
+                set_={
+                    "embedding": statement.excluded.embedding,
+                    "embedding_model": statement.excluded.embedding_model,
+                },
+            )
+        else:
+            statement = statement.on_conflict_do_nothing()
+        db.execute(statement)
+    agent_ids = _mark_hash_ready(db, content_hash)
+    db.commit()
+    knowledge_service.mark_stale(*agent_ids)
+
+
+def _fail(db: Session, document_id, error: str) -> None:
+    _set_status(db, AgentDocument.id == document_id, FAILED, error[:1000])
+    db.commit()
+
+
+def _release(db: Session, document_ids) -> None:
+    """Hand documents interrupted by shutdown back to the queue."""
+    _set_status(
+        db,
+        and_(AgentDocument.id.in_(list(document_ids)), AgentDocument.ingestion_status == PROCESSING),
+        PENDING,
+    )
+    db.commit()
+
+
+def _claimable_ids(db: Session) -> list:
+    return [
+        row.id
+        for row in db.query(AgentDocument.id).filter(_claimable()).order_by(AgentDocument.created_at).all()
+    ]
+
+
+def _in_session(fn, *args):
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+def _read_blob(content_hash: str) -> bytes:
+    return b"".join(get_blob_store().read_chunks(content_hash))
+
+
+async def _ingest(document_id) -> None:
+    claim = await asyncio.to_thread(_in_session, _claim, document_id)
+    if claim is None:
+        return
+    claimed, chunks = claim
+    loop = asyncio.get_running_loop()
+    if chunks is None:
+        try:
+            data = await asyncio.to_thread(_read_blob, claimed.content_hash)
+            chunks = await loop.run_in_executor(
+                _pool,
+                text_extraction.extract_chunks,
+                data,
+                claimed.filename,
+                claimed.content_type,
+                settings.ingestion_chunk_chars,
+                settings.ingestion_chunk_overlap,
+            )
+            if not chunks:
+                raise text_extraction.UnsupportedDocument("No extractable text")
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            if not isinstance(exc, text_extraction.UnsupportedDocument):
+                logger.exception("Ingestion of document %s failed", document_id)
+            await asyncio.to_thread(_in_session, _fail, document_id, str(exc) or type(exc).__name__)
+            return
+
+    vectors = None
+    if knowledge_service.embedding_config is not None:
+        try:
+            vectors = await loop.run_in_executor(
+                _pool, embeddings.embed_texts, knowledge_service.embedding_config, chunks
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Embedding document %s failed; it is searchable by keywords only", document_id)
+    await asyncio.to_thread(_in_session, store_chunks, claimed.content_hash, chunks, vectors)
+    logger.info("Ingested document %s into %s chunks", document_id, len(chunks))
+
+
+async def _consume() -> None:
+    while True:
+        document_id = await _queue.get()
+        try:
+            await _ingest(document_id)
+        except Exception:
+            logger.exception("Ingestion worker error for document %s", document_id)
+        finally:
+            _queued.discard(document_id)
+            _queue.task_done()
+
+
+async def _resume() -> None:
+    try:
+        document_ids = await asyncio.to_thread(_in_session, _claimable_ids)
+    except Exception:
+        logger.exception("Failed to load documents awaiting ingestion")
+        return
+    for document_id in document_ids:
+        enqueue(document_id)
+    if document_ids:
+        logger.info("Queued %s documents awaiting ingestion", len(document_ids))
+
+
+def enqueue(document_id) -> None:
+    """Ingest a document in the background. A no-op when the pipeline is not running; it stays pending."""
+    if not running() or document_id in _queued:
+        return
+    _queued.add(document_id)
+    _queue.put_nowait(document_id)
+
+
+def start() -> None:
+    global _queue, _pool, _tasks
+    if settings.ingestion_workers <= 0 or running():
+        return
+    # Spawned (not forked) children: the parent has threads and open connections.
+    _pool = ProcessPoolExecutor(
+        max_workers=settings.ingestion_workers, mp_context=multiprocessing.get_context("spawn")
+    )
+    _queue = asyncio.Queue()
+    _tasks = [
+        asyncio.create_task(_consume(), name=f"document-ingestion-{index}")
+        for index in range(settings.ingestion_workers)
+    ]
+    _tasks.append(asyncio.create_task(_resume(), name="document-ingestion-resume"))
+
+
+async def stop() -> None:
+    global _pool, _tasks
+    if not _tasks:
+        return
+    interrupted = set(_queued)
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks = []
+    _queued.clear()
+    _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    if interrupted:
+        try:
+            await asyncio.to_thread(_in_session, _release, interrupted)
+        except Exception:
+            logger.exception("Failed to release %s interrupted ingestions", len(interrupted))
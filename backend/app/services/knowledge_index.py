@@ -0,0 +1,143 @@
+"""
+In-memory BM25 index over document chunks (one per agent, see knowledge_service).
+
+Postings are kept per term as two parallel `array`s (chunk slot, term
+frequency) instead of Python lists of tuples, roughly a tenth of the memory.
+Chunks are added and removed per content hash, so an agent's index follows
+its documents incrementally: additions append postings, removals tombstone
+slots (and are compacted away once they outnumber the live ones).
+
+Queries score every posting of every query term exactly; the arrays are
+viewed as numpy vectors (no copy), so even a term in most chunks costs a few
+vectorized operations rather than a Python loop over its postings.
+"""
+import math
+import re
+import sys
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens with accents removed ("Política" and "politica" match)."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return [token for token in _TOKEN.findall(text) if len(token) > 1 or token.isdigit()]
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._reset()
+
+    def _reset(self) -> None:
+        # term -> (chunk slots, term frequencies)
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        # Per slot: chunk text (None once removed), token count; length normalization and
+        # removed slots are derived from them before the next search.
+        self._texts: List[Optional[str]] = []
+        self._lengths = array("I")
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._removed = np.zeros(0, dtype=np.intp)
+        self._slots: Dict[str, range] = {}
+        self._live = 0
+        self._live_tokens = 0
+        self._norms_dirty = False
+
+    @property
+    def content_hashes(self):
+        return self._slots.keys()
+
+    def __len__(self) -> int:
+        return self._live
+
+    def add(self, content_hash: str, chunks: Iterable[str]) -> None:
+        if content_hash in self._slots:
+            return
+        first = len(self._texts)
+        for text in chunks:
+            slot = len(self._texts)
+            counts = Counter(tokenize(text))
+            for term, frequency in counts.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array("I"), array("H"))
+                postings[0].append(slot)
+                postings[1].append(min(frequency, 65535))
+            length = sum(counts.values())
+            self._texts.append(text)
+            self._lengths.append(length)
+            self._live += 1
+            self._live_tokens += length
+        self._slots[content_hash] = range(first, len(self._texts))
+        self._norms_dirty = True
+
+    def remove(self, content_hash: str) -> None:
+        slots = self._slots.pop(content_hash, None)
+        if slots is None:
+            return
+        for slot in slots:
+            self._texts[slot] = None
+            self._live -= 1
+            self._live_tokens -= self._lengths[slot]
+        self._norms_dirty = True
+        if len(self._texts) - self._live > max(self._live, 64):
+            self._compact()
+
+    def _compact(self) -> None:
+        live = [(content_hash, [self._texts[slot] for slot in slots]) for content_hash, slots in self._slots.items()]
+        self._reset()
+        for content_hash, chunks in live:
+            self.add(content_hash, chunks)
+
+    def _refresh_norms(self) -> None:
+        average = self._live_tokens / self._live if self._live else 1.0
+        lengths = np.frombuffer(self._lengths, dtype=self._lengths.typecode).astype(np.float32)
+        self._norms = self.k1 * (1 - self.b + self.b * lengths / average)
+        self._removed = np.fromiter(
+            (slot for slot, text in enumerate(self._texts) if text is None), dtype=np.intp
+        )
+        self._norms_dirty = False
+
+    def search(self, query: str, k: int) -> List[Tuple[float, str]]:
+        """The `k` best (score, chunk text) pairs for `query`, best first."""
+        if not self._live or k <= 0:
+            return []
+        if self._norms_dirty:
+            self._refresh_norms()
+        live = self._live
+        scores = np.zeros(len(self._texts), dtype=np.float32)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            slots = np.frombuffer(postings[0], dtype=postings[0].typecode)
+            tf = np.frombuffer(postings[1], dtype=postings[1].typecode).astype(np.float32)
+            # Document frequency includes removed slots until the next compaction; close enough.
+            df = min(len(slots), live)
+            weight = math.log(1 + (live - df + 0.5) / (df + 0.5)) * (self.k1 + 1)
+            # A term occurs at most once per slot, so the fancy-indexed add has no repeats.
+            scores[slots] += weight * tf / (tf + self._norms[slots])
+        scores[self._removed] = 0.0
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        best = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(float(scores[slot]), self._texts[slot]) for slot in best]
+
+    def memory_bytes(self) -> int:
+        """Approximate footprint, for the cache's memory budget."""
+        size = sys.getsizeof(self._texts) + sum(sys.getsizeof(text) for text in self._texts if text is not None)
+        size += self._lengths.buffer_info()[1] * self._lengths.itemsize
+        size += self._norms.nbytes + self._removed.nbytes
+        size += sys.getsizeof(self._postings)
+        for term, (slots, frequencies) in self._postings.items():
+            size += sys.getsizeof(term) + 2 * 64 + len(slots) * (slots.itemsize + frequencies.itemsize)
+        return size
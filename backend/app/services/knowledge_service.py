@@ -0,0 +1,251 @@
+"""
+Knowledge retrieval for agent replies.
+
+Each agent gets a BM25 index (knowledge_index) over the chunks of its `ready`
+documents, built on first use and cached per worker in an LRU bounded both by
+agent count and by approximate memory (`KNOWLEDGE_CACHE_MAX_BYTES`). Retrieval
+itself is pure in-memory work; the database is only consulted to keep an index
+in step with the agent's documents:
+
+- at most every `KNOWLEDGE_REFRESH_SECONDS`, one query compares the agent's
+  ready content hashes with the indexed ones, then only the chunks of new
+  hashes are loaded and removed hashes are dropped;
+- in this worker, deletions and finished ingestions mark the index stale
+  (`mark_stale`) so the next message resyncs immediately.
+
+With an embedding backend configured (`KNOWLEDGE_RETRIEVAL_MODE` semantic or
+hybrid), each agent also gets a dense vector index (vector_index) over the
+embeddings the ingestion worker stored with the chunks; only the query is
+embedded here. Hybrid mode merges the BM25 and vector rankings with
+reciprocal rank fusion, which needs no score calibration between the two.
+"""
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.db import SessionLocal
+from app.models.agent_document import AgentDocument
+from app.models.agent_document_chunk import AgentDocumentChunk
+from app.services import embeddings
+from app.services.knowledge_index import BM25Index
+from app.services.vector_index import VectorIndex, fingerprint
+from app.utils.cache import LRUCache
+from app.utils.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# ingestion_service.READY: documents whose chunks are written.
+READY = "ready"
+
+# Standard constant from the RRF paper; damps the weight of the very first ranks.
+_RRF_K = 60
+
+embedding_config = embeddings.config_from_settings(settings)
+
+
+def _semantic_enabled() -> bool:
+    return embedding_config is not None and settings.knowledge_retrieval_mode in ("semantic", "hybrid")
+
+
+class AgentKnowledge:
+    def __init__(self):
+        self.bm25 = BM25Index()
+        self.vectors: Optional[VectorIndex] = None
+        self.vectors_key: Optional[str] = None
+        self.lock = threading.Lock()
+        self.synced_at: Optional[float] = None
+
+    def memory_bytes(self) -> int:
+        return self.bm25.memory_bytes() + (self.vectors.memory_bytes() if self.vectors is not None else 0)
+
+
+_indexes: LRUCache[AgentKnowledge] = LRUCache(
+    maxsize=settings.knowledge_cache_size,
+    weigher=AgentKnowledge.memory_bytes,
+    max_weight=settings.knowledge_cache_max_bytes,
+)
+_query_vectors: LRUCache[np.ndarray] = LRUCache(maxsize=1000)
+
+
+def mark_stale(*agent_ids) -> None:
+    for agent_id in agent_ids:
+        knowledge = _indexes.get(str(agent_id))
+        if knowledge is not None:
+            knowledge.synced_at = None
+
+
+def _ready_hashes(db: Session, agent_id) -> set:
+    rows = (
+        db.query(AgentDocument.content_hash)
+        .filter(
+            AgentDocument.agent_id == agent_id,
+            AgentDocument.ingestion_status == READY,
+            AgentDocument.content_hash.isnot(None),
+        )
+        .distinct()
+        .all()
+    )
+    return {row.content_hash for row in rows}
+
+
+def _load_chunks(db: Session, content_hashes) -> Dict[str, List[str]]:
+    chunks: Dict[str, List[str]] = {content_hash: [] for content_hash in content_hashes}
+    rows = (
+        db.query(AgentDocumentChunk.content_hash, AgentDocumentChunk.text)
+        .filter(AgentDocumentChunk.content_hash.in_(list(content_hashes)))
+        .order_by(AgentDocumentChunk.content_hash, AgentDocumentChunk.chunk_index)
+    )
+    for row in rows.yield_per(1000):
+        chunks[row.content_hash].append(row.text)
+    return chunks
+
+
+def _embedded_chunks(db: Session, content_hashes, with_vectors: bool):
+    columns = [AgentDocumentChunk.text]
+    if with_vectors:
+        columns.append(AgentDocumentChunk.embedding)
+    return (
+        db.query(*columns)
+        .filter(
+            AgentDocumentChunk.content_hash.in_(list(content_hashes)),
+            AgentDocumentChunk.embedding_model == embedding_config.name,
+        )
+        .order_by(AgentDocumentChunk.content_hash, AgentDocumentChunk.chunk_index)
+        .all()
+    )
+
+
+def _sync_vectors(db: Session, agent_id, knowledge: AgentKnowledge, ready: set) -> bool:
+    """Point the agent at the vector file for its currently embedded chunks; True when that changed."""
+    counts = (
+        db.query(AgentDocumentChunk.content_hash, func.count())
+        .filter(
+            AgentDocumentChunk.content_hash.in_(list(ready)),
+            AgentDocumentChunk.embedding_model == embedding_config.name,
+        )
+        .group_by(AgentDocumentChunk.content_hash)
+        .all()
+    )
+    if not counts:
+        changed = knowledge.vectors is not None
+        knowledge.vectors = knowledge.vectors_key = None
+        return changed
+    key = fingerprint(embedding_config.name, [row[0] for row in counts], sum(row[1] for row in counts))
+    if key == knowledge.vectors_key:
+        return False
+
+    hashes = [row[0] for row in counts]
+    directory, threshold = settings.vector_index_path, settings.vector_ann_threshold
+    if VectorIndex.exists(directory, agent_id, key):
+        # Already written (by this worker before a restart, or by another one): texts are enough.
+        texts = [row.text for row in _embedded_chunks(db, hashes, with_vectors=False)]
+        try:
+            knowledge.vectors = VectorIndex.open_or_build(directory, agent_id, key, None, texts, threshold)
+            knowledge.vectors_key = key
+            return True
+        except FileNotFoundError:
+            pass  # Replaced by another worker in the meantime; write it again.
+    rows = _embedded_chunks(db, hashes, with_vectors=True)
+    matrix = np.frombuffer(b"".join(row.embedding for row in rows), dtype=np.float16).reshape(len(rows), -1)
+    texts = [row.text for row in rows]
+    knowledge.vectors = VectorIndex.open_or_build(directory, agent_id, key, matrix, texts, threshold)
+    knowledge.vectors_key = key
+    return True
+
+
+def _sync(db: Session, agent_id, knowledge: AgentKnowledge) -> bool:
+    """Bring the indexes in line with the agent's ready documents; True when they changed."""
+    ready = _ready_hashes(db, agent_id)
+    indexed = set(knowledge.bm25.content_hashes)
+    for content_hash in indexed - ready:
+        knowledge.bm25.remove(content_hash)
+    added = ready - indexed
+    if added:
+        for content_hash, chunks in _load_chunks(db, added).items():
+            knowledge.bm25.add(content_hash, chunks)
+    changed = bool(added) or indexed != ready
+    if _semantic_enabled():
+        changed = _sync_vectors(db, agent_id, knowledge, ready) or changed
+    knowledge.synced_at = time.monotonic()
+    return changed
+
+
+def get_knowledge(agent_id) -> AgentKnowledge:
+    key = str(agent_id)
+    knowledge = _indexes.get(key)
+    created = knowledge is None
+    if created:
+        knowledge = AgentKnowledge()
+    with knowledge.lock:
+        synced_at = knowledge.synced_at
+        if synced_at is None or time.monotonic() - synced_at > settings.knowledge_refresh_seconds:
+            db = SessionLocal()
+            try:
+                changed = _sync(db, agent_id, knowledge)
+            finally:
+                db.close()
+            if changed or created:
+                # Re-weighed against the cache's memory budget.
+                _indexes.set(key, knowledge)
+    return knowledge
+
+
+def _query_vector(query: str) -> np.ndarray:
+    vector = _query_vectors.get(query)
+    if vector is None:
+        vector = embeddings.embed_query(embedding_config, query)
+        _query_vectors.set(query, vector)
+    return vector
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = _RRF_K) -> List[str]:
+    """Merge rankings by summing 1 / (k + rank) per item across them."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def retrieve(agent_id, query: str, k: Optional[int] = None, max_tokens: Optional[int] = None) -> List[str]:
+    """
+    The most relevant passages of the agent's documents for `query`, best
+    first, as many of the top `k` as fit in `max_tokens`.
+    """
+    k = k or settings.knowledge_top_k
+    max_tokens = max_tokens or settings.knowledge_max_tokens
+    knowledge = get_knowledge(agent_id)
+    mode = settings.knowledge_retrieval_mode if _semantic_enabled() else "bm25"
+    vectors = knowledge.vectors
+    if vectors is None:
+        mode = "bm25"
+    # Fusion needs deeper lists than the final k.
+    depth = max(k * 4, 20) if mode == "hybrid" else k
+
+    rankings: List[List[str]] = []
+    if mode != "semantic":
+        with knowledge.lock:
+            rankings.append([text for _, text in knowledge.bm25.search(query, depth)])
+    if mode != "bm25":
+        # Vector indexes are immutable (a resync swaps in a new one), so no lock is needed.
+        matches = vectors.search(_query_vector(query), depth, probes=settings.vector_ann_probes)
+        rankings.append([text for score, text in matches if score >= settings.knowledge_min_similarity])
+    results = rankings[0] if len(rankings) == 1 else reciprocal_rank_fusion(rankings)
+
+    snippets: List[str] = []
+    used = 0
+    for text in results[:k]:
+        cost = count_tokens(text)
+        if used + cost > max_tokens:
+            continue
+        snippets.append(text)
+        used += cost
+    return snippets
@@ -0,0 +1,176 @@
+"""
+Write-behind persistence for chat messages.
+
+The AI reply is known before it is stored, so instead of making the client
+wait for its INSERT the webchat routes hand it to this writer and respond
+immediately. A background task drains a bounded in-process queue, writing
+whatever has accumulated as one multi-row INSERT per transaction, so bursts of
+replies become a few batched writes instead of hundreds of single-row commits.
+
+- When the queue is full, or the writer is not running (scripts, mode
+  `sync`), messages are written synchronously as before.
+- On shutdown the queue is drained before the worker exits.
+- Messages that are queued but not yet written are merged into history reads
+  in this worker (`merge_pending`), so a quick follow-up turn still sees them.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.config import get_settings
+from app.db import AsyncSessionLocal
+from app.models.message import Message
+from app.services import conversation_service
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+class MessageWriter:
+    def __init__(self, queue_size: int, batch_size: int):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # conversation id -> queued messages not yet committed
+        self._pending: Dict[str, List[Message]] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run(), name="message-writer")
+
+    async def stop(self, timeout: float) -> None:
+        """Flush everything queued (up to `timeout` seconds), then stop the drain task."""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error("Message writer shutdown timed out with %s messages unwritten", self._queue.qsize())
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def write(self, message: Message) -> None:
+        """Queue `message` for the next batch, or write it now if that is not possible."""
+        if self.running and asyncio.get_running_loop() is self._loop:
+            try:
+                self._queue.put_nowait(message)
+            except asyncio.QueueFull:
+                logger.warning("Message write queue is full; writing synchronously")
+            else:
+                self._pending.setdefault(str(message.conversation_id), []).append(message)
+                return
+        await _insert([message])
+
+    def pending(self, conversation_id) -> List[Message]:
+        """Queued messages for `conversation_id` not yet committed (a copy)."""
+        return list(self._pending.get(str(conversation_id), ()))
+
+    def merge_pending(self, conversation_id, history: List[Message]) -> List[Message]:
+        """Append queued messages for `conversation_id` that `history` (oldest first) does not have yet."""
+        return merge(history, self.pending(conversation_id))
+
+    def _forget(self, batch: List[Message]) -> None:
+        for message in batch:
+            key = str(message.conversation_id)
+            pending = self._pending.get(key)
+            if not pending:
+                continue
+            pending[:] = [item for item in pending if item is not message]
+            if not pending:
+                del self._pending[key]
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            # Whatever piled up while the previous batch was being written goes in this one.
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._write_batch(batch)
+            finally:
+                self._forget(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write_batch(self, batch: List[Message]) -> None:
+        try:
+            await _insert(batch)
+            return
+        except Exception:
+            logger.exception("Batched insert of %s messages failed; retrying one by one", len(batch))
+        for message in batch:
+            try:
+                await _insert([message])
+            except Exception:
+                logger.exception("Dropping message %s for conversation %s", message.id, message.conversation_id)
+
+
+def merge(history: List[Message], queued: List[Message]) -> List[Message]:
+    """`history` (oldest first) plus the `queued` messages it does not have yet, in order."""
+    if not queued:
+        return history
+    known = {message.id for message in history}
+    merged = history + [message for message in queued if message.id not in known]
+    merged.sort(key=lambda message: message.created_at)
+    return merged
+
+
+async def _insert(messages: List[Message]) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.run_sync(conversation_service.insert_messages, messages)
+
+
+_writer = MessageWriter(
+    queue_size=settings.message_write_queue_size,
+    batch_size=settings.message_write_batch_size,
+)
+
+
+def start() -> None:
+    if settings.message_write_mode == "write_behind":
+        _writer.start()
+
+
+async def stop() -> None:
+    await _writer.stop(settings.message_write_shutdown_timeout)
+
+
+async def write_message(conversation_id, sender: str, text: str, meta: Optional[str] = None) -> Message:
+    """
+    Persist a message with write-behind semantics and return it (ids and
+    timestamps are assigned client-side, exactly as `add_message` does).
+    """
+    message = Message(
+        id=uuid.uuid4(),
+        conversation_id=conversation_id,
+        sender=sender,
+        text=text,
+        meta=meta,
+        created_at=datetime.utcnow(),
+    )
+    await _writer.write(message)
+    return message
+
+
+def pending_messages(conversation_id) -> List[Message]:
+    return _writer.pending(conversation_id)
+
+
+def merge_pending(conversation_id, history: List[Message]) -> List[Message]:
+    return _writer.merge_pending(conversation_id, history)
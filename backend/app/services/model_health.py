@@ -0,0 +1,290 @@
+"""
+Per-model circuit breakers for Groq completions.
+
+Each model gets a rolling window of recent call outcomes and latencies. When
+the error rate (or the p95 latency) over the window crosses its threshold the
+breaker opens and `ai_service` sends traffic straight to the fallback model
+instead of waiting for the primary to fail first. After a cooldown the breaker
+goes half-open and lets a single probe through; a successful probe closes it
+again.
+
+Errors that mean the model will never work (unknown or decommissioned model
+IDs) open the breaker immediately with a much longer cooldown, so retired
+models are skipped without a hard-coded deny list yet recover on their own if
+the ID comes back. State is per worker process.
+
+Breakers also keep a bounded sample of time-to-first-token for streamed calls,
+which `ai_service` uses as the latency budget for hedged requests, and the
+hedge counters that tell us whether that budget is well tuned.
+"""
+import logging
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import groq
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Model IDs known to be retired at deploy time. They start with an open breaker
+# and are re-probed after the permanent cooldown like any other failed model.
+_SEED_RETIRED_MODELS = (
+    "llama-3.1-70b",
+    "llama3-70b-8192",
+)
+
+_PERMANENT_ERROR_MARKERS = ("model_not_found", "model_decommissioned", "does not exist", "decommissioned")
+
+
+def classify_failure(exc: BaseException) -> Optional[str]:
+    """
+    Decide how a failed call should count against the model's health.
+
+    Returns "permanent" for unknown/retired models, "transient" for timeouts,
+    connection errors, rate limits and 5xx responses, and None for errors that
+    say nothing about the model (e.g. a bad request we built).
+    """
+    if isinstance(exc, (groq.APITimeoutError, groq.APIConnectionError)):
+        return "transient"
+    if isinstance(exc, groq.APIStatusError):
+        message = str(exc).lower()
+        if exc.status_code == 404 or any(marker in message for marker in _PERMANENT_ERROR_MARKERS):
+            return "permanent"
+        if exc.status_code == 429 or exc.status_code >= 500:
+            return "transient"
+        return None
+    return "transient"
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(math.ceil(pct / 100.0 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+class CircuitBreaker:
+    def __init__(self, model: str, clock: Callable[[], float] = time.monotonic):
+        self.model = model
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (timestamp, ok, latency_seconds)
+        self._window: Deque[Tuple[float, bool, float]] = deque()
+        self.state = CLOSED
+        self.reason: Optional[str] = None
+        self.opened_at: Optional[float] = None
+        self.cooldown_seconds = 0.0
+        self.trips = 0
+        self._probe_started_at: Optional[float] = None
+        self._first_token_samples: Deque[float] = deque(maxlen=settings.hedge_sample_size)
+
+    def _prune(self, now: float) -> None:
+        horizon = now - settings.model_breaker_window_seconds
+        while self._window and self._window[0][0] < horizon:
+            self._window.popleft()
+
+    def _open(self, now: float, reason: str, cooldown: float) -> None:
+        if self.state != OPEN:
+            self.trips += 1
+            logger.warning("Circuit breaker for model %s opened: %s", self.model, reason)
+        self.state = OPEN
+        self.reason = reason
+        self.opened_at = now
+        self.cooldown_seconds = cooldown
+        self._probe_started_at = None
+
+    def allow_request(self) -> bool:
+        """True if a call may be sent to this model now (claims the probe slot when half-open)."""
+        with self._lock:
+            now = self._clock()
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if now - (self.opened_at or now) < self.cooldown_seconds:
+                    return False
+                self.state = HALF_OPEN
+                self._probe_started_at = None
+            # Half-open: one probe at a time; a probe that never reports back is
+            # considered lost after the read timeout.
+            if self._probe_started_at is None or now - self._probe_started_at > settings.groq_read_timeout:
+                self._probe_started_at = now
+                return True
+            return False
+
+    def record_first_token(self, latency: float) -> None:
+        """Time to first token of a streamed call (for hedging); its outcome is recorded when it ends."""
+        with self._lock:
+            self._first_token_samples.append(latency)
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            now = self._clock()
+            if self.state != CLOSED:
+                logger.info("Circuit breaker for model %s closed after a successful probe", self.model)
+                self._window.clear()
+                self.state = CLOSED
+                self.reason = None
+                self.opened_at = None
+                self._probe_started_at = None
+            self._window.append((now, True, latency))
+            self._evaluate(now)
+
+    def record_failure(self, latency: float, kind: str = "transient", detail: str = "") -> None:
+        with self._lock:
+            now = self._clock()
+            if kind == "permanent":
+                self._open(now, f"model unavailable: {detail}"[:200], settings.model_breaker_permanent_cooldown_seconds)
+                return
+            if self.state == HALF_OPEN:
+                self._open(now, f"probe failed: {detail}"[:200], settings.model_breaker_cooldown_seconds)
+                return
+            self._window.append((now, False, latency))
+            self._evaluate(now)
+
+    def first_token_percentile(self, pct: float) -> Optional[float]:
+        """Percentile of recent time-to-first-token, or None until enough samples exist."""
+        with self._lock:
+            samples = list(self._first_token_samples)
+        if len(samples) < settings.hedge_min_samples:
+            return None
+        return _percentile(samples, pct)
+
+    def release(self) -> None:
+        """Give back a half-open probe slot for a call that said nothing about the model's health."""
+        with self._lock:
+            self._probe_started_at = None
+
+    def _evaluate(self, now: float) -> None:
+        self._prune(now)
+        if self.state != CLOSED or len(self._window) < settings.model_breaker_min_requests:
+            return
+        failures = sum(1 for _, ok, _ in self._window if not ok)
+        error_rate = failures / len(self._window)
+        if error_rate >= settings.model_breaker_error_rate:
+            self._open(now, f"error rate {error_rate:.0%} over {len(self._window)} calls", settings.model_breaker_cooldown_seconds)
+            return
+        p95 = _percentile([latency for _, ok, latency in self._window if ok], 95)
+        if p95 is not None and p95 >= settings.model_breaker_latency_seconds:
+            self._open(now, f"p95 latency {p95:.1f}s", settings.model_breaker_cooldown_seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._window.clear()
+            self.state = CLOSED
+            self.reason = None
+            self.opened_at = None
+            self._probe_started_at = None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = self._clock()
+            self._prune(now)
+            latencies = [latency for _, ok, latency in self._window if ok]
+            failures = sum(1 for _, ok, _ in self._window if not ok)
+            retry_in = None
+            if self.state == OPEN and self.opened_at is not None:
+                retry_in = max(self.cooldown_seconds - (now - self.opened_at), 0.0)
+            return {
+                "model": self.model,
+                "state": self.state,
+                "reason": self.reason,
+                "window_requests": len(self._window),
+                "window_failures": failures,
+                "error_rate": failures / len(self._window) if self._window else 0.0,
+                "p50_latency_seconds": _percentile(latencies, 50),
+                "p95_latency_seconds": _percentile(latencies, 95),
+                "trips": self.trips,
+                "retry_in_seconds": retry_in,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    with _registry_lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = _breakers[model] = CircuitBreaker(model)
+        return breaker
+
+
+def breaker_states() -> List[dict]:
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return [breaker.snapshot() for breaker in breakers]
+
+
+def reset_breaker(model: str) -> bool:
+    with _registry_lock:
+        breaker = _breakers.get(model)
+    if breaker is None:
+        return False
+    breaker.reset()
+    return True
+
+
+@dataclass
+class HedgeStats:
+    """Counters for one agent's hedged requests."""
+
+    requests: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, hedged: bool, hedge_won: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.hedged += int(hedged)
+            self.hedge_wins += int(hedge_won)
+
+    def snapshot(self, agent_id: str) -> dict:
+        with self._lock:
+            return {
+                "agent_id": agent_id,
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+                "win_rate": self.hedge_wins / self.hedged if self.hedged else 0.0,
+            }
+
+
+_hedge_stats: Dict[str, HedgeStats] = {}
+
+
+def record_hedge(agent_id, hedged: bool, hedge_won: bool) -> None:
+    key = str(agent_id)
+    with _registry_lock:
+        stats = _hedge_stats.get(key)
+        if stats is None:
+            stats = _hedge_stats[key] = HedgeStats()
+    stats.record(hedged, hedge_won)
+
+
+def hedge_stats() -> List[dict]:
+    with _registry_lock:
+        items = list(_hedge_stats.items())
+    return [stats.snapshot(agent_id) for agent_id, stats in items]
+
+
+for _model in _SEED_RETIRED_MODELS:
+    _seeded = get_breaker(_model)
+    _seeded.state = OPEN
+    _seeded.reason = "model retired"
+    _seeded.opened_at = _seeded._clock()
+    _seeded.cooldown_seconds = settings.model_breaker_permanent_cooldown_seconds
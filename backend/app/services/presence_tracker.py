@@ -0,0 +1,108 @@
+"""
+In-memory customer presence ("last seen") with batched flushes.
+
+Touching `customers.last_seen_at` on every chat message is a row update and a
+WAL write per message on a hot row. Webchat records the touch here instead;
+touches within `PRESENCE_RESOLUTION_SECONDS` of the last recorded one are
+coalesced, and a background task writes the latest values for all touched
+customers in a single UPDATE every `PRESENCE_FLUSH_INTERVAL_SECONDS`.
+
+Readers (super-admin chat user views) use `last_seen` to prefer the tracker's
+value when it is fresher than the stored one. Each worker tracks the customers
+it served.
+"""
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from app.config import get_settings
+from app.db import AsyncSessionLocal
+from app.services import customer_service
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+_lock = threading.Lock()
+# Latest recorded touch per customer (flushed or not), used for coalescing and reads.
+_recorded: LRUCache[datetime] = LRUCache(maxsize=settings.presence_cache_size)
+# Touches not yet written to the database.
+_dirty: Dict[object, datetime] = {}
+_task: Optional[asyncio.Task] = None
+
+
+def running() -> bool:
+    return _task is not None and not _task.done()
+
+
+def touch(customer_id, seen_at: Optional[datetime] = None) -> bool:
+    """
+    Record that a customer was seen. Returns False when the tracker is not
+    running, in which case the caller should write `last_seen_at` itself.
+    """
+    if not running():
+        return False
+    seen_at = seen_at or datetime.utcnow()
+    resolution = timedelta(seconds=settings.presence_resolution_seconds)
+    with _lock:
+        previous = _recorded.get(customer_id)
+        if previous is not None and seen_at - previous < resolution:
+            return True
+        _recorded.set(customer_id, seen_at)
+        _dirty[customer_id] = seen_at
+    return True
+
+
+def last_seen(customer_id, stored: Optional[datetime]) -> Optional[datetime]:
+    """The freshest known last-seen time: the tracker's value or the stored column."""
+    tracked = _recorded.get(customer_id)
+    if tracked is None:
+        return stored
+    if stored is None:
+        return tracked
+    return max(tracked, stored)
+
+
+async def flush() -> None:
+    with _lock:
+        batch = dict(_dirty)
+        _dirty.clear()
+    if not batch:
+        return
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.run_sync(customer_service.touch_last_seen, batch)
+    except Exception:
+        logger.exception("Failed to flush last_seen_at for %s customers; will retry", len(batch))
+        with _lock:
+            for customer_id, seen_at in batch.items():
+                if _dirty.get(customer_id, seen_at) <= seen_at:
+                    _dirty[customer_id] = seen_at
+
+
+async def _run() -> None:
+    while True:
+        await asyncio.sleep(settings.presence_flush_interval_seconds)
+        await flush()
+
+
+def start() -> None:
+    global _task
+    if not running():
+        _task = asyncio.create_task(_run(), name="presence-tracker")
+
+
+async def stop() -> None:
+    """Stop the periodic flush and write out whatever is still pending."""
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    await flush()
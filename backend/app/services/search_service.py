@@ -0,0 +1,66 @@
+"""
+Trigram-indexed search over tenants, platform users and chat users.
+
+Each searchable table has one lowercased "search document" expression (its
+searchable columns joined with spaces) with a `pg_trgm` GIN index on exactly
+that expression (migration 0020), so `document LIKE '%term%'` is answered
+from the index instead of scanning the table. At most
+`SEARCH_MAX_CANDIDATES` matches are read per query and only those are ranked
+by `word_similarity`, which keeps a search bounded however common the term.
+Keep `_DOCUMENT_COLUMNS` in sync with the index definitions.
+"""
+from typing import Optional
+
+from sqlalchemy import String, false, func, literal_column, select
+from sqlalchemy.sql import ColumnElement, Subquery
+
+from app.config import get_settings
+from app.models.customer import Customer
+from app.models.tenant import Tenant
+from app.models.user import User
+
+settings = get_settings()
+
+_DOCUMENT_COLUMNS = {
+    Tenant: (Tenant.name, Tenant.slug),
+    User: (User.email, User.name),
+    Customer: (Customer.email, Customer.first_name, Customer.last_name, Customer.primary_phone),
+}
+
+
+def document(model) -> ColumnElement:
+    """The indexed search expression of `model` (constants inlined so it matches the index)."""
+    parts = [func.coalesce(column, literal_column("''"), type_=String) for column in _DOCUMENT_COLUMNS[model]]
+    expression = parts[0]
+    for part in parts[1:]:
+        expression = expression + literal_column("' '") + part
+    return func.lower(expression, type_=String)
+
+
+def normalize(term: Optional[str]) -> str:
+    return (term or "").strip().lower()
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def ranked_matches(model, term: str, *criteria) -> Subquery:
+    """
+    Subquery of (id, rank) for up to `SEARCH_MAX_CANDIDATES` rows of `model`
+    matching `term` and `criteria`; higher rank is a better match. Terms
+    shorter than `SEARCH_MIN_TERM_LENGTH` match nothing.
+    """
+    term = normalize(term)
+    doc = document(model)
+    candidates = select(model.id.label("id"), doc.label("document")).where(*criteria)
+    if len(term) < settings.search_min_term_length:
+        candidates = candidates.where(false())
+    else:
+        candidates = candidates.where(doc.like(_like_pattern(term), escape="\\"))
+    candidates = candidates.limit(settings.search_max_candidates).subquery("candidates")
+    return select(
+        candidates.c.id,
+        func.word_similarity(term, candidates.c.document).label("rank"),
+    ).subquery(f"{model.__tablename__}_matches")
@@ -0,0 +1,315 @@
+"""
+Daily per-tenant rollup (`tenant_daily_stats`) behind the tenant dashboard.
+
+Rows are keyed by (tenant, day, channel, agent) and hold conversation, message
+and new-customer counts. Writers call `record` with deltas; they are summed on
+the session and written as one multi-row upsert just before the transaction
+commits (and dropped on rollback), so counting adds a single statement to each
+write transaction. Batched AI replies are counted by
+`record_messages_by_conversation`. `rebuild` recomputes any range from the base
+tables (see scripts/backfill_daily_stats.py).
+
+The same writes keep all-time totals per (tenant, channel) in
+`tenant_stat_totals`, so all-time figures are a few rows rather than a sum over
+the tenant's whole history, and dashboard reads of the daily rows stay bounded
+to the window shown.
+"""
+import uuid
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import BigInteger, Date, column, event, func, literal, literal_column, select, text, values
+from sqlalchemy.dialects.postgresql import UUID, insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.conversation import Conversation
+from app.models.daily_stat import TenantDailyStat, TenantStatTotal
+
+# Stand-in agent id for conversations without an agent (part of the primary key).
+NO_AGENT = uuid.UUID(int=0)
+# Channel recorded for customers created through email verification rather than a chat channel.
+EMAIL_CHANNEL = "email"
+
+_PENDING_KEY = "tenant_daily_stats"
+_COUNTERS = ("conversations", "messages", "new_customers")
+# Kept in the all-time totals only: chat channel identities (what "connected channels" counts).
+_TOTAL_COUNTERS = _COUNTERS + ("channel_identities",)
+
+
+def record(
+    db: Session,
+    tenant_id,
+    channel: str,
+    agent_id=None,
+    conversations: int = 0,
+    messages: int = 0,
+    new_customers: int = 0,
+    channel_identities: int = 0,
+    at: Optional[datetime] = None,
+) -> None:
+    """Add deltas to the rollup (identities only to the totals); they are written when `db` commits."""
+    key = (tenant_id, (at or datetime.utcnow()).date(), channel or "unknown", agent_id or NO_AGENT)
+    pending: Dict[tuple, List[int]] = db.info.setdefault(_PENDING_KEY, {})
+    totals = pending.setdefault(key, [0, 0, 0, 0])
+    totals[0] += conversations
+    totals[1] += messages
+    totals[2] += new_customers
+    totals[3] += channel_identities
+
+
+def _upsert(stmt):
+    return stmt.on_conflict_do_update(
+        index_elements=[
+            TenantDailyStat.tenant_id,
+            TenantDailyStat.day,
+            TenantDailyStat.channel,
+            TenantDailyStat.agent_id,
+        ],
+        set_={name: getattr(TenantDailyStat, name) + getattr(stmt.excluded, name) for name in _COUNTERS},
+    )
+
+
+def _upsert_totals(stmt):
+    return stmt.on_conflict_do_update(
+        index_elements=[TenantStatTotal.tenant_id, TenantStatTotal.channel],
+        set_={name: getattr(TenantStatTotal, name) + getattr(stmt.excluded, name) for name in _TOTAL_COUNTERS},
+    )
+
+
+@event.listens_for(Session, "before_commit")
+def _write_pending(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    # Sorted so concurrent transactions lock rollup rows in the same order.
+    rows = [
+        {
+            "tenant_id": tenant_id,
+            "day": day,
+            "channel": channel,
+            "agent_id": agent_id,
+            "conversations": totals[0],
+            "messages": totals[1],
+            "new_customers": totals[2],
+        }
+        for (tenant_id, day, channel, agent_id), totals in sorted(pending.items(), key=lambda item: str(item[0]))
+        if any(totals[:3])
+    ]
+    if rows:
+        session.execute(_upsert(pg_insert(TenantDailyStat).values(rows)))
+
+    totals: Dict[tuple, List[int]] = {}
+    for (tenant_id, _day, channel, _agent_id), counts in pending.items():
+        summed = totals.setdefault((tenant_id, channel), [0, 0, 0, 0])
+        for index, count in enumerate(counts):
+            summed[index] += count
+    session.execute(
+        _upsert_totals(
+            pg_insert(TenantStatTotal).values(
+                [
+                    {"tenant_id": tenant_id, "channel": channel, **dict(zip(_TOTAL_COUNTERS, counts))}
+                    for (tenant_id, channel), counts in sorted(totals.items(), key=lambda item: str(item[0]))
+                ]
+            )
+        )
+    )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def record_messages_by_conversation(db: Session, counts: Dict[Tuple[object, date], int]) -> None:
+    """
+    Count messages written in a batch, given {(conversation_id, day): n}; each
+    conversation's tenant, channel and agent are resolved in the same statement.
+    """
+    if not counts:
+        return
+    batch = values(
+        column("conversation_id", UUID(as_uuid=True)),
+        column("day", Date),
+        column("amount", BigInteger),
+        name="batch",
+    ).data([(conversation_id, day, amount) for (conversation_id, day), amount in counts.items()])
+    # Unbound literals, so the grouped expressions match the selected ones under positional paramstyles.
+    channel = func.coalesce(Conversation.channel, literal_column("'unknown'"))
+    agent_id = func.coalesce(Conversation.agent_id, literal_column(f"'{NO_AGENT}'::uuid"))
+    per_key = (
+        select(
+            Conversation.tenant_id,
+            batch.c.day,
+            channel,
+            agent_id,
+            literal(0, BigInteger),
+            func.sum(batch.c.amount),
+            literal(0, BigInteger),
+        )
+        .join(batch, batch.c.conversation_id == Conversation.id)
+        .group_by(Conversation.tenant_id, batch.c.day, channel, agent_id)
+    )
+    db.execute(
+        _upsert(
+            pg_insert(TenantDailyStat).from_select(
+                ["tenant_id", "day", "channel", "agent_id", *_COUNTERS], per_key
+            )
+        )
+    )
+    per_channel = (
+        select(
+            Conversation.tenant_id,
+            channel,
+            literal(0, BigInteger),
+            func.sum(batch.c.amount),
+            literal(0, BigInteger),
+            literal(0, BigInteger),
+        )
+        .join(batch, batch.c.conversation_id == Conversation.id)
+        .group_by(Conversation.tenant_id, channel)
+    )
+    db.execute(
+        _upsert_totals(
+            pg_insert(TenantStatTotal).from_select(["tenant_id", "channel", *_TOTAL_COUNTERS], per_channel)
+        )
+    )
+
+
+def get_daily_totals(db: Session, tenant_id, since: date) -> List[tuple]:
+    """Per (day, channel) totals for a tenant from `since` on, from one index range scan of the rollup."""
+    return (
+        db.query(
+            TenantDailyStat.day,
+            TenantDailyStat.channel,
+            func.sum(TenantDailyStat.conversations),
+            func.sum(TenantDailyStat.messages),
+            func.sum(TenantDailyStat.new_customers),
+        )
+        .filter(TenantDailyStat.tenant_id == tenant_id, TenantDailyStat.day >= since)
+        .group_by(TenantDailyStat.day, TenantDailyStat.channel)
+        .order_by(TenantDailyStat.day)
+        .all()
+    )
+
+
+def get_channel_totals(db: Session, tenant_id) -> Dict[str, Dict[str, int]]:
+    """All-time counters of a tenant per channel."""
+    rows = (
+        db.query(TenantStatTotal.channel, *(getattr(TenantStatTotal, name) for name in _TOTAL_COUNTERS))
+        .filter(TenantStatTotal.tenant_id == tenant_id)
+        .all()
+    )
+    return {row[0]: dict(zip(_TOTAL_COUNTERS, (int(value) for value in row[1:]))) for row in rows}
+
+
+def get_totals(db: Session, tenant_id) -> Dict[str, int]:
+    """All-time totals of a tenant's counters, e.g. approximate list sizes without a COUNT over the base tables."""
+    totals = dict.fromkeys(_TOTAL_COUNTERS, 0)
+    for counts in get_channel_totals(db, tenant_id).values():
+        for name in _TOTAL_COUNTERS:
+            totals[name] += counts[name]
+    return totals
+
+
+_REBUILD_FILTER = """
+    (CAST(:tenant_id AS uuid) IS NULL OR {tenant} = CAST(:tenant_id AS uuid))
+    AND (CAST(:start AS date) IS NULL OR {at}::date >= CAST(:start AS date))
+    AND (CAST(:end AS date) IS NULL OR {at}::date <= CAST(:end AS date))
+"""
+
+
+def rebuild(db: Session, tenant_id=None, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """
+    Recompute the rollup from conversations, messages and customers for one
+    tenant (or all) and an inclusive day range (or all time), replacing the
+    existing rows in that range, then the tenant's (or all) all-time totals
+    and channel identity counts.
+    Returns the number of rollup rows written.
+    """
+    params = {
+        "tenant_id": str(tenant_id) if tenant_id else None,
+        "start": start,
+        "end": end,
+        "no_agent": str(NO_AGENT),
+        "email_channel": EMAIL_CHANNEL,
+    }
+    db.execute(
+        text(
+            "DELETE FROM tenant_daily_stats WHERE "
+            + _REBUILD_FILTER.format(tenant="tenant_id", at="day")
+        ),
+        params,
+    )
+    result = db.execute(
+        text(
+            f"""
+            INSERT INTO tenant_daily_stats (tenant_id, day, channel, agent_id, conversations, messages, new_customers)
+            SELECT tenant_id, day, channel, agent_id, SUM(conversations), SUM(messages), SUM(new_customers)
+            FROM (
+                SELECT c.tenant_id, c.started_at::date AS day, COALESCE(c.channel, 'unknown') AS channel,
+                       COALESCE(c.agent_id, CAST(:no_agent AS uuid)) AS agent_id,
+                       COUNT(*) AS conversations, 0 AS messages, 0 AS new_customers
+                FROM conversations c
+                WHERE {_REBUILD_FILTER.format(tenant="c.tenant_id", at="c.started_at")}
+                GROUP BY 1, 2, 3, 4
+                UNION ALL
+                SELECT c.tenant_id, m.created_at::date, COALESCE(c.channel, 'unknown'),
+                       COALESCE(c.agent_id, CAST(:no_agent AS uuid)),
+                       0, COUNT(*), 0
+                FROM messages m
+                JOIN conversations c ON c.id = m.conversation_id
+                WHERE {_REBUILD_FILTER.format(tenant="c.tenant_id", at="m.created_at")}
+                GROUP BY 1, 2, 3, 4
+                UNION ALL
+                SELECT cu.tenant_id, cu.created_at::date,
+                       COALESCE(
+                           (SELECT ci.channel FROM channel_identities ci
+                            WHERE ci.customer_id = cu.id ORDER BY ci.created_at LIMIT 1),
+                           :email_channel
+                       ),
+                       CAST(:no_agent AS uuid),
+                       0, 0, COUNT(*)
+                FROM customers cu
+                WHERE {_REBUILD_FILTER.format(tenant="cu.tenant_id", at="cu.created_at")}
+                GROUP BY 1, 2, 3, 4
+            ) parts
+            GROUP BY tenant_id, day, channel, agent_id
+            """
+        ),
+        params,
+    )
+    # All-time totals follow from the rollup; recomputed for every tenant the rebuild touched.
+    db.execute(
+        text(
+            "DELETE FROM tenant_stat_totals WHERE "
+            "CAST(:tenant_id AS uuid) IS NULL OR tenant_id = CAST(:tenant_id AS uuid)"
+        ),
+        params,
+    )
+    db.execute(
+        text(
+            """
+            INSERT INTO tenant_stat_totals (tenant_id, channel, conversations, messages, new_customers)
+            SELECT tenant_id, channel, SUM(conversations), SUM(messages), SUM(new_customers)
+            FROM tenant_daily_stats
+            WHERE CAST(:tenant_id AS uuid) IS NULL OR tenant_id = CAST(:tenant_id AS uuid)
+            GROUP BY tenant_id, channel
+            """
+        ),
+        params,
+    )
+    db.execute(
+        text(
+            """
+            INSERT INTO tenant_stat_totals (tenant_id, channel, channel_identities)
+            SELECT tenant_id, channel, COUNT(*)
+            FROM channel_identities
+            WHERE CAST(:tenant_id AS uuid) IS NULL OR tenant_id = CAST(:tenant_id AS uuid)
+            GROUP BY tenant_id, channel
+            ON CONFLICT (tenant_id, channel) DO UPDATE SET channel_identities = excluded.channel_identities
+            """
+        ),
+        params,
+    )
+    db.commit()
+    return result.rowcount
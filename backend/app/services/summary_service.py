@@ -0,0 +1,76 @@
+"""
+Rolling conversation summaries.
+
+Instead of resending a whole transcript every turn, each conversation keeps a
+summary of everything up to `summary_through_at`, and only messages after that
+point are sent verbatim (see `conversation_service.get_conversation_context`).
+Once `SUMMARY_EVERY_MESSAGES` messages have piled up past the summary, a
+background task folds all but the newest few of them into it, so prompts stay
+roughly constant in size however long the chat runs.
+
+AI replies may still be queued in the write-behind `message_writer` when a
+refresh starts. They are merged into the messages considered, so the cutoff
+never moves past a reply that is later written with an earlier timestamp.
+"""
+import logging
+from typing import Set
+
+from app.config import get_settings
+from app.db import AsyncSessionLocal
+from app.services import ai_service, conversation_service, message_writer
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Conversations with a refresh running in this worker; stores are also guarded
+# by a conditional update against concurrent refreshes in other workers.
+_inflight: Set[str] = set()
+
+
+def should_refresh(unsummarized_messages: int) -> bool:
+    return settings.summary_every_messages > 0 and unsummarized_messages >= settings.summary_every_messages
+
+
+async def refresh_summary(conversation_id) -> None:
+    """Fold the older unsummarized messages of a conversation into its summary."""
+    key = str(conversation_id)
+    if key in _inflight:
+        return
+    _inflight.add(key)
+    try:
+        # Taken before the read: a queued message is either still here or already committed.
+        queued = message_writer.pending_messages(conversation_id)
+        async with AsyncSessionLocal() as db:
+            summary, through_at, pending = await db.run_sync(
+                conversation_service.get_unsummarized_messages, conversation_id
+            )
+        if through_at is not None:
+            queued = [message for message in queued if message.created_at > through_at]
+        pending = message_writer.merge(pending, queued)
+        if not should_refresh(len(pending)):
+            return
+
+        keep = max(settings.summary_keep_recent_messages, 0)
+        fold = pending[:-keep] if keep else pending
+        if not fold:
+            return
+
+        new_summary = await ai_service.summarize_turns(summary, fold)
+        if not new_summary:
+            return
+
+        async with AsyncSessionLocal() as db:
+            stored = await db.run_sync(
+                conversation_service.store_summary,
+                conversation_id,
+                new_summary,
+                fold[-1].created_at,
+                through_at,
+            )
+        if not stored:
+            logger.info("Summary for conversation %s was advanced concurrently; discarding", key)
+    except Exception:
+        logger.exception("Failed to refresh summary for conversation %s", key)
+    finally:
+        _inflight.discard(key)
@@ -0,0 +1,232 @@
+"""
+Plain-text extraction and chunking for uploaded knowledge documents.
+
+Runs inside the ingestion process pool (see ingestion_service), so this module
+imports nothing from the app: no settings, no database. Supported formats are
+PDF (via `pypdf`), DOCX (read straight from the Office Open XML zip), HTML,
+Markdown and plain text.
+"""
+import io
+import os
+import re
+import unicodedata
+import zipfile
+from html.parser import HTMLParser
+from typing import List, Optional
+from xml.etree import ElementTree
+
+PDF = "pdf"
+DOCX = "docx"
+HTML = "html"
+MARKDOWN = "markdown"
+TEXT = "text"
+
+_EXTENSIONS = {
+    ".pdf": PDF,
+    ".docx": DOCX,
+    ".html": HTML,
+    ".htm": HTML,
+    ".md": MARKDOWN,
+    ".markdown": MARKDOWN,
+    ".txt": TEXT,
+    ".text": TEXT,
+    ".csv": TEXT,
+}
+
+_CONTENT_TYPES = {
+    "application/pdf": PDF,
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": DOCX,
+    "text/html": HTML,
+    "application/xhtml+xml": HTML,
+    "text/markdown": MARKDOWN,
+    "text/x-markdown": MARKDOWN,
+}
+
+
+class UnsupportedDocument(ValueError):
+    pass
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """The document format, by extension first (browsers often send octet-stream), then content type."""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in _EXTENSIONS:
+        return _EXTENSIONS[extension]
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in _CONTENT_TYPES:
+        return _CONTENT_TYPES[media_type]
+    if media_type.startswith("text/"):
+        return TEXT
+    return None
+
+
+def _decode(data: bytes) -> str:
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("cp1252", errors="replace")
+
+
+def _pdf_text(data: bytes) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError as exc:
+        raise UnsupportedDocument("PDF extraction requires the pypdf package") from exc
+    reader = PdfReader(io.BytesIO(data))
+    text = "\n\n".join(page.extract_text() or "" for page in reader.pages)
+    # Words hyphenated across line breaks.
+    return re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def _docx_text(data: bytes) -> str:
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            root = ElementTree.fromstring(archive.read("word/document.xml"))
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as exc:
+        raise UnsupportedDocument("Not a valid DOCX file") from exc
+    paragraphs = []
+    for paragraph in root.iter(f"{_W}p"):
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == f"{_W}t" and node.text:
+                parts.append(node.text)
+            elif node.tag == f"{_W}tab":
+                parts.append("\t")
+            elif node.tag in (f"{_W}br", f"{_W}cr"):
+                parts.append("\n")
+        paragraphs.append("".join(parts))
+    return "\n\n".join(paragraphs)
+
+
+class _HTMLText(HTMLParser):
+    _SKIP = {"script", "style", "noscript", "template", "svg"}
+    _BLOCK = {
+        "p", "div", "br", "li", "ul", "ol", "tr", "table", "section", "article", "header", "footer",
+        "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "hr", "title", "dt", "dd",
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skipping += 1
+        elif tag in self._BLOCK:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP:
+            self._skipping = max(self._skipping - 1, 0)
+        elif tag in self._BLOCK:
+            self.parts.append("\n\n")
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+
+def _html_text(data: bytes) -> str:
+    parser = _HTMLText()
+    parser.feed(_decode(data))
+    parser.close()
+    return "".join(parser.parts)
+
+
+_MARKDOWN_RULES = [
+    (re.compile(r"^\s*(```|~~~).*$", re.MULTILINE), ""),  # code fences (the code itself is kept)
+    (re.compile(r"!\[([^\]]*)\]\([^)]*\)"), r"\1"),  # images -> alt text
+    (re.compile(r"\[([^\]]+)\]\([^)]*\)"), r"\1"),  # links -> link text
+    (re.compile(r"<[^>\n]+>"), ""),  # inline HTML
+    (re.compile(r"^\s{0,3}#{1,6}\s*", re.MULTILINE), ""),  # headings
+    (re.compile(r"^\s{0,3}>\s?", re.MULTILINE), ""),  # blockquotes
+    (re.compile(r"^\s*([-*+]|\d+[.)])\s+", re.MULTILINE), ""),  # list markers
+    (re.compile(r"^\s*([-*_]\s*){3,}$", re.MULTILINE), ""),  # horizontal rules
+    (re.compile(r"(\*\*|__|\*|_|~~|`)(?=\S)(.+?)(?<=\S)\1"), r"\2"),  # emphasis, inline code
+]
+
+
+def _markdown_text(data: bytes) -> str:
+    text = _decode(data)
+    for pattern, replacement in _MARKDOWN_RULES:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+_EXTRACTORS = {
+    PDF: _pdf_text,
+    DOCX: _docx_text,
+    HTML: _html_text,
+    MARKDOWN: _markdown_text,
+    TEXT: _decode,
+}
+
+
+def extract_text(data: bytes, filename: Optional[str], content_type: Optional[str]) -> str:
+    document_format = detect_format(filename, content_type)
+    if document_format is None:
+        raise UnsupportedDocument(f"Unsupported document type: {filename} ({content_type})")
+    return _EXTRACTORS[document_format](data)
+
+
+def normalize_text(text: str) -> str:
+    """NFKC, no control characters, single spaces, and at most one blank line between paragraphs."""
+    text = unicodedata.normalize("NFKC", text).replace("\r\n", "\n").replace("\r", "\n")
+    text = "".join(ch for ch in text if ch in "\n\t" or unicodedata.category(ch)[0] != "C")
+    text = re.sub(r"[ \t ]+", " ", text)
+    text = "\n".join(line.strip() for line in text.split("\n"))
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+# Sentence ends (including CJK punctuation) and paragraph breaks.
+_UNIT_BOUNDARY = re.compile(r"(?<=[.!?。！？])\s+|\n{2,}")
+
+
+def _units(text: str, size: int):
+    """Sentences and paragraphs, with anything longer than `size` split at word boundaries."""
+    for piece in _UNIT_BOUNDARY.split(text):
+        piece = " ".join(piece.split())
+        while len(piece) > size:
+            cut = piece.rfind(" ", 0, size + 1)
+            if cut <= 0:
+                cut = size
+            yield piece[:cut].rstrip()
+            piece = piece[cut:].lstrip()
+        if piece:
+            yield piece
+
+
+def chunk_text(text: str, size: int, overlap: int) -> List[str]:
+    """
+    Pack whole sentences into passages of at most `size` characters. Each
+    passage starts with the trailing sentences (up to `overlap` characters) of
+    the previous one, so an answer straddling a boundary is whole in one of them.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    for unit in _units(text, size):
+        if current and len(" ".join(current + [unit])) > size:
+            chunks.append(" ".join(current))
+            carried: List[str] = []
+            for previous in reversed(current):
+                if len(" ".join([previous] + carried)) > overlap:
+                    break
+                carried.insert(0, previous)
+            current = carried
+            while current and len(" ".join(current + [unit])) > size:
+                current.pop(0)
+        current.append(unit)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def extract_chunks(
+    data: bytes, filename: Optional[str], content_type: Optional[str], size: int, overlap: int
+) -> List[str]:
+    """Process-pool entry point: raw bytes in, normalized overlapping passages out."""
+    return chunk_text(normalize_text(extract_text(data, filename, content_type)), size, overlap)
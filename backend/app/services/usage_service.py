@@ -0,0 +1,154 @@
+"""
+Per-tenant monthly usage counters.
+
+Conversations and messages are counted as they are written (see the webchat
+write path and `conversation_service.insert_messages`) into
+`tenant_usage_counters`, one row per (tenant, month, metric). Plan-limit checks
+and the dashboard read these rows instead of scanning the conversation and
+message tables; a short-TTL in-process cache in front of them makes the
+per-message limit check free in the common case. Counts cached by one worker
+can trail increments made by others by up to `USAGE_CACHE_TTL_SECONDS`.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import BigInteger, Date, DateTime, String, column, func, literal, select, values
+from sqlalchemy.dialects.postgresql import UUID, insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models.conversation import Conversation
+from app.models.usage_counter import TenantUsageCounter
+from app.services.plan_limits import get_plan_limits
+from app.utils.cache import LRUCache
+
+settings = get_settings()
+
+METRIC_CONVERSATIONS = "conversations"
+METRIC_MESSAGES = "messages"
+
+# (tenant_id, month, metric) -> value
+_cache: LRUCache[int] = LRUCache(maxsize=settings.usage_cache_size, ttl_seconds=settings.usage_cache_ttl_seconds)
+
+
+def month_start(at: Optional[datetime] = None) -> date:
+    return (at or datetime.utcnow()).date().replace(day=1)
+
+
+def _upsert(rows):
+    stmt = pg_insert(TenantUsageCounter).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[TenantUsageCounter.tenant_id, TenantUsageCounter.month, TenantUsageCounter.metric],
+        set_={
+            "value": TenantUsageCounter.value + stmt.excluded.value,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+
+
+def increment(db: Session, tenant_id, amounts: Dict[str, int], at: Optional[datetime] = None) -> None:
+    """
+    Add `amounts` ({metric: delta}) to the tenant's counters for the month of
+    `at`, in one statement inside the caller's transaction.
+    """
+    amounts = {metric: amount for metric, amount in amounts.items() if amount}
+    if not amounts:
+        return
+    now = datetime.utcnow()
+    month = month_start(at)
+    stmt = _upsert(
+        [
+            {"tenant_id": tenant_id, "month": month, "metric": metric, "value": amount, "updated_at": now}
+            for metric, amount in amounts.items()
+        ]
+    ).returning(TenantUsageCounter.metric, TenantUsageCounter.value)
+    for metric, value in db.execute(stmt):
+        _cache.set((str(tenant_id), month, metric), value)
+
+
+def increment_messages_by_conversation(db: Session, counts: Dict[Tuple[object, date], int]) -> None:
+    """
+    Count messages written in a batch, given {(conversation_id, month): n}.
+    Conversations are resolved to tenants in the same statement.
+    """
+    if not counts:
+        return
+    batch = values(
+        column("conversation_id", UUID(as_uuid=True)),
+        column("month", Date),
+        column("amount", BigInteger),
+        name="batch",
+    ).data([(conversation_id, month, amount) for (conversation_id, month), amount in counts.items()])
+    per_tenant = (
+        select(
+            Conversation.tenant_id,
+            batch.c.month,
+            literal(METRIC_MESSAGES, String),
+            func.sum(batch.c.amount),
+            literal(datetime.utcnow(), DateTime),
+        )
+        .join(batch, batch.c.conversation_id == Conversation.id)
+        .group_by(Conversation.tenant_id, batch.c.month)
+    )
+    stmt = pg_insert(TenantUsageCounter).from_select(
+        ["tenant_id", "month", "metric", "value", "updated_at"], per_tenant
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[TenantUsageCounter.tenant_id, TenantUsageCounter.month, TenantUsageCounter.metric],
+            set_={
+                "value": TenantUsageCounter.value + stmt.excluded.value,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+    )
+
+
+def get_usage(db: Session, tenant_id, month: Optional[date] = None) -> Dict[str, int]:
+    """All counters of a tenant for one month (default: the current one), read from the table."""
+    month = month or month_start()
+    rows = (
+        db.query(TenantUsageCounter.metric, TenantUsageCounter.value)
+        .filter(TenantUsageCounter.tenant_id == tenant_id, TenantUsageCounter.month == month)
+        .all()
+    )
+    usage = defaultdict(int)
+    for metric, value in rows:
+        usage[metric] = value
+        _cache.set((str(tenant_id), month, metric), value)
+    return usage
+
+
+def current_value(db: Session, tenant_id, metric: str) -> int:
+    month = month_start()
+    key = (str(tenant_id), month, metric)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+    value = (
+        db.query(TenantUsageCounter.value)
+        .filter(
+            TenantUsageCounter.tenant_id == tenant_id,
+            TenantUsageCounter.month == month,
+            TenantUsageCounter.metric == metric,
+        )
+        .scalar()
+        or 0
+    )
+    _cache.set(key, value)
+    return value
+
+
+def conversation_limit_reached(db: Session, tenant) -> bool:
+    """True when the tenant has used up its plan's monthly conversations (special tenants are exempt)."""
+    if tenant.is_special_permissioned:
+        return False
+    limit = get_plan_limits(tenant.plan_type)["monthly_conversations_limit"]
+    return current_value(db, tenant.id, METRIC_CONVERSATIONS) >= limit
+
+
+def forget(tenant_id) -> None:
+    """Drop cached counters for a tenant, e.g. after a rolled-back increment."""
+    tenant_key = str(tenant_id)
+    _cache.pop_where(lambda key, _: key[0] == tenant_key)
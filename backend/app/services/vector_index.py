@@ -0,0 +1,182 @@
+"""
+Dense vector index over an agent's chunk embeddings (see knowledge_service).
+
+The vectors live in a float16 `.npy` file per agent under `VECTOR_INDEX_PATH`,
+opened as a read-only memory map: the matrix is paged in by the OS and shared
+by every worker on the host instead of being copied into each one. Files are
+named by a fingerprint of their contents, so a worker that finds the file
+already built (by itself before a restart, or by another worker) just maps it.
+
+Up to `VECTOR_ANN_THRESHOLD` vectors, a query is scored against all of them
+(a blocked float32 matrix-vector product). Above it, rows are grouped by a
+spherical k-means coarse quantizer (IVF) into about sqrt(n) lists stored
+contiguously, and only the `VECTOR_ANN_PROBES` lists nearest the query are
+scored.
+"""
+import glob
+import hashlib
+import os
+import tempfile
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_BLOCK_ROWS = 4096
+_KMEANS_SAMPLE = 50000
+_KMEANS_ITERATIONS = 10
+
+
+def fingerprint(model_name: str, content_hashes: Iterable[str], rows: int) -> str:
+    digest = hashlib.sha1(model_name.encode())
+    for content_hash in sorted(content_hashes):
+        digest.update(content_hash.encode())
+    digest.update(str(rows).encode())
+    return digest.hexdigest()[:16]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.concatenate(
+        [
+            np.argmax(vectors[start : start + _BLOCK_ROWS].astype(np.float32) @ centroids.T, axis=1)
+            for start in range(0, len(vectors), _BLOCK_ROWS)
+        ]
+    )
+
+
+def _kmeans(vectors: np.ndarray, lists: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Spherical k-means on a sample; returns the centroids and every row's list."""
+    rng = np.random.default_rng(0)
+    sample = vectors[np.sort(rng.choice(len(vectors), min(len(vectors), _KMEANS_SAMPLE), replace=False))]
+    sample = sample.astype(np.float32)
+    centroids = sample[rng.choice(len(sample), lists, replace=False)]
+    for _ in range(_KMEANS_ITERATIONS):
+        assignment = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = np.bincount(assignment, minlength=lists) == 0
+        sums[empty] = centroids[empty]
+        centroids = _normalize(sums)
+    return centroids, _assign(vectors, centroids)
+
+
+def _save_atomic(path: str, save) -> None:
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            save(handle)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class VectorIndex:
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        texts: List[str],
+        centroids: Optional[np.ndarray] = None,
+        offsets: Optional[np.ndarray] = None,
+    ):
+        self.vectors = vectors
+        self.texts = texts
+        self.centroids = centroids
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @staticmethod
+    def exists(directory: str, agent_id, key: str) -> bool:
+        base = os.path.join(directory, f"{agent_id}-{key}")
+        return os.path.exists(base + ".npy") and os.path.exists(base + ".npz")
+
+    @classmethod
+    def open_or_build(
+        cls,
+        directory: str,
+        agent_id,
+        key: str,
+        vectors: Optional[np.ndarray],
+        texts: List[str],
+        ann_threshold: int,
+    ) -> "VectorIndex":
+        """
+        Map the agent's index file for `key`, writing it first if it does not
+        exist yet. `vectors` (float16, one row per text) may be None when
+        `exists` said the file is there; FileNotFoundError if it is gone.
+        """
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{agent_id}-{key}")
+        if not cls.exists(directory, agent_id, key):
+            if vectors is None:
+                raise FileNotFoundError(base + ".npy")
+            centroids = offsets = None
+            order = np.arange(len(texts))
+            if len(texts) >= ann_threshold:
+                lists = max(int(np.sqrt(len(texts))), 1)
+                centroids, assignment = _kmeans(vectors, lists)
+                order = np.argsort(assignment, kind="stable")
+                offsets = np.searchsorted(assignment[order], np.arange(lists + 1))
+            ordered = np.ascontiguousarray(vectors[order], dtype=np.float16)
+            meta = {"order": order}
+            if centroids is not None:
+                meta.update(centroids=centroids.astype(np.float32), offsets=offsets)
+            _save_atomic(base + ".npz", lambda handle: np.savez(handle, **meta))
+            _save_atomic(base + ".npy", lambda handle: np.save(handle, ordered))
+            # Older versions of this agent's index (already-open maps stay valid after unlink).
+            for stale in glob.glob(os.path.join(directory, f"{agent_id}-*.np[yz]")):
+                if not stale.startswith(base + "."):
+                    try:
+                        os.unlink(stale)
+                    except FileNotFoundError:
+                        pass
+
+        with np.load(base + ".npz") as meta:
+            order = meta["order"]
+            centroids = meta["centroids"] if "centroids" in meta else None
+            offsets = meta["offsets"] if "offsets" in meta else None
+        mapped = np.load(base + ".npy", mmap_mode="r")
+        return cls(mapped, [texts[row] for row in order], centroids, offsets)
+
+    def _ranges(self, query: np.ndarray, probes: int) -> List[Tuple[int, int]]:
+        if self.centroids is None:
+            return [(0, len(self.texts))]
+        nearest = np.argsort(self.centroids @ query)[::-1][:probes]
+        return [(int(self.offsets[index]), int(self.offsets[index + 1])) for index in nearest]
+
+    def search(self, query: np.ndarray, k: int, probes: int = 8) -> List[Tuple[float, str]]:
+        """The `k` rows most similar to `query` (a normalized vector) as (cosine, text), best first."""
+        if not self.texts:
+            return []
+        query = query.astype(np.float32)
+        rows: List[np.ndarray] = []
+        scores: List[np.ndarray] = []
+        for start, end in self._ranges(query, probes):
+            for block in range(start, end, _BLOCK_ROWS):
+                stop = min(block + _BLOCK_ROWS, end)
+                scores.append(self.vectors[block:stop].astype(np.float32) @ query)
+                rows.append(np.arange(block, stop))
+        if not scores:
+            return []
+        all_scores = np.concatenate(scores)
+        all_rows = np.concatenate(rows)
+        if len(all_scores) > k:
+            top = np.argpartition(-all_scores, k)[:k]
+        else:
+            top = np.arange(len(all_scores))
+        top = top[np.argsort(-all_scores[top])]
+        return [(float(all_scores[i]), self.texts[all_rows[i]]) for i in top]
+
+    def memory_bytes(self) -> int:
+        """Texts and quantizer; the mapped matrix is page cache, counted at its file size."""
+        size = int(self.vectors.nbytes) + sum(len(text) + 49 for text in self.texts)
+        if self.centroids is not None:
+            size += int(self.centroids.nbytes) + int(self.offsets.nbytes)
+        return size
@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class LRUCache(Generic[V]):
+    """
+    Small thread-safe in-process LRU cache with an optional per-entry TTL.
+
+    Used for hot lookups that are cheap to recompute but too frequent to hit
+    the database (or re-render) on every request. Each uvicorn worker keeps
+    its own copy.
+
+    With a `weigher` (value -> approximate bytes), least recently used entries
+    are also evicted while the total exceeds `max_weight`; the newest entry is
+    always kept. A value that grows in place should be `set` again so its
+    weight is re-measured.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        weigher: Optional[Callable[[V], int]] = None,
+        max_weight: Optional[int] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.max_weight = max_weight
+        self._clock = clock
+        self._weigher = weigher
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self._weights: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.weight = 0
+
+    def _discard(self, key: Hashable) -> None:
+        del self._data[key]
+        self.weight -= self._weights.pop(key, 0)
+
+    def get(self, key: Hashable, default: Any = None) -> Optional[V]:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at and expires_at <= self._clock():
+                self._discard(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: V, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = self._clock() + ttl if ttl else 0.0
+        weight = self._weigher(value) if self._weigher else 0
+        with self._lock:
+            if key in self._data:
+                self._discard(key)
+            self._data[key] = (expires_at, value)
+            self._weights[key] = weight
+            self.weight += weight
+            while len(self._data) > self.maxsize or (
+                self.max_weight is not None and self.weight > self.max_weight and len(self._data) > 1
+            ):
+                self._discard(next(iter(self._data)))
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                self._discard(key)
+        return item[1] if item else None
+
+    def values(self) -> List[V]:
+        with self._lock:
+            return [value for _, value in self._data.values()]
+
+    def pop_where(self, predicate: Callable[[Hashable, V], bool]) -> List[Hashable]:
+        """Evict every entry for which `predicate(key, value)` is true."""
+        with self._lock:
+            doomed = [key for key, (_, value) in self._data.items() if predicate(key, value)]
+            for key in doomed:
+                self._discard(key)
+        return doomed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._weights.clear()
+            self.weight = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
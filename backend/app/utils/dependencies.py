@@ -1,11 +1,12 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.config import get_settings
-from app.db import SessionLocal
+from app.db import AsyncSessionLocal, SessionLocal
 from app.models.tenant import Tenant
 from app.models.user import User
 from app.utils.security import decode_token
@@ -20,6 +21,12 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(auth_scheme),
     db: Session = Depends(get_db),
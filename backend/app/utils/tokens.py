@@ -0,0 +1,45 @@
+import logging
+import re
+from functools import lru_cache
+
+from app.config import get_settings
+
+try:  # optional: exact BPE counts when tiktoken (and its encoding file) is available
+    import tiktoken
+except ImportError:  # pragma: no cover - depends on the deployment
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Words, numbers and individual punctuation marks; a close enough proxy for
+# BPE token counts on chat text (LLM tokenizers split rare words further).
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """Load the configured tiktoken encoding once per process, or None to use the estimate."""
+    if tiktoken is None:
+        return None
+    name = get_settings().tokenizer_encoding
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception:
+        logger.warning("Tokenizer encoding %s unavailable; using the regex token estimate", name)
+        return None
+
+
+def _estimate_tokens(text: str) -> int:
+    pieces = _TOKEN_PATTERN.findall(text)
+    long_words = sum(len(piece) // 8 for piece in pieces if len(piece) > 8)
+    return len(pieces) + long_words
+
+
+def count_tokens(text: str) -> int:
+    """Count (or, without tiktoken, estimate) how many model tokens `text` will cost."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return _estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,23 @@
+import argparse
+from datetime import date
+
+from app.db import SessionLocal
+from app.services.stats_service import rebuild
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Recompute tenant_daily_stats (and tenant_stat_totals) from conversations, messages and customers.")
+    parser.add_argument("--tenant", help="Only rebuild this tenant id (default: all tenants)")
+    parser.add_argument("--start", type=date.fromisoformat, help="First day to rebuild, YYYY-MM-DD (default: all time)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last day to rebuild, YYYY-MM-DD (default: all time)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    db = SessionLocal()
+    try:
+        rows = rebuild(db, tenant_id=args.tenant, start=args.start, end=args.end)
+        print(f"Wrote {rows} tenant_daily_stats rows")
+    finally:
+        db.close()
@@ -0,0 +1,56 @@
+import argparse
+
+from sqlalchemy import or_
+
+from app.db import SessionLocal
+from app.models.agent_document_chunk import AgentDocumentChunk
+from app.services import embeddings
+from app.services.ingestion_service import store_chunks
+from app.services.knowledge_service import embedding_config
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description="Embed document chunks that have no embedding from the configured EMBEDDING_BACKEND."
+    )
+    parser.add_argument("--limit", type=int, help="Stop after this many documents' chunks (default: all)")
+    return parser.parse_args()
+
+
+def embed_missing(db, limit=None) -> int:
+    """One content hash per transaction, embedded in EMBEDDING_BATCH_SIZE batches."""
+    query = (
+        db.query(AgentDocumentChunk.content_hash)
+        .filter(
+            or_(
+                AgentDocumentChunk.embedding_model.is_(None),
+                AgentDocumentChunk.embedding_model != embedding_config.name,
+            )
+        )
+        .distinct()
+    )
+    if limit:
+        query = query.limit(limit)
+    content_hashes = [row.content_hash for row in query.all()]
+
+    for content_hash in content_hashes:
+        chunks = [
+            row.text
+            for row in db.query(AgentDocumentChunk.text)
+            .filter(AgentDocumentChunk.content_hash == content_hash)
+            .order_by(AgentDocumentChunk.chunk_index)
+        ]
+        store_chunks(db, content_hash, chunks, embeddings.embed_texts(embedding_config, chunks))
+    return len(content_hashes)
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    if embedding_config is None:
+        raise SystemExit("EMBEDDING_BACKEND is not configured")
+    db = SessionLocal()
+    try:
+        embedded = embed_missing(db, limit=args.limit)
+        print(f"Embedded the chunks of {embedded} documents")
+    finally:
+        db.close()
@@ -0,0 +1,46 @@
+import argparse
+import io
+
+from sqlalchemy.orm import undefer
+
+from app.db import SessionLocal
+from app.models.agent_document import AgentDocument
+from app.services.document_service import put_blob
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Move agent document bytes from the database into the blob store.")
+    parser.add_argument("--limit", type=int, help="Stop after this many documents (default: all)")
+    return parser.parse_args()
+
+
+def migrate(db, limit=None) -> int:
+    """One document per transaction, so only a single file is in memory at a time."""
+    query = (
+        db.query(AgentDocument.id)
+        .filter(AgentDocument.content_hash.is_(None), AgentDocument.data.isnot(None))
+        .order_by(AgentDocument.created_at)
+    )
+    if limit:
+        query = query.limit(limit)
+    document_ids = [row.id for row in query.all()]
+
+    for document_id in document_ids:
+        document = db.get(AgentDocument, document_id, options=[undefer(AgentDocument.data)])
+        blob = put_blob(db, io.BytesIO(document.data))
+        document.content_hash = blob.sha256
+        document.size_bytes = blob.size
+        document.data = None
+        db.commit()
+        db.expunge_all()
+    return len(document_ids)
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    db = SessionLocal()
+    try:
+        moved = migrate(db, limit=args.limit)
+        print(f"Moved {moved} agent documents to the blob store")
+    finally:
+        db.close()
@@ -0,0 +1,7 @@
+import os
+
+# app.config reads these at import; tests that need a real database check
+# DATABASE_URL themselves and skip without a reachable Postgres.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("BACKEND_JWT_SECRET", "test-secret")
+os.environ.setdefault("BACKEND_JWT_ALGORITHM", "HS256")
@@ -0,0 +1,37 @@
+from app.services.knowledge_index import BM25Index, tokenize
+
+
+def test_tokenize_folds_case_and_accents():
+    assert tokenize("Política de ENVÍOS, a 3 días") == ["politica", "de", "envios", "3", "dias"]
+
+
+def test_search_returns_k_results_when_a_common_term_matches_many_chunks():
+    index = BM25Index()
+    index.add("refunds", ["Refund requests are accepted within 30 days."])
+    index.add("shipping", [f"Shipping option {number} takes a few days." for number in range(40)])
+
+    results = index.search("refund shipping", 5)
+
+    assert len(results) == 5
+    assert results[0][1] == "Refund requests are accepted within 30 days."
+    assert all(text.startswith("Shipping option") for _, text in results[1:])
+
+
+def test_search_ranks_rare_terms_above_common_ones():
+    index = BM25Index()
+    index.add("a", ["refunds and shipping", "shipping only", "shipping again"])
+
+    results = index.search("refunds shipping", 3)
+
+    assert [text for _, text in results][0] == "refunds and shipping"
+    assert results[0][0] > results[1][0] > 0
+
+
+def test_removed_chunks_are_not_returned():
+    index = BM25Index()
+    index.add("old", ["refund policy, old version"])
+    index.add("new", ["refund policy, new version"])
+    index.remove("old")
+
+    assert [text for _, text in index.search("refund policy", 5)] == ["refund policy, new version"]
+    assert len(index) == 1
@@ -0,0 +1,298 @@
+"""
+Query-plan regression tests for the hot read paths.
+
+Seeds the Postgres database at DATABASE_URL with a few hundred tenants' worth
+of data, runs the real dashboard, super-admin, conversation and customer code
+paths while capturing the SELECTs they issue, and EXPLAINs each one. A check
+fails when any plan falls back to a sequential scan of a seeded table, which
+usually means a query stopped matching its index.
+
+Everything happens in one transaction that is rolled back at the end, but
+point it at a disposable, migrated database anyway:
+
+    alembic upgrade head
+    DATABASE_URL=postgresql://localhost/alwaysonduty_plans pytest tests/test_query_plans.py
+
+Skipped when DATABASE_URL is not a reachable Postgres database.
+"""
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Callable, List
+
+import pytest
+from sqlalchemy import create_engine, event, inspect, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.models.agent import Agent
+from app.models.conversation import Conversation
+from app.models.customer import Customer
+from app.models.tenant import Tenant
+from app.models.user import User
+from app.routers import agents as agents_router
+from app.routers import dashboard, super_admin
+from app.services import (
+    conversation_service,
+    customer_service,
+    directory_cache,
+    search_service,
+    stats_service,
+    usage_service,
+)
+
+SEEDED_TABLES = (
+    "tenants",
+    "users",
+    "agents",
+    "customers",
+    "channel_identities",
+    "conversations",
+    "messages",
+    "tenant_usage_counters",
+    "tenant_daily_stats",
+    "tenant_stat_totals",
+)
+
+_SEED_STATEMENTS = [
+    """
+    INSERT INTO tenants (id, name, slug, plan_type, stripe_customer_id, billing_status,
+                         is_special_permissioned, created_at, updated_at)
+    SELECT gen_random_uuid(), 'Plan check ' || i, 'plan-check-' || i, 'basic', 'cus_plan_check_' || i,
+           'active', false, now() - i * interval '1 hour', now()
+    FROM generate_series(1, :tenants) AS i
+    """,
+    """
+    INSERT INTO users (id, tenant_id, email, hashed_password, role, is_active, email_verified,
+                       created_at, updated_at)
+    SELECT gen_random_uuid(), t.id, t.slug || '-' || g || '@plan-check.invalid', 'x', 'TENANT_ADMIN',
+           true, true, t.created_at + g * interval '1 minute', now()
+    FROM tenants t CROSS JOIN generate_series(1, :users) AS g
+    WHERE t.slug LIKE 'plan-check-%'
+    """,
+    """
+    INSERT INTO agents (id, tenant_id, name, slug, status, agent_type, model_provider, training_mode,
+                        job_and_company_profile, customer_profile, created_at, updated_at)
+    SELECT gen_random_uuid(), t.id, 'Agent ' || g, t.slug || '-agent-' || g,
+           CASE WHEN g % 2 = 0 THEN 'active' ELSE 'draft' END, 'customer_service', 'groq', 'prompt_only',
+           '{}'::json, '{}'::json, t.created_at + g * interval '1 minute', now()
+    FROM tenants t CROSS JOIN generate_series(1, :agents) AS g
+    WHERE t.slug LIKE 'plan-check-%'
+    """,
+    """
+    INSERT INTO customers (id, tenant_id, email, created_at, updated_at)
+    SELECT gen_random_uuid(), t.id, t.slug || '-c' || g || '@plan-check.invalid',
+           now() - g * interval '10 minutes', now()
+    FROM tenants t CROSS JOIN generate_series(1, :customers) AS g
+    WHERE t.slug LIKE 'plan-check-%'
+    """,
+    """
+    INSERT INTO channel_identities (id, tenant_id, customer_id, channel, external_id, created_at)
+    SELECT gen_random_uuid(), c.tenant_id, c.id, 'webchat', c.id::text, c.created_at
+    FROM customers c JOIN tenants t ON t.id = c.tenant_id
+    WHERE t.slug LIKE 'plan-check-%'
+    """,
+    """
+    INSERT INTO conversations (id, tenant_id, customer_id, agent_id, channel, agent_type, status,
+                               started_at, last_message_at)
+    SELECT gen_random_uuid(), c.tenant_id, c.id,
+           (SELECT a.id FROM agents a WHERE a.tenant_id = c.tenant_id ORDER BY a.slug OFFSET g % :agents LIMIT 1),
+           'webchat', 'cs', 'open', c.created_at + g * interval '1 hour', c.created_at + g * interval '1 hour'
+    FROM customers c JOIN tenants t ON t.id = c.tenant_id CROSS JOIN generate_series(1, :conversations) AS g
+    WHERE t.slug LIKE 'plan-check-%'
+    """,
+    """
+    INSERT INTO messages (id, conversation_id, sender, text, created_at)
+    SELECT gen_random_uuid(), cv.id, CASE WHEN g % 2 = 0 THEN 'ai' ELSE 'user' END, 'message ' || g,
+           cv.started_at + g * interval '1 second'
+    FROM conversations cv JOIN tenants t ON t.id = cv.tenant_id CROSS JOIN generate_series(1, :messages) AS g
+    WHERE t.slug LIKE 'plan-check-%'
+    """,
+    """
+    INSERT INTO tenant_usage_counters (tenant_id, month, metric, value, updated_at)
+    SELECT tenant_id, date_trunc('month', started_at)::date, 'conversations', COUNT(*), now()
+    FROM conversations
+    GROUP BY tenant_id, date_trunc('month', started_at)::date
+    ON CONFLICT DO NOTHING
+    """,
+]
+
+
+@dataclass
+class Sample:
+    tenant_id: uuid.UUID
+    user: User
+    customer_id: uuid.UUID
+    agent_id: uuid.UUID
+    conversation_id: uuid.UUID
+    stripe_customer_id: str
+
+
+@dataclass
+class Check:
+    name: str
+    run: Callable[[Session, Sample], object]
+
+
+CHECKS: List[Check] = [
+    Check("dashboard.get_dashboard_metrics", lambda db, s: dashboard.get_dashboard_metrics(db=db, current_user=s.user)),
+    Check("agents.list_agents", lambda db, s: agents_router.list_agents(db=db, current_user=s.user)),
+    Check("directory_cache.get_active_agent", lambda db, s: directory_cache.get_active_agent(db, s.tenant_id)),
+    Check("super_admin.tenant_detail", lambda db, s: super_admin.tenant_detail(tenant_id=s.tenant_id, db=db, _=None)),
+    Check("super_admin.get_agent", lambda db, s: super_admin.get_agent(agent_id=s.agent_id, db=db, _=None)),
+    Check("super_admin.chat_user_detail", lambda db, s: super_admin._load_chat_user_detail(db, s.customer_id)),
+    Check(
+        "billing.tenant_by_stripe_customer",
+        lambda db, s: db.query(Tenant).filter(Tenant.stripe_customer_id == s.stripe_customer_id).first(),
+    ),
+    Check(
+        "conversation_service.list_conversations",
+        lambda db, s: conversation_service.list_conversations(db, s.tenant_id),
+    ),
+    Check(
+        "conversation_service.resolve_session_conversation",
+        lambda db, s: conversation_service.resolve_session_conversation(
+            db,
+            tenant_id=s.tenant_id,
+            customer_id=s.customer_id,
+            channel="webchat",
+            session_id=str(uuid.uuid4()),
+            agent_id=s.agent_id,
+            commit=False,
+        ),
+    ),
+    Check(
+        "conversation_service.get_conversation_context",
+        lambda db, s: conversation_service.get_conversation_context(db, s.conversation_id, limit=50),
+    ),
+    Check(
+        "conversation_service.get_unsummarized_messages",
+        lambda db, s: conversation_service.get_unsummarized_messages(db, s.conversation_id),
+    ),
+    Check("customer_service.list_customers", lambda db, s: customer_service.list_customers(db, s.tenant_id)),
+    Check(
+        "customer_service.get_customer",
+        lambda db, s: customer_service.get_customer(db, s.tenant_id, s.customer_id),
+    ),
+    Check(
+        "customer_service.get_or_create_customer",
+        lambda db, s: customer_service.get_or_create_customer(
+            db, s.tenant_id, "webchat", str(s.customer_id), commit=False
+        ),
+    ),
+    Check("usage_service.get_usage", lambda db, s: usage_service.get_usage(db, s.tenant_id)),
+    Check(
+        "search_service.tenants",
+        lambda db, s: db.execute(select(search_service.ranked_matches(Tenant, "plan-check-12"))).all(),
+    ),
+    Check(
+        "search_service.customers",
+        lambda db, s: db.execute(select(search_service.ranked_matches(Customer, "-c17@plan-check"))).all(),
+    ),
+    Check(
+        "search_service.users",
+        lambda db, s: db.execute(select(search_service.ranked_matches(User, "plan-check-3-2@"))).all(),
+    ),
+]
+
+
+def _seed(db: Session, scale: float) -> Sample:
+    sizes = {
+        "tenants": max(int(500 * scale), 1),
+        "users": 3,
+        "agents": 6,
+        "customers": max(int(40 * scale), 1),
+        "conversations": 3,
+        "messages": 6,
+    }
+    for statement in _SEED_STATEMENTS:
+        db.execute(text(statement), sizes)
+    stats_service.rebuild(db)
+    db.execute(text(f"ANALYZE {', '.join(SEEDED_TABLES)}"))
+
+    tenant = db.query(Tenant).filter(Tenant.slug == "plan-check-1").one()
+    conversation = (
+        db.query(Conversation)
+        .filter(Conversation.tenant_id == tenant.id)
+        .order_by(Conversation.started_at.desc())
+        .first()
+    )
+    return Sample(
+        tenant_id=tenant.id,
+        user=db.query(User).filter(User.tenant_id == tenant.id).first(),
+        customer_id=conversation.customer_id,
+        agent_id=conversation.agent_id
+        or db.query(Agent.id).filter(Agent.tenant_id == tenant.id).scalar(),
+        conversation_id=conversation.id,
+        stripe_customer_id=tenant.stripe_customer_id,
+    )
+
+
+def _seq_scans(plan: dict) -> List[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in SEEDED_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+def _capture(db: Session, check: Check, sample: Sample) -> list:
+    connection = db.connection()
+    captured = []
+
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((statement, parameters))
+
+    event.listen(connection, "before_cursor_execute", _before)
+    try:
+        check.run(db, sample)
+    finally:
+        event.remove(connection, "before_cursor_execute", _before)
+    return captured
+
+
+@pytest.fixture(scope="module")
+def plan_db():
+    database_url = os.environ["DATABASE_URL"]
+    if not database_url.startswith("postgresql"):
+        pytest.skip("query plan checks need a Postgres DATABASE_URL")
+    engine = create_engine(database_url)
+    try:
+        connection = engine.connect()
+    except OperationalError as exc:
+        engine.dispose()
+        pytest.skip(f"Postgres at DATABASE_URL is not reachable: {exc.orig}")
+    if not inspect(connection).has_table("alembic_version"):
+        connection.close()
+        engine.dispose()
+        pytest.fail("DATABASE_URL is not migrated; run `alembic upgrade head` first")
+
+    transaction = connection.begin()
+    # Service code commits; with savepoints those commits never leave the outer transaction.
+    db = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield connection, db, _seed(db, scale=1.0)
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+        engine.dispose()
+
+
+@pytest.mark.parametrize("check", CHECKS, ids=lambda check: check.name)
+def test_hot_queries_use_indexes(plan_db, check):
+    connection, db, sample = plan_db
+    try:
+        statements = _capture(db, check, sample)
+    except Exception:
+        db.rollback()
+        raise
+    regressions = []
+    for statement, parameters in statements:
+        plan = connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()[0]["Plan"]
+        scans = _seq_scans(plan)
+        if scans:
+            regressions.append(f"Seq Scan on {', '.join(sorted(set(scans)))}: {' '.join(statement.split())}")
+    assert not regressions, "\n".join(regressions)
@@ -13,6 +13,11 @@ type ChatMessage = {
   text: string;
 };
 
+type StreamEvent =
+  | { type: "delta"; text: string }
+  | { type: "reset" }
+  | { type: "done"; reply: string; conversation_id?: string; customer_id?: string };
+
 type Props = {
   agentSlug?: string;
   agentName: string;
@@ -28,6 +33,7 @@ export default function PublicAgentChat({ agentSlug, agentName, companyName, ten
   const [messages, setMessages] = useState<ChatMessage[]>([]);
   const [input, setInput] = useState("");
   const [loading, setLoading] = useState(false);
+  const [streamingId, setStreamingId] = useState<string | null>(null);
   const [error, setError] = useState<string | null>(null);
   const [unlockToken, setUnlockToken] = useState<string | null>(null);
   const [showGate, setShowGate] = useState(true);
@@ -81,7 +87,7 @@ export default function PublicAgentChat({ agentSlug, agentName, companyName, ten
     try {
       timeoutId = setTimeout(() => controller.abort(), 20000);
 
-      const res = await fetch(`${API_BASE}/api/webchat/send`, {
+      const res = await fetch(`${API_BASE}/api/webchat/send/stream`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -95,17 +101,59 @@ export default function PublicAgentChat({ agentSlug, agentName, companyName, ten
         signal: controller.signal,
       });
 
-      if (!res.ok) {
+      if (!res.ok || !res.body) {
         throw new Error("Failed to reach agent");
       }
 
-      const data = await res.json();
-      const aiMsg: ChatMessage = {
-        id: generateId(),
-        role: "ai",
-        text: data.reply || t.starterBody,
+      const aiId = generateId();
+      let replyText = "";
+      let started = false;
+
+      const applyEvent = (event: StreamEvent) => {
+        if (event.type === "delta") {
+          replyText += event.text;
+        } else if (event.type === "reset") {
+          replyText = "";
+        } else if (event.type === "done") {
+          replyText = event.reply || replyText || t.starterBody;
+        }
+        if (!started) {
+          started = true;
+          // First token arrived: the timeout only guards time-to-first-token.
+          if (timeoutId) {
+            clearTimeout(timeoutId);
+            timeoutId = null;
+          }
+          setStreamingId(aiId);
+          setMessages((prev) => [...prev, { id: aiId, role: "ai", text: replyText }]);
+        } else {
+          setMessages((prev) => prev.map((msg) => (msg.id === aiId ? { ...msg, text: replyText } : msg)));
+        }
       };
-      setMessages((prev) => [...prev, aiMsg]);
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let newline = buffer.indexOf("\n");
+        while (newline !== -1) {
+          const line = buffer.slice(0, newline).trim();
+          buffer = buffer.slice(newline + 1);
+          if (line) {
+            applyEvent(JSON.parse(line) as StreamEvent);
+          }
+          newline = buffer.indexOf("\n");
+        }
+      }
+      if (buffer.trim()) {
+        applyEvent(JSON.parse(buffer) as StreamEvent);
+      }
+      if (!started) {
+        applyEvent({ type: "done", reply: "" });
+      }
     } catch (err: any) {
       if (err?.name === "AbortError") {
         setError(t.timeout || t.error);
@@ -117,6 +165,7 @@ export default function PublicAgentChat({ agentSlug, agentName, companyName, ten
         clearTimeout(timeoutId);
       }
       setLoading(false);
+      setStreamingId(null);
     }
   };
 
@@ -178,7 +227,7 @@ export default function PublicAgentChat({ agentSlug, agentName, companyName, ten
             </div>
           ))}
 
-          {loading && (
+          {loading && !streamingId && (
             <div className="flex justify-start">
               <div className="inline-flex items-center gap-2 rounded-full bg-white px-3 py-2 text-xs text-slate-600 ring-1 ring-slate-200">
                 <span className="h-2 w-2 animate-pulse rounded-full bg-emerald-500"></span>